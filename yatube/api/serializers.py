@@ -0,0 +1,112 @@
+"""Fields of the API resources.
+
+Every field is a lookup that works both in values() and as an attribute
+path on a model instance ('author__username' is post.author.username), so a
+page of instances and a streamed values() export give the same JSON. The
+?fields= parameter picks a subset, and only the columns and joins of the
+picked fields are queried.
+"""
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.files.storage import default_storage
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _media_url(value):
+    return default_storage.url(str(value)) if value else None
+
+
+POST_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'pub_date': ('pub_date', _isoformat),
+    'modified': ('modified', _isoformat),
+    'author': ('author__username', None),
+    'group': ('group__slug', None),
+    'image': ('image', _media_url),
+    'thumbnail': ('thumbnail_url', None),
+    'comments_count': ('comments_count', None),
+}
+
+COMMENT_FIELDS = {
+    'id': ('id', None),
+    'post': ('post_id', None),
+    'author': ('author__username', None),
+    'text': ('text', None),
+    'pub_date': ('pub_date', _isoformat),
+}
+
+GROUP_FIELDS = {
+    'id': ('id', None),
+    'slug': ('slug', None),
+    'title': ('title', None),
+    'description': ('description', None),
+    'posts_count': ('posts_count', None),
+}
+
+PROFILE_FIELDS = {
+    'username': ('username', None),
+    'first_name': ('first_name', None),
+    'last_name': ('last_name', None),
+    'posts_count': ('counters__posts_count', None),
+    'followers_count': ('counters__followers_count', None),
+    'following_count': ('counters__following_count', None),
+}
+
+
+def parse_fields(value, spec):
+    """Field names from a comma-separated ?fields= value, all by default."""
+    if not value:
+        return list(spec)
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in spec]
+    if unknown or not names:
+        raise FieldsError(
+            f'Неизвестные поля: {", ".join(unknown)}. '
+            f'Доступны: {", ".join(spec)}.')
+    return names
+
+
+def lookups(fields, spec):
+    return [spec[name][0] for name in fields]
+
+
+def related(fields, spec):
+    """Relations to join for the picked fields (for select_related)."""
+    return sorted({lookup.rsplit('__', 1)[0]
+                   for lookup in lookups(fields, spec) if '__' in lookup})
+
+
+def restrict(queryset, fields, spec):
+    """Selects only the columns and joins the picked fields need."""
+    return queryset.select_related(*related(fields, spec)).only(
+        *lookups(fields, spec))
+
+
+def _resolve(obj, lookup):
+    if isinstance(obj, dict):
+        return obj[lookup]
+    for name in lookup.split('__'):
+        try:
+            obj = getattr(obj, name)
+        except ObjectDoesNotExist:
+            return None
+        if obj is None:
+            return None
+    return obj
+
+
+def serialize(obj, fields, spec):
+    """Picked fields of a model instance or of a values() row."""
+    row = {}
+    for name in fields:
+        lookup, convert = spec[name]
+        value = _resolve(obj, lookup)
+        row[name] = convert(value) if convert and value is not None else value
+    return row
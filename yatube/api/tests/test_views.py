@@ -0,0 +1,125 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание группы')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {number}',
+                                group=cls.group if number % 2 else None)
+            for number in range(5)
+        ]
+        cls.post = cls.posts[-1]
+        for number in range(3):
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text=f'Комментарий {number}')
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_post_list_walks_cursor_pages(self):
+        url = reverse('api:post_list')
+        ids, pages = [], 0
+        while url:
+            data = self.client.get(url, {'limit': 2} if not pages else None
+                                   ).json()
+            ids += [post['id'] for post in data['results']]
+            url, pages = data['next'], pages + 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+
+    def test_sparse_fields(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('api:post_list'),
+                                       {'fields': 'id,author'})
+        self.assertEqual(response.json()['results'][0],
+                         {'id': self.post.pk, 'author': 'author'})
+        response = self.client.get(reverse('api:post_list'),
+                                   {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_filters(self):
+        response = self.client.get(reverse('api:post_list'),
+                                   {'group': self.group.slug})
+        self.assertEqual(len(response.json()['results']), 2)
+        response = self.client.get(reverse('api:post_list'),
+                                   {'until': 'не дата'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_detail(self):
+        response = self.client.get(
+            reverse('api:post_detail', args=[self.post.pk]))
+        data = response.json()
+        self.assertEqual(data['text'], self.post.text)
+        self.assertEqual(data['comments_count'], 3)
+        self.assertIsNone(data['group'])
+        response = self.client.get(reverse('api:post_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_comment_list(self):
+        response = self.client.get(
+            reverse('api:comment_list', args=[self.post.pk]))
+        self.assertEqual(
+            [comment['text'] for comment in response.json()['results']],
+            ['Комментарий 0', 'Комментарий 1', 'Комментарий 2'])
+        response = self.client.get(reverse('api:comment_list', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_groups_and_profile(self):
+        data = self.client.get(reverse('api:group_list')).json()
+        self.assertEqual(data['results'][0]['slug'], self.group.slug)
+        data = self.client.get(
+            reverse('api:group_detail', args=[self.group.slug])).json()
+        self.assertEqual(data['posts_count'], 2)
+        data = self.client.get(
+            reverse('api:profile', args=[self.author.username])).json()
+        self.assertEqual(data['posts_count'], 5)
+
+    def test_etag_revalidates_until_change(self):
+        url = reverse('api:profile', args=[self.author.username])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['followers_count'], 1)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1000)
+    def test_follow_feed(self):
+        url = reverse('api:follow_feed')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        self.assertEqual(len(self.client.get(url).json()['results']), 5)
+
+    def test_export_streams_ndjson(self):
+        response = self.client.get(reverse('api:post_export'),
+                                   {'fields': 'id,text'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in
+                b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(rows, [{'id': post.pk, 'text': post.text}
+                                for post in self.posts])
+
+    def test_read_only(self):
+        response = self.client.post(reverse('api:post_list'))
+        self.assertEqual(response.status_code, 405)
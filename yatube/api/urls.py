@@ -0,0 +1,17 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('v1/posts/', views.post_list, name='post_list'),
+    path('v1/posts/export/', views.post_export, name='post_export'),
+    path('v1/posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('v1/posts/<int:post_id>/comments/', views.comment_list,
+         name='comment_list'),
+    path('v1/groups/', views.group_list, name='group_list'),
+    path('v1/groups/<slug:slug>/', views.group_detail, name='group_detail'),
+    path('v1/profiles/<str:username>/', views.profile, name='profile'),
+    path('v1/follow/', views.follow_feed, name='follow_feed'),
+]
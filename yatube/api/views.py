@@ -0,0 +1,181 @@
+"""Read-only JSON API.
+
+Lists are keyset-paginated with core.paginator.CursorPaginator and reuse the
+querysets of the HTML views; pages that have HTML counterparts get the same
+ETag / Last-Modified validators (posts.conditional). ?fields= picks a subset
+of the fields, see api.serializers.
+"""
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.http import (Http404, JsonResponse, QueryDict,
+                         StreamingHttpResponse)
+from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_safe
+
+from core.paginator import CursorPaginator
+from posts import cache, timeline
+from posts.conditional import conditional_page, post_scopes
+from posts.models import Comment, Group, Post, User
+from . import serializers
+from .serializers import (COMMENT_FIELDS, GROUP_FIELDS, POST_FIELDS,
+                          PROFILE_FIELDS, FieldsError)
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def api_view(view):
+    """GET/HEAD only; errors are answered with JSON instead of HTML."""
+
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({'detail': 'Не найдено.'}, status=404)
+        except (BadRequest, FieldsError) as error:
+            return JsonResponse({'detail': str(error)}, status=400)
+    return wrapper
+
+
+def fields_of(request, spec):
+    return serializers.parse_fields(request.GET.get('fields'), spec)
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('limit должен быть числом.')
+    return max(1, min(size, settings.API_MAX_PAGE_SIZE))
+
+
+def page_link(request, cursor):
+    if cursor is None:
+        return None
+    params = QueryDict(mutable=True)
+    params.update(request.GET)
+    params['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+def paginated(request, queryset, spec, ordering=('-pub_date', '-id')):
+    """{'results', 'next', 'previous'} for the ?cursor= page."""
+    fields = fields_of(request, spec)
+    paginator = CursorPaginator(
+        serializers.restrict(queryset, fields, spec), page_size(request),
+        ordering)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return {
+        'results': [serializers.serialize(obj, fields, spec) for obj in page],
+        'next': page_link(request, page.next_cursor),
+        'previous': page_link(request, page.previous_cursor),
+    }
+
+
+def filter_posts(request, posts):
+    """?group=<slug>, ?author=<username>, ?since= and ?until= (ISO 8601
+    dates of publication)."""
+    if request.GET.get('group'):
+        posts = posts.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        posts = posts.filter(author__username=request.GET['author'])
+    for param, lookup in (('since', 'pub_date__gte'),
+                          ('until', 'pub_date__lt')):
+        if request.GET.get(param):
+            value = parse_datetime(request.GET[param])
+            if value is None:
+                raise BadRequest(f'{param}: ожидается дата ISO 8601.')
+            posts = posts.filter(**{lookup: value})
+    return posts
+
+
+def post_list_scopes(request):
+    # страница списка меняется вместе со своей лентой
+    scopes = []
+    if request.GET.get('group'):
+        scopes.append(cache.group_scope(request.GET['group']))
+    if request.GET.get('author'):
+        scopes.append(cache.author_scope(request.GET['author']))
+    return scopes or [cache.INDEX]
+
+
+@api_view
+@conditional_page(post_list_scopes)
+def post_list(request):
+    return JsonResponse(paginated(
+        request, filter_posts(request, Post.objects.all()), POST_FIELDS))
+
+
+@api_view
+@conditional_page(post_scopes)
+def post_detail(request, post_id):
+    fields = fields_of(request, POST_FIELDS)
+    post = get_object_or_404(
+        serializers.restrict(Post.objects.all(), fields, POST_FIELDS),
+        pk=post_id)
+    return JsonResponse(serializers.serialize(post, fields, POST_FIELDS))
+
+
+@api_view
+@conditional_page(lambda request, post_id: [cache.post_scope(post_id)])
+def comment_list(request, post_id):
+    data = paginated(request, Comment.objects.filter(post_id=post_id),
+                     COMMENT_FIELDS, ordering=('pub_date', 'id'))
+    if not data['results'] and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return JsonResponse(data)
+
+
+@api_view
+@conditional_page(lambda request: [cache.INDEX])
+def group_list(request):
+    return JsonResponse(paginated(request, Group.objects.all(), GROUP_FIELDS,
+                                  ordering=('id',)))
+
+
+@api_view
+@conditional_page(lambda request, slug: [cache.group_scope(slug)])
+def group_detail(request, slug):
+    fields = fields_of(request, GROUP_FIELDS)
+    group = get_object_or_404(
+        serializers.restrict(Group.objects.all(), fields, GROUP_FIELDS),
+        slug=slug)
+    return JsonResponse(serializers.serialize(group, fields, GROUP_FIELDS))
+
+
+@api_view
+@conditional_page(lambda request, username: [cache.author_scope(username)])
+def profile(request, username):
+    fields = fields_of(request, PROFILE_FIELDS)
+    author = get_object_or_404(
+        serializers.restrict(User.objects.all(), fields, PROFILE_FIELDS),
+        username=username)
+    return JsonResponse(serializers.serialize(author, fields, PROFILE_FIELDS))
+
+
+@api_view
+def follow_feed(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'detail': 'Нужна авторизация.'}, status=401)
+    return JsonResponse(
+        paginated(request, timeline.feed(request.user), POST_FIELDS))
+
+
+@api_view
+def post_export(request):
+    """All matching posts as NDJSON, streamed with constant memory."""
+    fields = fields_of(request, POST_FIELDS)
+    rows = filter_posts(request, Post.objects.all()).order_by('id').values(
+        *serializers.lookups(fields, POST_FIELDS)
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    lines = (json.dumps(serializers.serialize(row, fields, POST_FIELDS),
+                        ensure_ascii=False) + '\n' for row in rows)
+    return StreamingHttpResponse(lines, content_type='application/x-ndjson')
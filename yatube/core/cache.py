@@ -0,0 +1,305 @@
+"""Cache backends that report hits and misses to core.metrics.
+
+TieredCache keeps a small LRU in every process (L1) in front of a cache
+shared by all processes (L2), which is any other configured alias: the
+file-based cache, the database cache or a Redis backend.
+"""
+import pickle
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends import locmem
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+_missing = object()
+
+
+class MetricsMixin:
+    """Counts get() and get_many() lookups of the current request.
+
+    Some backends implement get() through get_many() or the other way
+    round, so only the outermost call is counted.
+    """
+    _counting = False
+
+    def get(self, key, default=None, version=None):
+        if self._counting:
+            return super().get(key, default, version)
+        self._counting = True
+        try:
+            value = super().get(key, _missing, version)
+        finally:
+            self._counting = False
+        hit = value is not _missing
+        metrics.cache_lookup(int(hit), int(not hit))
+        return value if hit else default
+
+    def get_many(self, keys, version=None):
+        if self._counting:
+            return super().get_many(keys, version)
+        keys = list(keys)
+        self._counting = True
+        try:
+            found = super().get_many(keys, version)
+        finally:
+            self._counting = False
+        metrics.cache_lookup(len(found), len(keys) - len(found))
+        return found
+
+
+class LocMemCache(MetricsMixin, locmem.LocMemCache):
+    pass
+
+
+class LocalTier:
+    """Per-process LRU of pickled values, shared by the threads."""
+    LOCKS = 64
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.compute_locks = [threading.Lock() for _ in range(self.LOCKS)]
+        self.epoch = None
+        self.epoch_checked = 0
+        self.stats = Counter()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _missing
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return _missing
+            self.entries.move_to_end(key)
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout, max_entries):
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def compute_lock(self, key):
+        return self.compute_locks[hash(key) % self.LOCKS]
+
+
+_local_tiers = {}
+
+
+class BaseTieredCache(BaseCache):
+    """L1 in process memory, L2 in the shared cache named by LOCATION.
+
+    An L1 entry is served without asking L2 for at most LOCAL_TIMEOUT
+    seconds. delete() and clear() change the epoch key in L2; every
+    process compares it at most once per EPOCH_INTERVAL seconds and drops
+    its L1 when it changed. Values overwritten in place are not broadcast:
+    such keys must carry a version stamp (posts.cache) or be listed in
+    LOCAL_EXCLUDE, whose prefixes are always read from L2.
+
+    get_or_compute() is single-flight: one thread per process and one
+    process per key (through an L2 lock key) computes a missing value, the
+    others wait for it instead of stampeding the database.
+    """
+    EPOCH_KEY = 'core:cache:epoch'
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._local = _local_tiers.setdefault(location, LocalTier())
+        self._local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self._local_timeout = float(options.get('LOCAL_TIMEOUT', 5))
+        self._local_exclude = tuple(options.get('LOCAL_EXCLUDE', ()))
+        self._epoch_interval = float(options.get('EPOCH_INTERVAL', 1))
+        self._lock_timeout = float(options.get('LOCK_TIMEOUT', 10))
+        self._lock_poll = float(options.get('LOCK_POLL', 0.05))
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_key(self, key, version):
+        if key.startswith(self._local_exclude):
+            return None
+        return self.make_key(key, version)
+
+    def _local_set(self, local_key, value, timeout=DEFAULT_TIMEOUT):
+        if local_key is None:
+            return
+        timeout = self.get_backend_timeout(timeout)
+        local_timeout = self._local_timeout
+        if timeout is not None:
+            local_timeout = min(local_timeout, timeout - time.time())
+        if local_timeout > 0:
+            self._local.set(local_key, value, local_timeout,
+                            self._local_max_entries)
+
+    def _sync_epoch(self):
+        local = self._local
+        now = time.monotonic()
+        if now - local.epoch_checked < self._epoch_interval:
+            return
+        local.epoch_checked = now
+        epoch = self.shared.get(self.EPOCH_KEY)
+        if epoch != local.epoch:
+            if local.epoch is not None:
+                local.stats['epoch_flushes'] += 1
+            local.clear()
+            local.epoch = epoch
+
+    def _new_epoch(self):
+        epoch = uuid.uuid4().hex
+        self.shared.set(self.EPOCH_KEY, epoch, None)
+        return epoch
+
+    def _lookup(self, key, version):
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            self._sync_epoch()
+            value = self._local.get(local_key)
+            if value is not _missing:
+                self._local.stats['local_hits'] += 1
+                metrics.cache_local_hits(1)
+                return value
+        value = self.shared.get(key, _missing, version)
+        if value is _missing:
+            self._local.stats['misses'] += 1
+            return _missing
+        self._local.stats['shared_hits'] += 1
+        self._local_set(local_key, value)
+        return value
+
+    def get(self, key, default=None, version=None):
+        value = self._lookup(key, version)
+        return default if value is _missing else value
+
+    def get_many(self, keys, version=None):
+        found, remote = {}, []
+        self._sync_epoch()
+        for key in keys:
+            local_key = self._local_key(key, version)
+            value = _missing
+            if local_key is not None:
+                value = self._local.get(local_key)
+            if value is _missing:
+                remote.append(key)
+            else:
+                found[key] = value
+        self._local.stats['local_hits'] += len(found)
+        metrics.cache_local_hits(len(found))
+        shared = self.shared.get_many(remote, version) if remote else {}
+        self._local.stats['shared_hits'] += len(shared)
+        self._local.stats['misses'] += len(remote) - len(shared)
+        for key, value in shared.items():
+            self._local_set(self._local_key(key, version), value)
+        found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self._local_set(self._local_key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self._local_set(self._local_key(key, version), value, timeout)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(self._local_key(key, version), value, timeout)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def has_key(self, key, version=None):
+        return self._lookup(key, version) is not _missing
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version)
+        self._local.delete(self.make_key(key, version))
+        return value
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version)
+        self._local.delete(self.make_key(key, version))
+        self._new_epoch()
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.shared.delete_many(keys, version)
+        for key in keys:
+            self._local.delete(self.make_key(key, version))
+        self._new_epoch()
+
+    def clear(self):
+        self.shared.clear()
+        self._local.clear()
+        # L1 пуст, так что новая эпоха уже учтена в этом процессе
+        self._local.epoch = self._new_epoch()
+        self._local.epoch_checked = time.monotonic()
+
+    def get_or_compute(self, key, compute, timeout=DEFAULT_TIMEOUT,
+                       version=None):
+        """Cached value of key, calling compute() at most once at a time
+        across threads and processes when it is missing."""
+        value = self.get(key, _missing, version)
+        if value is not _missing:
+            return value
+        with self._local.compute_lock(self.make_key(key, version)):
+            # пока ждали блокировку, значение мог посчитать другой поток
+            value = self._lookup(key, version)
+            if value is not _missing:
+                return value
+            lock_key = f'{key}:computing'
+            if not self.shared.add(lock_key, 1, self._lock_timeout, version):
+                value = self._wait(key, version)
+                if value is not _missing:
+                    return value
+            self._local.stats['computes'] += 1
+            try:
+                value = compute()
+                self.set(key, value, timeout, version)
+            finally:
+                self.shared.delete(lock_key, version)
+            return value
+
+    def _wait(self, key, version):
+        """Value computed by another process, or _missing on timeout."""
+        self._local.stats['waits'] += 1
+        deadline = time.monotonic() + self._lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self._lock_poll)
+            value = self.shared.get(key, _missing, version)
+            if value is not _missing:
+                self._local_set(self._local_key(key, version), value)
+                return value
+        return _missing
+
+    def stats(self):
+        """Hit and miss counters of this process."""
+        return dict(self._local.stats, local_entries=len(self._local.entries))
+
+
+class TieredCache(MetricsMixin, BaseTieredCache):
+    pass
@@ -0,0 +1,31 @@
+import os
+import stat
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+FILE_CACHE = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+@register(Tags.caches, Tags.security)
+def check_file_cache_permissions(app_configs, **kwargs):
+    """File caches unpickle what they read: nobody but the owner of the
+    process may be able to write to their directories."""
+    warnings = []
+    for alias, options in settings.CACHES.items():
+        if options['BACKEND'] != FILE_CACHE:
+            continue
+        try:
+            mode = os.stat(options['LOCATION']).st_mode
+        except FileNotFoundError:
+            # каталог создаст сам кеш, с правами 0700
+            continue
+        if mode & (stat.S_IRWXG | stat.S_IRWXO):
+            warnings.append(Warning(
+                f'Каталог кеша {alias!r} доступен не только владельцу: '
+                f'{options["LOCATION"]}',
+                hint='Выполните chmod 700 для каталога или укажите другой '
+                     'в YATUBE_CACHE_DIR.',
+                id='core.W001',
+            ))
+    return warnings
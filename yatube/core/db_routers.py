@@ -0,0 +1,72 @@
+"""Primary/replica database routing.
+
+Writes always go to the primary ('default'). Reads go to a random alias of
+REPLICA_DATABASES only inside replica_reads(), which ReplicaMiddleware
+enters for GET and HEAD requests; commands, background threads and tests
+read from the primary. Inside replica_reads() the request falls back to
+the primary once it writes or opens a transaction, and ReplicaMiddleware
+keeps the following requests of the client on the primary for
+READ_YOUR_WRITES_SECONDS, so a user sees their own post or comment even if
+the replicas lag behind. read_primary() moves the rest of a request to the
+primary: posts.cache calls it when a page would be cached under a stamp
+that is newer than the replicas are guaranteed to be.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = ContextVar('replica_reads', default=None)
+
+
+class ReadState:
+    def __init__(self, primary=False):
+        # primary: читать из основной базы с самого начала
+        self.primary = primary
+        self.wrote = False
+
+
+@contextmanager
+def replica_reads(primary=False):
+    """Lets reads in the block go to the replicas; yields a ReadState whose
+    wrote is set once the block writes to the primary."""
+    state = ReadState(primary)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def read_primary():
+    """Sends the remaining reads of the current replica_reads() block to
+    the primary."""
+    state = _state.get()
+    if state is not None:
+        state.primary = True
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (state is None or state.primary or state.wrote
+                or not settings.REPLICA_DATABASES
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики — копии основной базы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
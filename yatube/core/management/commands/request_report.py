@@ -0,0 +1,84 @@
+import json
+import statistics
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.metrics import percentile
+
+
+class Command(BaseCommand):
+    help = ('Сводка по представлениям из лога core.requests: число '
+            'запросов, p50/p95 времени, SQL-запросы, время БД и шаблонов, '
+            'попадания в кеш, медленные и отклонённые лимитами запросы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*',
+                            help='Логи; по умолчанию REQUEST_LOG_FILE.')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--json', action='store_true',
+                            help='Вывести сводку в JSON.')
+
+    def handle(self, *args, **options):
+        views = defaultdict(list)
+        for path in options['files'] or [settings.REQUEST_LOG_FILE]:
+            try:
+                with open(path) as file:
+                    for line in file:
+                        record = self.parse(line)
+                        if record is not None:
+                            views[record['view'] or '-'].append(record)
+            except OSError as error:
+                raise CommandError(error)
+
+        report = sorted(
+            (self.summarize(view, records) for view, records in views.items()),
+            key=lambda row: row['total_ms'], reverse=True)[:options['top']]
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+            return
+        for row in report:
+            self.stdout.write(
+                f'{row["view"]}: {row["requests"]} запросов, '
+                f'p50 {row["p50_ms"]} мс, p95 {row["p95_ms"]} мс, '
+                f'SQL {row["queries"]} (макс. {row["max_queries"]}), '
+                f'БД {row["db_ms"]} мс, шаблоны {row["template_ms"]} мс, '
+                f'кеш {row["cache_hit_ratio"]:.0%}, '
+                f'медленных {row["slow"]}, '
+                f'отклонено лимитами {row["ratelimited"]}')
+
+    @staticmethod
+    def parse(line):
+        # строка может начинаться с префикса форматтера логов
+        start = line.find('{')
+        if start < 0:
+            return None
+        try:
+            return json.loads(line[start:])
+        except ValueError:
+            return None
+
+    @staticmethod
+    def summarize(view, records):
+        durations = [record['duration_ms'] for record in records]
+        hits = sum(record['cache_hits'] for record in records)
+        lookups = hits + sum(record['cache_misses'] for record in records)
+        return {
+            'view': view,
+            'requests': len(records),
+            'total_ms': round(sum(durations), 2),
+            'p50_ms': round(percentile(durations, 50), 2),
+            'p95_ms': round(percentile(durations, 95), 2),
+            'queries': round(statistics.mean(
+                record['queries'] for record in records), 1),
+            'max_queries': max(record['queries'] for record in records),
+            'db_ms': round(statistics.mean(
+                record['db_ms'] for record in records), 2),
+            'template_ms': round(statistics.mean(
+                record['template_ms'] for record in records), 2),
+            'cache_hit_ratio': hits / lookups if lookups else 0,
+            'slow': sum(1 for record in records if record['slow']),
+            'ratelimited': sum(1 for record in records
+                               if record.get('ratelimited')),
+        }
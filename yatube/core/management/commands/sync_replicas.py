@@ -0,0 +1,40 @@
+import time
+
+import sqlite3
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик (SQLITE_REPLICAS): '
+            'для проверки чтения с реплик локально. С --interval копирует '
+            'раз в N секунд, как реплика с задержкой.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Повторять копирование раз в N секунд.')
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Реплики PostgreSQL синхронизирует сам '
+                               'PostgreSQL, команда только для SQLite.')
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('Реплики не настроены (SQLITE_REPLICAS).')
+        while True:
+            started = time.perf_counter()
+            primary.ensure_connection()
+            for alias in settings.REPLICA_DATABASES:
+                target = sqlite3.connect(connections[alias].settings_dict[
+                    'NAME'])
+                try:
+                    primary.connection.backup(target)
+                finally:
+                    target.close()
+            self.stdout.write(
+                f'Реплики обновлены за '
+                f'{time.perf_counter() - started:.2f} с.')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,86 @@
+"""Per-request metrics.
+
+RequestMetricsMiddleware makes a RequestMetrics current for the duration of
+a request; SQL queries, template rendering and cache lookups made while it
+is current are added to it. Database time is measured with connection
+execute wrappers, template rendering by the backend in core.template_backend
+and cache lookups by the backends in core.cache.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_local_hits = 0
+        # имя лимита core.ratelimit, отклонившего запрос
+        self.ratelimited = None
+        self._rendering = False
+
+    def execute(self, execute, sql, params, many, context):
+        """Database execute wrapper, see connection.execute_wrapper()."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    @contextmanager
+    def rendering(self):
+        # вложенный рендер (render_to_string из шаблонного тега) уже
+        # входит во время внешнего
+        if self._rendering:
+            yield
+            return
+        self._rendering = True
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.template_time += time.perf_counter() - started
+            self._rendering = False
+
+
+def current():
+    """RequestMetrics of the request being served, or None."""
+    return _current.get()
+
+
+@contextmanager
+def collect(metrics):
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def cache_lookup(hits, misses):
+    metrics = current()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+def cache_local_hits(hits):
+    """Hits served from process memory by core.cache.TieredCache."""
+    metrics = current()
+    if metrics is not None:
+        metrics.cache_local_hits += hits
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a non-empty sequence."""
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
@@ -0,0 +1,98 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import db_routers
+from . import metrics as request_metrics
+
+logger = logging.getLogger('core.requests')
+
+
+class RequestMetricsMiddleware:
+    """Measures every request: SQL queries and their time, template render
+    time, cache hits and misses, response size.
+
+    One JSON line per request goes to the core.requests logger, at WARNING
+    if the request is over REQUEST_TIME_BUDGET_MS or REQUEST_QUERY_BUDGET.
+    With SERVER_TIMING the numbers are also sent in a Server-Timing header.
+    Place it first in MIDDLEWARE so that the other middleware is measured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = request_metrics.RequestMetrics()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            stack.enter_context(request_metrics.collect(metrics))
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(metrics.execute))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'template_ms': round(metrics.template_time * 1000, 2),
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+            'cache_local_hits': metrics.cache_local_hits,
+            'size': None if response.streaming else len(response.content),
+            'ratelimited': metrics.ratelimited,
+        }
+        fields['slow'] = (
+            fields['duration_ms'] > settings.REQUEST_TIME_BUDGET_MS
+            or metrics.queries > settings.REQUEST_QUERY_BUDGET)
+        logger.log(logging.WARNING if fields['slow'] else logging.INFO,
+                   json.dumps(fields, ensure_ascii=False))
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = server_timing(fields)
+        return response
+
+
+class ReplicaMiddleware:
+    """Serves GET and HEAD requests from the read replicas.
+
+    A request that writes sets a cookie that keeps the client's requests on
+    the primary for READ_YOUR_WRITES_SECONDS, longer than the replicas are
+    expected to lag. Other methods always read from the primary.
+    """
+    COOKIE = 'read_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+        primary = (request.method not in ('GET', 'HEAD')
+                   or self.COOKIE in request.COOKIES)
+        with db_routers.replica_reads(primary) as state:
+            response = self.get_response(request)
+        if state.wrote:
+            response.set_cookie(
+                self.COOKIE, '1', max_age=settings.READ_YOUR_WRITES_SECONDS,
+                httponly=True, samesite='Lax')
+        return response
+
+
+def server_timing(fields):
+    return ', '.join((
+        f'db;dur={fields["db_ms"]};desc="{fields["queries"]} queries"',
+        f'tpl;dur={fields["template_ms"]}',
+        f'cache;desc="{fields["cache_hits"]} hits '
+        f'({fields["cache_local_hits"]} local), '
+        f'{fields["cache_misses"]} misses"',
+        f'total;dur={fields["duration_ms"]}',
+    ))
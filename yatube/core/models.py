@@ -1,12 +1,60 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Value, When
+
+# строк на один UPDATE дат: по пять параметров на строку
+DATES_BATCH_SIZE = 100
 
 
 class PubDateModels(models.Model):
-    """Abstract model. Adds post creation date."""
+    """Abstract model. Adds post creation and modification dates."""
     pub_date = models.DateTimeField(
         'publication date',
         auto_now_add=True,
         db_index=True)
+    modified = models.DateTimeField(
+        'modification date',
+        auto_now=True)
 
     class Meta:
         abstract = True
+
+
+def _by_pk(model, name, values):
+    """CASE giving each primary key its value of the field."""
+    field = model._meta.get_field(name)
+    return Case(*(When(pk=pk, then=Value(value, output_field=field))
+                  for pk, value in values))
+
+
+def bulk_create_keeping_dates(model, objs):
+    """bulk_create() for PubDateModels that keeps the pub_date and modified
+    set on the objects and gives them their new primary keys.
+
+    bulk_create() stamps both fields with the current time; an UPDATE by
+    primary key puts the given dates back. The auto_now flags of the
+    fields stay untouched: other threads may be saving meanwhile.
+    """
+    objs = list(objs)
+    if not objs:
+        return objs
+    dates = [(obj.pub_date, obj.modified) for obj in objs]
+    with transaction.atomic():
+        model.objects.bulk_create(objs)
+        if objs[0].pk is None:
+            # SQLite не возвращает id из bulk_create; до конца транзакции
+            # других писателей нет, так что последние id — наши, по порядку
+            ids = model.objects.order_by('-pk').values_list(
+                'pk', flat=True)[:len(objs)]
+            for obj, pk in zip(objs, reversed(list(ids))):
+                obj.pk = pk
+        pairs = list(zip(objs, dates))
+        for start in range(0, len(pairs), DATES_BATCH_SIZE):
+            batch = pairs[start:start + DATES_BATCH_SIZE]
+            model.objects.filter(pk__in=[obj.pk for obj, _ in batch]).update(
+                pub_date=_by_pk(model, 'pub_date', [
+                    (obj.pk, pub_date) for obj, (pub_date, _) in batch]),
+                modified=_by_pk(model, 'modified', [
+                    (obj.pk, modified) for obj, (_, modified) in batch]))
+    for obj, (pub_date, modified) in zip(objs, dates):
+        obj.pub_date, obj.modified = pub_date, modified
+    return objs
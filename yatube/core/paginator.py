@@ -0,0 +1,284 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db import connections, router
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_token(data):
+    """Packs JSON-serializable data into an opaque URL-safe token."""
+    raw = json.dumps(data).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Reverses encode_token(); raises ValueError on a malformed token."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        return json.loads(raw.decode())
+    except binascii.Error as error:
+        raise ValueError(str(error))
+
+
+class CursorPage(Sequence):
+    """One page of a keyset paginated queryset.
+
+    Unlike django.core.paginator.Page it knows nothing about the total
+    number of objects, only whether there is something before or after it.
+    """
+
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset (seek) paginator.
+
+    Pages are addressed by opaque cursors holding the ordering values of the
+    last (or first) object seen, so every page is a single indexed
+    ``WHERE ... ORDER BY ... LIMIT`` query without OFFSET and COUNT(*).
+    The ordering must be unique, hence the primary key as a tie-breaker.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = tuple(name.lstrip('-') for name in self.ordering)
+
+    def encode_cursor(self, direction, obj):
+        values = [self._field(name).value_to_string(obj)
+                  for name in self.fields]
+        return encode_token([direction, values])
+
+    def decode_cursor(self, cursor):
+        """Returns (direction, values) or None for a malformed cursor."""
+        try:
+            direction, values = decode_token(cursor)
+            if direction not in (NEXT, PREVIOUS):
+                return None
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                return None
+            # null, bool, списки и объекты не годятся для сравнения в WHERE
+            if not all(isinstance(value, (str, int, float))
+                       and not isinstance(value, bool) for value in values):
+                return None
+            values = [self._field(name).to_python(value)
+                      for name, value in zip(self.fields, values)]
+            if any(value is None for value in values):
+                return None
+            return direction, values
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def get_page(self, cursor=None):
+        """Returns a page, falling back to the first one on a bad cursor."""
+        decoded = self.decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            return self._page_after(None)
+        direction, values = decoded
+        if direction == PREVIOUS:
+            return self._page_before(values)
+        return self._page_after(values)
+
+    def _field(self, name):
+        return self.object_list.model._meta.get_field(name)
+
+    def _seek(self, values, reverse):
+        """Builds the keyset condition "strictly after values" for the
+        ordering (or "strictly before" when reverse is set)."""
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, values):
+            field = name.lstrip('-')
+            descending = name.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def _page_after(self, values):
+        queryset = self.object_list.order_by(*self.ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, reverse=False))
+        objects = list(queryset[:self.per_page + 1])
+        has_next = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        return CursorPage(
+            objects, self,
+            next_cursor=(self.encode_cursor(NEXT, objects[-1])
+                         if has_next else None),
+            previous_cursor=(self.encode_cursor(PREVIOUS, objects[0])
+                             if values is not None and objects else None),
+        )
+
+    def _page_before(self, values):
+        reverse_ordering = [name[1:] if name.startswith('-') else f'-{name}'
+                            for name in self.ordering]
+        queryset = self.object_list.order_by(*reverse_ordering).filter(
+            self._seek(values, reverse=True))
+        objects = list(queryset[:self.per_page + 1])
+        has_previous = len(objects) > self.per_page
+        objects = objects[:self.per_page][::-1]
+        if not objects:
+            return self._page_after(None)
+        return CursorPage(
+            objects, self,
+            next_cursor=self.encode_cursor(NEXT, objects[-1]),
+            previous_cursor=(self.encode_cursor(PREVIOUS, objects[0])
+                             if has_previous else None),
+        )
+
+
+def cached_count(queryset, key, timeout):
+    """COUNT(*) of the queryset as a callable for WindowedPaginator, run at
+    most once per timeout seconds and shared through the cache."""
+    return lambda: cache.get_or_set(key, queryset.count, timeout)
+
+
+class WindowedPage(Page):
+    """A numbered page that knows whether a next page exists from its own
+    query rather than from the total count."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    @property
+    def last_page_number(self):
+        # приблизительный счётчик мог отстать от таблицы
+        return max(self.paginator.num_pages, self.number + self._has_next)
+
+    def page_window(self):
+        """Numbers of the first, the last and the pages within
+        paginator.window of this one; None marks a gap."""
+        window = self.paginator.window
+        around = range(max(1, self.number - window),
+                       min(self.last_page_number, self.number + window) + 1)
+        numbers, previous = [], 0
+        for number in sorted({1, self.last_page_number, *around}):
+            if number - previous > 1:
+                numbers.append(None)
+            numbers.append(number)
+            previous = number
+        return numbers
+
+
+class WindowedPaginator(Paginator):
+    """Numbered pages without an exact COUNT(*) and without links to every
+    page.
+
+    count is the number of objects if it is known otherwise, e.g. from a
+    maintained counter: an int or a callable, evaluated only when the page
+    links are rendered; None falls back to COUNT(*). The count only shapes
+    the links: every page fetches one extra row to learn whether a next
+    page exists, so a stale count never hides or invents posts.
+    """
+    is_cursor = False
+
+    def __init__(self, object_list, per_page, count=None, window=2):
+        super().__init__(object_list, per_page)
+        self.known_count = count
+        self.window = window
+
+    @cached_property
+    def count(self):
+        if self.known_count is None:
+            return super().count
+        if callable(self.known_count):
+            return self.known_count()
+        return self.known_count
+
+    def get_page(self, number):
+        """Returns a page, falling back to the first one on a bad number
+        and to the last one past the end."""
+        try:
+            number = max(1, int(number))
+        except (TypeError, ValueError):
+            number = 1
+        bottom = (number - 1) * self.per_page
+        objects = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not objects and number > 1:
+            # за концом выборки: последнюю страницу считаем точно
+            self.known_count = None
+            for name in ('count', 'num_pages'):
+                self.__dict__.pop(name, None)
+            return self.get_page(min(number - 1, self.num_pages))
+        return WindowedPage(objects[:self.per_page], number, self,
+                            has_next=len(objects) > self.per_page)
+
+
+def estimated_count(model):
+    """Approximate number of rows of the model without COUNT(*): the
+    planner statistics on PostgreSQL, the largest id elsewhere (too high
+    by the number of deleted rows)."""
+    connection = connections[router.db_for_read(model)]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [model._meta.db_table])
+            row = cursor.fetchone()
+        # до первого ANALYZE статистики нет
+        if row and row[0] > 0:
+            return int(row[0])
+    return model._default_manager.aggregate(top=Max('pk'))['top'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator for admin changelists of large tables.
+
+    An unfiltered list is counted with estimated_count(); a filtered one
+    with COUNT(*) over at most ADMIN_COUNT_LIMIT rows, so the pages past
+    the limit are not linked. Pass show_full_result_count = False to the
+    ModelAdmin as well, or the changelist runs its own COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            return estimated_count(queryset.model)
+        return queryset.order_by()[:settings.ADMIN_COUNT_LIMIT].count()
@@ -0,0 +1,115 @@
+"""Rate limits for the views that write.
+
+A limit is a token bucket per client: it holds up to `count` tokens, is
+refilled continuously at `count` tokens per `period` seconds, and every
+request takes a token. The bucket is stored in the RATELIMIT_CACHE as
+(tokens, time of the last refill); a check reads it, refills it for the
+time passed and writes it back under a short lock taken with cache.add(),
+so concurrent requests of one client do not both spend the same token.
+Clients are told apart by user id when logged in and by IP address
+(request.META[RATELIMIT_IP_HEADER]) otherwise.
+
+Limits are named entries of RATELIMITS. @ratelimit(name) guards a view,
+RateLimitMiddleware applies the 'default' limit to every request that is
+not GET, HEAD or OPTIONS. A rejected request gets 429 with Retry-After and
+the name of the limit goes to the request log (core.requests).
+
+add() is atomic on Redis and Memcached; on the file cache used without
+REDIS_URL it is not, and two processes may occasionally both take the lock.
+A lock that stays busy for LOCK_WAIT seconds is skipped rather than waited
+for: a limit must not stall the request it guards.
+"""
+import math
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+from .views import too_many_requests
+
+LOCK_TIMEOUT = 1
+LOCK_WAIT = 0.05
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def client(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f'ip:{request.META.get(settings.RATELIMIT_IP_HEADER, "")}'
+
+
+@contextmanager
+def locked(store, key):
+    lock = f'{key}:lock'
+    deadline = time.monotonic() + LOCK_WAIT
+    acquired = store.add(lock, 1, LOCK_TIMEOUT)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.005)
+        acquired = store.add(lock, 1, LOCK_TIMEOUT)
+    try:
+        yield
+    finally:
+        if acquired:
+            store.delete(lock)
+
+
+def take(name, request):
+    """Takes a token from the client's bucket of the limit; returns None
+    if there was one, else the seconds until a token is refilled."""
+    if not settings.RATELIMIT_ENABLED or name not in settings.RATELIMITS:
+        return None
+    count, period = settings.RATELIMITS[name]
+    rate = count / period
+    key = f'ratelimit:{name}:{client(request)}'
+    store = caches[settings.RATELIMIT_CACHE]
+    with locked(store, key):
+        now = time.time()
+        tokens, refilled = store.get(key, (count, now))
+        tokens = min(count, tokens + (now - refilled) * rate)
+        if tokens < 1:
+            return max(1, math.ceil((1 - tokens) / rate))
+        # пустая корзина наполняется за period: дольше её хранить незачем
+        store.set(key, (tokens - 1, now), period)
+    return None
+
+
+def rejected(request, name, retry_after):
+    current = metrics.current()
+    if current is not None:
+        current.ratelimited = name
+    response = too_many_requests(request, retry_after)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(name, methods=('POST',)):
+    """Limits the methods of the view to RATELIMITS[name] per client."""
+    def decorator(view):
+        @wraps(view)
+        def limited(request, *args, **kwargs):
+            if request.method in methods:
+                retry_after = take(name, request)
+                if retry_after is not None:
+                    return rejected(request, name, retry_after)
+            return view(request, *args, **kwargs)
+        return limited
+    return decorator
+
+
+class RateLimitMiddleware:
+    """Applies RATELIMITS['default'] to every unsafe request. Place it
+    after AuthenticationMiddleware so that users are told apart by id."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in SAFE_METHODS:
+            retry_after = take('default', request)
+            if retry_after is not None:
+                return rejected(request, 'default', retry_after)
+        return self.get_response(request)
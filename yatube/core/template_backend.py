@@ -0,0 +1,23 @@
+"""Django template backend that reports render time to core.metrics."""
+from django.template.backends import django
+
+from . import metrics
+
+
+class Template(django.Template):
+
+    def render(self, context=None, request=None):
+        current = metrics.current()
+        if current is None:
+            return super().render(context, request)
+        with current.rendering():
+            return super().render(context, request)
+
+
+class DjangoTemplates(django.DjangoTemplates):
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
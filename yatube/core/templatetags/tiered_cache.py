@@ -0,0 +1,48 @@
+"""{% cache %} with single-flight rendering.
+
+Same syntax as django.templatetags.cache; on a cache with get_or_compute()
+(core.cache.TieredCache) a missing fragment is rendered by one request
+while concurrent requests for it wait for the result.
+"""
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags import cache as django_cache
+
+register = template.Library()
+
+
+class SingleFlightCacheNode(django_cache.CacheNode):
+
+    def render(self, context):
+        fragment_cache = self.get_cache(context)
+        if not hasattr(fragment_cache, 'get_or_compute'):
+            return super().render(context)
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+            if expire_time is not None:
+                expire_time = int(expire_time)
+        except (template.VariableDoesNotExist, ValueError, TypeError):
+            raise template.TemplateSyntaxError(
+                f'"cache" tag got a bad timeout: {self.expire_time_var}')
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return fragment_cache.get_or_compute(
+            make_template_fragment_key(self.fragment_name, vary_on),
+            lambda: self.nodelist.render(context),
+            expire_time)
+
+    def get_cache(self, context):
+        if self.cache_name:
+            return caches[self.cache_name.resolve(context)]
+        try:
+            return caches['template_fragments']
+        except InvalidCacheBackendError:
+            return caches['default']
+
+
+@register.tag('cache')
+def do_cache(parser, token):
+    node = django_cache.do_cache(parser, token)
+    return SingleFlightCacheNode(node.nodelist, node.expire_time_var,
+                                 node.fragment_name, node.vary_on,
+                                 node.cache_name)
@@ -0,0 +1,45 @@
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Runs the tests with rate limits off: the buckets live in the shared
+    cache between runs. core.tests.test_ratelimit turns them back on.
+
+    The shared cache and the request log are moved to a temporary
+    directory, so that cache.clear() in the tests keeps the site's pages and
+    sessions and the test requests stay out of REQUEST_LOG_FILE."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.RATELIMIT_ENABLED = False
+        self.temp_dir = tempfile.mkdtemp(prefix='yatube-tests-')
+        request_log = os.path.join(self.temp_dir, 'requests.log')
+        shared = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(self.temp_dir, 'cache'),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+        self.temp_settings = override_settings(
+            CACHES={**settings.CACHES, 'shared': shared},
+            REQUEST_LOG_FILE=request_log)
+        self.temp_settings.enable()
+        # обработчик из LOGGING уже создан с путём из настроек
+        self.request_logger = logging.getLogger('core.requests')
+        self.saved_handlers = self.request_logger.handlers
+        self.request_logger.handlers = [
+            logging.FileHandler(request_log, delay=True)]
+
+    def teardown_test_environment(self, **kwargs):
+        for handler in self.request_logger.handlers:
+            handler.close()
+        self.request_logger.handlers = self.saved_handlers
+        self.temp_settings.disable()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
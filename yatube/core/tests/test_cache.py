@@ -0,0 +1,115 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.core.cache import caches
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from core import cache as core_cache
+from core import checks
+
+SHARED = 'tiered-test'
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': SHARED,
+        'OPTIONS': {'LOCAL_EXCLUDE': ['stamp:'], 'EPOCH_INTERVAL': 0},
+    },
+    SHARED: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': SHARED,
+    },
+})
+class TieredCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = caches['default']
+        self.cache._local = core_cache._local_tiers[SHARED] = (
+            core_cache.LocalTier())
+        self.shared = caches[SHARED]
+        self.cache.clear()
+
+    def test_local_tier_serves_repeated_reads(self):
+        self.cache.set('key', 'value')
+        # запись мимо L1, как из другого процесса
+        self.shared.set('key', 'changed')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.stats()['local_hits'], 1)
+
+    def test_excluded_keys_are_read_from_shared_tier(self):
+        self.cache.set('stamp:index', 1)
+        self.shared.set('stamp:index', 2)
+        self.assertEqual(self.cache.get('stamp:index'), 2)
+
+    def test_delete_in_another_process_drops_local_tier(self):
+        self.cache.set('key', 'value')
+        self.cache.get('key')
+        self.shared.delete('key')
+        self.shared.set(core_cache.BaseTieredCache.EPOCH_KEY, 'other')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.stats()['epoch_flushes'], 1)
+
+    def test_get_many_mixes_tiers(self):
+        self.cache.set('local', 1)
+        self.shared.set('shared', 2)
+        self.assertEqual(self.cache.get_many(['local', 'shared', 'none']),
+                         {'local': 1, 'shared': 2})
+
+    def test_get_or_compute_is_single_flight(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            self.cache.get_or_compute('key', compute))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+
+    def test_get_or_compute_waits_for_another_process(self):
+        self.shared.add('key:computing', 1)
+        timer = threading.Timer(0.1, self.shared.set, ('key', 'theirs'))
+        timer.start()
+        value = self.cache.get_or_compute('key', lambda: 'ours')
+        timer.join()
+        self.assertEqual(value, 'theirs')
+        self.assertEqual(self.cache.stats()['waits'], 1)
+
+    def test_fragment_tag_renders_once(self):
+        template = Template(
+            '{% load tiered_cache %}{% cache 60 fragment %}'
+            '{{ counter.next }}{% endcache %}')
+        counter = iter(range(10))
+        context = {'counter': {'next': lambda: next(counter)}}
+        first = template.render(Context(context))
+        self.assertEqual(template.render(Context(context)), first)
+
+
+class FileCachePermissionsCheckTest(SimpleTestCase):
+
+    def check(self, mode):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        os.chmod(directory, mode)
+        caches_setting = {'files': {'BACKEND': checks.FILE_CACHE,
+                                    'LOCATION': directory}}
+        with override_settings(CACHES=caches_setting):
+            return checks.check_file_cache_permissions(None)
+
+    def test_private_directory(self):
+        self.assertEqual(self.check(0o700), [])
+
+    def test_shared_directory(self):
+        self.assertEqual([warning.id for warning in self.check(0o777)],
+                         ['core.W001'])
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.db_routers import (PrimaryReplicaRouter, read_primary,
+                             replica_reads)
+from core.middleware import ReplicaMiddleware
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2'])
+class PrimaryReplicaRouterTest(SimpleTestCase):
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_reads_go_to_replicas_until_a_write(self):
+        with replica_reads() as state:
+            self.assertIn(self.router.db_for_read(Post),
+                          {'replica1', 'replica2'})
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertTrue(state.wrote)
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_pinned_requests_use_primary(self):
+        with replica_reads(primary=True):
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_read_primary_moves_rest_of_request(self):
+        read_primary()
+        with replica_reads() as state:
+            self.assertIn(self.router.db_for_read(Post),
+                          {'replica1', 'replica2'})
+            read_primary()
+            self.assertTrue(state.primary)
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_without_replicas(self):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_only_primary_is_migrated(self):
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+
+# «реплика» — та же база: проверяется маршрутизация, а не репликация
+@override_settings(REPLICA_DATABASES=['default'])
+class ReplicaMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.client.force_login(self.user)
+
+    @override_settings(REPLICA_DATABASES=['replica1'])
+    def test_transactions_read_from_primary(self):
+        with replica_reads(), transaction.atomic():
+            self.assertEqual(PrimaryReplicaRouter().db_for_read(Post),
+                             'default')
+
+    def test_write_pins_client_to_primary(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(ReplicaMiddleware.COOKIE, response.cookies)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий'})
+        cookie = response.cookies[ReplicaMiddleware.COOKIE]
+        self.assertEqual(cookie['max-age'], 10)
+        self.assertTrue(cookie['httponly'])
@@ -0,0 +1,75 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+class RequestMetricsTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='NoName')
+        self.post = Post.objects.create(author=self.user, text='Тестовый пост')
+
+    def request_log(self, url):
+        with self.assertLogs('core.requests', 'INFO') as logs:
+            response = self.client.get(url)
+        return response, json.loads(logs.records[-1].getMessage())
+
+    @override_settings(SERVER_TIMING=True)
+    def test_request_is_measured(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        with self.assertNumQueries(3) as queries:
+            response, fields = self.request_log(url)
+        self.assertEqual(fields['view'], 'posts:post_detail')
+        self.assertEqual(fields['status'], 200)
+        self.assertEqual(fields['queries'], len(queries))
+        self.assertEqual(fields['size'], len(response.content))
+        self.assertGreater(fields['template_ms'], 0)
+        self.assertFalse(fields['slow'])
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_can_be_off(self):
+        response, fields = self.request_log(reverse('posts:index'))
+        self.assertGreater(fields['template_ms'], 0)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_cache_hits_and_misses(self):
+        _, first = self.request_log(reverse('posts:index'))
+        _, second = self.request_log(reverse('posts:index'))
+        self.assertGreater(first['cache_misses'], 0)
+        self.assertEqual(second['cache_misses'], 0)
+        self.assertGreater(second['cache_hits'], 0)
+
+    @override_settings(REQUEST_QUERY_BUDGET=0)
+    def test_request_over_budget_is_flagged(self):
+        with self.assertLogs('core.requests', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertTrue(json.loads(logs.records[-1].getMessage())['slow'])
+
+    def test_request_report(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.log') as log:
+            for duration in (10, 20, 30):
+                record = {'view': 'posts:index', 'duration_ms': duration,
+                          'queries': 2, 'db_ms': 1, 'template_ms': 3,
+                          'cache_hits': 1, 'cache_misses': 1,
+                          'slow': duration > 25}
+                log.write(f'INFO {json.dumps(record)}\n')
+            log.write('строка не из лога метрик\n')
+            log.flush()
+            out = StringIO()
+            call_command('request_report', log.name, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(len(report), 1)
+        self.assertEqual(report[0]['requests'], 3)
+        self.assertEqual(report[0]['p50_ms'], 20)
+        self.assertEqual(report[0]['slow'], 1)
+        self.assertEqual(report[0]['cache_hit_ratio'], 0.5)
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from posts.models import Post
+
+from ..models import bulk_create_keeping_dates
+
+User = get_user_model()
+
+
+class BulkCreateKeepingDatesTest(TestCase):
+
+    def test_dates_and_ids_of_every_object(self):
+        author = User.objects.create_user(username='author')
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        posts = [Post(author=author, text=str(number),
+                      pub_date=start + timedelta(days=number),
+                      modified=start + timedelta(days=number, hours=1))
+                 for number in range(3)]
+        field = Post._meta.get_field('pub_date')
+        stamp = datetime(2030, 1, 1, tzinfo=timezone.utc)
+        # все строки получают от bulk_create одинаковое время
+        with mock.patch('django.utils.timezone.now', return_value=stamp), \
+                mock.patch('core.models.DATES_BATCH_SIZE', 2):
+            bulk_create_keeping_dates(Post, posts)
+        self.assertTrue(field.auto_now_add)
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list(
+                'pk', 'text', 'pub_date', 'modified')),
+            [(post.pk, post.text, post.pub_date, post.modified)
+             for post in posts])
+        self.assertEqual(posts[1].pub_date, start + timedelta(days=1))
@@ -0,0 +1,41 @@
+from django.test import SimpleTestCase
+
+from core.paginator import WindowedPaginator
+
+
+class WindowedPaginatorTest(SimpleTestCase):
+
+    def test_window_around_current_page(self):
+        paginator = WindowedPaginator(list(range(1000)), 10, count=1000,
+                                      window=2)
+        self.assertEqual(paginator.get_page(50).page_window(),
+                         [1, None, 48, 49, 50, 51, 52, None, 100])
+        self.assertEqual(paginator.get_page(2).page_window(),
+                         [1, 2, 3, 4, None, 100])
+        self.assertEqual(paginator.get_page(100).page_window(),
+                         [1, None, 98, 99, 100])
+
+    def test_count_is_lazy(self):
+        def count():
+            raise AssertionError('count() called')
+
+        page = WindowedPaginator(list(range(25)), 10, count=count).get_page(2)
+        self.assertEqual(list(page), list(range(10, 20)))
+        self.assertTrue(page.has_next())
+        self.assertEqual(page.next_page_number(), 3)
+
+    def test_stale_count_does_not_hide_pages(self):
+        paginator = WindowedPaginator(list(range(25)), 10, count=0)
+        page = paginator.get_page(2)
+        self.assertTrue(page.has_next())
+        self.assertEqual(page.last_page_number, 3)
+        page = paginator.get_page(3)
+        self.assertEqual(list(page), list(range(20, 25)))
+        self.assertFalse(page.has_next())
+
+    def test_past_the_end_falls_back_to_exact_last_page(self):
+        paginator = WindowedPaginator(list(range(25)), 10, count=1000)
+        page = paginator.get_page(50)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(paginator.count, 25)
+        self.assertEqual(paginator.get_page('nope').number, 1)
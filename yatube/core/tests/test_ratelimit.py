@@ -0,0 +1,93 @@
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow
+
+from .. import ratelimit
+
+User = get_user_model()
+
+
+@override_settings(RATELIMIT_ENABLED=True,
+                   RATELIMITS={'default': (3, 60), 'follow': (2, 60),
+                               'signup': (1, 3600)})
+class RateLimitTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self) -> None:
+        caches['shared'].clear()
+
+    def test_view_limit_per_user(self):
+        self.client.force_login(self.user)
+        follow = reverse('posts:profile_follow', args=['author'])
+        unfollow = reverse('posts:profile_unfollow', args=['author'])
+        self.assertEqual(self.client.get(follow).status_code, 302)
+        self.assertEqual(self.client.get(unfollow).status_code, 302)
+        response = self.client.get(follow)
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(1 <= int(response['Retry-After']) <= 60)
+        self.assertFalse(Follow.objects.exists())
+
+        # у другого пользователя своя корзина
+        self.client.force_login(self.author)
+        self.assertEqual(
+            self.client.get(reverse('posts:profile_follow',
+                                    args=['user'])).status_code, 302)
+
+    def test_anonymous_clients_by_ip(self):
+        url = reverse('users:signup')
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertEqual(self.client.post(url).status_code, 429)
+        self.assertEqual(
+            self.client.post(url, REMOTE_ADDR='10.0.0.2').status_code, 200)
+        # GET не расходует лимит
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_default_limit_and_log(self):
+        url = reverse('users:login')
+        for _ in range(3):
+            self.assertEqual(self.client.post(url).status_code, 200)
+        with self.assertLogs('core.requests') as logs:
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertTemplateUsed(response, 'core/429.html')
+        self.assertEqual(
+            json.loads(logs.records[-1].getMessage())['ratelimited'],
+            'default')
+
+    def test_bucket_refills_continuously(self):
+        request = RequestFactory().post('/')
+        with mock.patch('core.ratelimit.time.time') as clock:
+            # два запроса в конце минуты и один в начале следующей:
+            # граница окна не удваивает лимит
+            clock.return_value = 1059.0
+            self.assertIsNone(ratelimit.take('follow', request))
+            self.assertIsNone(ratelimit.take('follow', request))
+            clock.return_value = 1061.0
+            self.assertEqual(ratelimit.take('follow', request), 28)
+            # токен возвращается через period / count секунд
+            clock.return_value = 1089.0
+            self.assertIsNone(ratelimit.take('follow', request))
+            self.assertEqual(ratelimit.take('follow', request), 30)
+
+    def test_busy_lock_does_not_block(self):
+        request = RequestFactory().post('/')
+        store = caches['shared']
+        store.set(f'ratelimit:follow:{ratelimit.client(request)}:lock', 1)
+        self.assertIsNone(ratelimit.take('follow', request))
+
+    @override_settings(RATELIMIT_ENABLED=False)
+    def test_disabled(self):
+        for _ in range(5):
+            self.assertEqual(
+                self.client.post(reverse('users:login')).status_code, 200)
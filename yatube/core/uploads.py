@@ -0,0 +1,33 @@
+"""Upload handlers."""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """Stops keeping a file once it grows past UPLOAD_MAX_SIZE.
+
+    The handlers after this one get no more chunks of the file, so nothing
+    past the limit is buffered in memory or written to disk. The form gets
+    an empty file that reports the real size instead, and its field rejects
+    it with a message rather than the upload silently disappearing.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_SIZE:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received <= settings.UPLOAD_MAX_SIZE:
+            return None
+        return InMemoryUploadedFile(
+            BytesIO(), self.field_name, self.file_name, self.content_type,
+            self.received, self.charset, self.content_type_extra)
@@ -16,3 +16,8 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def too_many_requests(request, retry_after):
+    return render(request, 'core/429.html', {'retry_after': retry_after},
+                  status=429)
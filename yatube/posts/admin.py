@@ -1,15 +1,98 @@
+import datetime
+
 from django.contrib import admin
+from django.db.models import Min
+from django.utils import timezone
+
+from core.paginator import EstimatedCountPaginator
+from . import search
+from .models import Comment, Follow, Group, Post, PostQuerySet
+
+
+def next_date(date, kind):
+    """The first day of the year, month or day after the date."""
+    if kind == 'year':
+        return datetime.date(date.year + 1, 1, 1)
+    if kind == 'month':
+        return datetime.date(date.year + date.month // 12,
+                             date.month % 12 + 1, 1)
+    return date + datetime.timedelta(days=1)
+
+
+class SeekDatesQuerySet(PostQuerySet):
+    """dates() for date_hierarchy that seeks the pub_date index once per
+    year, month or day it returns instead of a DISTINCT over every row."""
+
+    def dates(self, field_name, kind, order='ASC'):
+        rows = self.order_by()
+        found = []
+        first = rows.aggregate(first=Min(field_name))['first']
+        while first is not None:
+            date = timezone.localtime(first).date()
+            date = date.replace(**{'year': {'month': 1, 'day': 1},
+                                   'month': {'day': 1}}.get(kind, {}))
+            found.append(date)
+            start = timezone.make_aware(datetime.datetime.combine(
+                next_date(date, kind), datetime.time.min))
+            first = rows.filter(**{f'{field_name}__gte': start}).aggregate(
+                first=Min(field_name))['first']
+        return found if order == 'ASC' else found[::-1]
+
 
-from .models import Post, Group
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist of a table with millions of rows: estimated counts
+    instead of COUNT(*), related rows joined, no <select> of every user."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
 
 
-class PostAdmin(admin.ModelAdmin):
+@admin.register(Post)
+class PostAdmin(LargeTableAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
+    # поиск идёт по индексу posts.search (текст, группа, автор),
+    # а не LIKE-сканированием этих полей
     search_fields = ('text',)
     list_filter = ('pub_date',)
-    empty_value_display = '-пусто-'
+    date_hierarchy = 'pub_date'
+    ordering = ('-pub_date',)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return SeekDatesQuerySet(self.model, query=queryset.query,
+                                 using=queryset.db)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
+
+@admin.register(Comment)
+class CommentAdmin(LargeTableAdmin):
+    list_display = ('pk', 'text', 'pub_date', 'author', 'post')
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('author',)
+    # выбрать пост из миллионов можно только по id
+    raw_id_fields = ('post',)
+    # id растёт вместе с pub_date, а сортировка по нему не требует индекса
+    ordering = ('-pk',)
+
+
+@admin.register(Follow)
+class FollowAdmin(LargeTableAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    ordering = ('-pk',)
 
 
-admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+@admin.register(Group)
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug', 'posts_count')
+    # для автодополнения группы в PostAdmin
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
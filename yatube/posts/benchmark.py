@@ -0,0 +1,218 @@
+"""Benchmark of the posts URLs.
+
+Every scenario is driven through the Django test client, i.e. the full WSGI
+handler and middleware stack, and reports latency percentiles, queries,
+database and template rendering time per request, full table scans found by
+EXPLAIN QUERY PLAN, the database work and the peak Python memory allocated
+while serving one request.
+
+The database work stands in for rows read, which the sqlite3 module does
+not expose (sqlite3_stmt_status() is not wrapped): a progress handler
+counts the SQLite virtual machine instructions a request runs, which grow
+with the rows its queries visit.
+"""
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.metrics import percentile
+from . import search
+from .models import Group, Post, User
+
+Scenario = namedtuple('Scenario', 'name method url data user')
+
+# шаг счётчика инструкций SQLite: чаще — дороже сам подсчёт
+VM_STEP = 100
+
+
+def private_caches(directory):
+    """settings.CACHES with the shared store moved to the directory, so that
+    a run can clear it without logging out the site's users or resetting
+    their rate limits."""
+    return {**settings.CACHES, 'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': directory,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }}
+
+
+@contextmanager
+def vm_steps():
+    """Counts the SQLite instructions run inside, VM_STEP at a time, in
+    counted['steps']; it stays None on other databases."""
+    counted = {'steps': None}
+    if connection.vendor != 'sqlite':
+        yield counted
+        return
+    connection.ensure_connection()
+    counted['steps'] = 0
+
+    def tick():
+        counted['steps'] += VM_STEP
+        return 0
+
+    connection.connection.set_progress_handler(tick, VM_STEP)
+    try:
+        yield counted
+    finally:
+        connection.connection.set_progress_handler(None, VM_STEP)
+
+
+def full_scans(queries):
+    """Number of SQLite full table scans among the SELECT queries."""
+    if connection.vendor != 'sqlite':
+        return None
+    scans = 0
+    with connection.cursor() as cursor:
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            scans += sum(1 for *_, detail in cursor.fetchall()
+                         if detail.startswith('SCAN')
+                         and 'USING' not in detail
+                         and 'VIRTUAL TABLE' not in detail)
+    return scans
+
+
+def default_scenarios():
+    """One scenario per posts URL, on the busiest objects of the dataset."""
+    post = Post.objects.order_by('-comments_count').first()
+    group = Group.objects.order_by('-posts_count').first()
+    author = User.objects.order_by('-counters__posts_count').first()
+    follower = User.objects.order_by('-counters__following_count').first()
+    deep_page = max(1, Post.objects.count() // 10 // 2)
+    return [
+        Scenario('index', 'get', reverse('posts:index'), None, None),
+        Scenario('index_deep_page', 'get', reverse('posts:index'),
+                 {'page': deep_page}, None),
+        Scenario('group_posts', 'get',
+                 reverse('posts:group_list', args=[group.slug]), None, None),
+        Scenario('profile', 'get',
+                 reverse('posts:profile', args=[author.username]),
+                 None, None),
+        Scenario('post_detail', 'get',
+                 reverse('posts:post_detail', args=[post.pk]), None, None),
+        Scenario('post_comments', 'get',
+                 reverse('posts:post_comments', args=[post.pk]), None, None),
+        Scenario('follow_index', 'get', reverse('posts:follow_index'),
+                 None, follower),
+        Scenario('search', 'get', reverse('posts:search'),
+                 {'q': search.tokenize(post.text)[0]}, None),
+        Scenario('add_comment', 'post',
+                 reverse('posts:add_comment', args=[post.pk]),
+                 {'text': 'Комментарий из бенчмарка'}, follower),
+        # JSON API против соответствующих HTML-страниц
+        Scenario('api_posts', 'get', reverse('api:post_list'), None, None),
+        Scenario('api_group_posts', 'get', reverse('api:post_list'),
+                 {'group': group.slug}, None),
+        Scenario('api_profile', 'get',
+                 reverse('api:profile', args=[author.username]), None, None),
+        Scenario('api_post_detail', 'get',
+                 reverse('api:post_detail', args=[post.pk]), None, None),
+        Scenario('api_comments', 'get',
+                 reverse('api:comment_list', args=[post.pk]), None, None),
+        Scenario('api_follow', 'get', reverse('api:follow_feed'),
+                 None, follower),
+        Scenario('api_export', 'get', reverse('api:post_export'),
+                 None, None),
+    ]
+
+
+def consume(response):
+    """Reads a streaming response to the end: its queries run lazily."""
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def template_ms(response):
+    """Template rendering time from the Server-Timing header, 0 without."""
+    for metric in response.get('Server-Timing', '').split(','):
+        name, _, duration = metric.strip().partition(';dur=')
+        if name == 'tpl':
+            return float(duration)
+    return 0.0
+
+
+def run_scenario(scenario, requests, cold_cache=False):
+    client = Client()
+    if scenario.user is not None:
+        client.force_login(scenario.user)
+    send = getattr(client, scenario.method)
+    latencies, query_counts, db_times, render_times = [], [], [], []
+    for _ in range(requests):
+        if cold_cache:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = consume(send(scenario.url, scenario.data))
+            latencies.append((time.perf_counter() - started) * 1000)
+        assert response.status_code < 400, (scenario.name, response)
+        query_counts.append(len(captured))
+        db_times.append(sum(float(query['time']) for query in captured) * 1000)
+        render_times.append(template_ms(response))
+
+    if cold_cache:
+        cache.clear()
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as captured, vm_steps() as counted:
+        consume(send(scenario.url, scenario.data))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'rps': round(1000 * len(latencies) / sum(latencies), 1),
+        'queries': round(statistics.mean(query_counts), 2),
+        'db_ms': round(statistics.mean(db_times), 3),
+        'template_ms': round(statistics.mean(render_times), 3),
+        'full_scans': full_scans(captured.captured_queries),
+        'vm_steps': counted['steps'],
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run(requests=50, cold_cache=False, only=None):
+    results = {}
+    for scenario in default_scenarios():
+        if only and scenario.name not in only:
+            continue
+        results[scenario.name] = run_scenario(scenario, requests, cold_cache)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Regressions against a baseline: slower p95, more queries or more
+    database work."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: p95 {previous["p95_ms"]} -> {current["p95_ms"]} мс')
+        if current['queries'] > previous['queries']:
+            regressions.append(
+                f'{name}: запросов {previous["queries"]} -> '
+                f'{current["queries"]}')
+        steps, previous_steps = (current.get('vm_steps'),
+                                 previous.get('vm_steps'))
+        if steps and previous_steps and (
+                steps > previous_steps * (1 + tolerance)):
+            regressions.append(
+                f'{name}: шагов SQLite {previous_steps} -> {steps}')
+    return regressions
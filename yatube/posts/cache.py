@@ -0,0 +1,87 @@
+"""Version stamps for cached post pages.
+
+A stamp is the time of the last change inside a scope: the whole index
+feed, a group, an author or a single post. Cache keys and HTTP validators
+include the stamp, so touching a scope makes every cached variant of its
+pages unreachable at once, whatever page, cursor or auth state they were
+rendered for. Scopes are named by slug and username, the values found in
+the URLs, so reading a stamp needs no query.
+
+A stamp younger than READ_YOUR_WRITES_SECONDS may belong to a change the
+replicas have not received yet; a page cached under it would keep the old
+rows until the next change. Reading such a stamp sends the rest of the
+request to the primary database.
+"""
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from core import db_routers
+
+from .models import Group, User
+
+INDEX = 'index'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def owner_scopes(author_ids, group_ids):
+    """Scopes of the profiles and groups with the given ids."""
+    usernames = User.objects.filter(pk__in=author_ids).values_list(
+        'username', flat=True)
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True)
+    return ([author_scope(username) for username in usernames]
+            + [group_scope(slug) for slug in slugs])
+
+
+def stamp_key(scope):
+    # slug и username могут содержать не-ASCII символы
+    return f'posts:stamp:{quote(scope, safe=":")}'
+
+
+def get_stamp(scope):
+    return get_stamps(scope)[scope]
+
+
+def get_stamps(*scopes):
+    """{scope: stamp}; missing stamps start at the current time."""
+    keys = {stamp_key(scope): scope for scope in scopes}
+    stamps = cache.get_many(keys)
+    for key in keys.keys() - stamps.keys():
+        cache.add(key, time.time(), None)
+        stamps[key] = cache.get(key)
+    recent = time.time() - settings.READ_YOUR_WRITES_SECONDS
+    if any(stamp > recent for stamp in stamps.values()):
+        db_routers.read_primary()
+    return {scope: stamps[key] for key, scope in keys.items()}
+
+
+def touch(*scopes):
+    now = time.time()
+    cache.set_many({stamp_key(scope): now for scope in scopes}, None)
+
+
+def touch_on_commit(*scopes):
+    """Touches the scopes now and again once the transaction commits.
+
+    A page rendered between the two from the rows the transaction has not
+    committed yet carries the first stamp and is unreachable after the
+    second one, so it is never cached or revalidated as fresh.
+    """
+    touch(*scopes)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: touch(*scopes))
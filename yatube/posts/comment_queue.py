@@ -0,0 +1,180 @@
+"""Write-behind queue for new comments.
+
+With COMMENT_WRITE_MODE other than 'sync', add_comment validates the form
+and appends the comment to a local SQLite file (COMMENT_QUEUE_PATH) instead
+of writing it to the database: a hot post no longer makes every commenter
+wait for the database write lock. flush() moves queued comments into the
+database with one bulk_create per batch, updates the comment counters and
+touches the post pages. It runs in a background thread of the process that
+queued the comments (after COMMENT_QUEUE_INTERVAL seconds or as soon as a
+batch is full) and in manage.py flush_comments.
+
+A flush keeps the queue's write lock until the batch is committed to the
+database, so concurrent flushers take turns. If a flush stops between the
+database commit and the queue commit, the rows stay queued; the next flush
+skips those already written, recognised by post, author and the time they
+were queued.
+
+'eventual' shows a comment once it is flushed; 'read_your_writes' also
+shows the author their own queued comments right away (pending()).
+"""
+import logging
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from core.models import bulk_create_keeping_dates
+
+from . import cache, counters
+from .models import Comment, Post, User
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS comment (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    post_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    pub_date TEXT NOT NULL
+)'''
+
+_local = threading.local()
+_wakeup = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def enabled():
+    return settings.COMMENT_WRITE_MODE != 'sync'
+
+
+def _queue():
+    """Connection of this thread to the queue file."""
+    path = settings.COMMENT_QUEUE_PATH
+    queue = getattr(_local, 'connections', {}).get(path)
+    if queue is None:
+        queue = sqlite3.connect(path, timeout=30, isolation_level=None)
+        # WAL: добавление в очередь не ждёт, пока её читает flush()
+        queue.execute('PRAGMA journal_mode=WAL')
+        queue.execute('PRAGMA synchronous=FULL')
+        queue.execute(SCHEMA)
+        _local.connections = {**getattr(_local, 'connections', {}),
+                              path: queue}
+    return queue
+
+
+def enqueue(post_id, author_id, text):
+    """Queues a validated comment; it reaches the database on flush()."""
+    queued = _queue().execute(
+        'INSERT INTO comment (post_id, author_id, text, pub_date) '
+        'VALUES (?, ?, ?, ?)',
+        (post_id, author_id, text, timezone.now().isoformat()))
+    # автор видит свой комментарий, а не закешированную страницу
+    cache.touch(cache.post_scope(post_id))
+    if settings.COMMENT_QUEUE_WORKER:
+        _start_worker()
+    # id в очереди растут подряд: каждый COMMENT_QUEUE_BATCH-й комментарий
+    # будит поток, не считая строки очереди
+    if queued.lastrowid % settings.COMMENT_QUEUE_BATCH == 0:
+        _wakeup.set()
+
+
+def size():
+    return _queue().execute('SELECT COUNT(*) FROM comment').fetchone()[0]
+
+
+def pending(post_id, author):
+    """Queued comments of the author to the post, oldest first."""
+    rows = _queue().execute(
+        'SELECT text, pub_date FROM comment WHERE post_id = ? '
+        'AND author_id = ? ORDER BY id', (post_id, author.pk))
+    return [Comment(post_id=post_id, author=author, text=text,
+                    pub_date=datetime.fromisoformat(pub_date))
+            for text, pub_date in rows]
+
+
+def _written(batch):
+    """Ids of the queued rows already in the database."""
+    existing = set(Comment.objects.filter(
+        post_id__in={row[1] for row in batch},
+        pub_date__in={row[4] for row in batch}).values_list(
+        'post_id', 'author_id', 'pub_date'))
+    return {row[0] for row in batch
+            if (row[1], row[2], row[4]) in existing}
+
+
+def _write(batch):
+    """Writes the batch, skipping rows written before and rows whose post
+    or author was deleted meanwhile; returns the number written."""
+    batch = [(queue_id, post_id, author_id, text,
+              datetime.fromisoformat(pub_date))
+             for queue_id, post_id, author_id, text, pub_date in batch]
+    written = _written(batch)
+    posts = set(Post.objects.order_by().filter(
+        pk__in={row[1] for row in batch}).values_list('pk', flat=True))
+    authors = set(User.objects.filter(
+        pk__in={row[2] for row in batch}).values_list('pk', flat=True))
+    rows = [row for row in batch if row[0] not in written
+            and row[1] in posts and row[2] in authors]
+    # комментарий получает время постановки в очередь
+    comments = [Comment(post_id=post_id, author_id=author_id, text=text,
+                        pub_date=pub_date, modified=pub_date)
+                for queue_id, post_id, author_id, text, pub_date in rows]
+    with transaction.atomic():
+        bulk_create_keeping_dates(Comment, comments)
+        for post_id, count in Counter(
+                comment.post_id for comment in comments).items():
+            counters.change_post(post_id, count)
+    cache.touch(*{cache.post_scope(row[1]) for row in batch})
+    return len(comments)
+
+
+def flush(limit=None):
+    """Moves queued comments into the database in batches of
+    COMMENT_QUEUE_BATCH; returns the number of comments written."""
+    queue, total = _queue(), 0
+    while limit is None or total < limit:
+        queue.execute('BEGIN IMMEDIATE')
+        try:
+            batch = queue.execute(
+                'SELECT id, post_id, author_id, text, pub_date FROM comment '
+                'ORDER BY id LIMIT ?',
+                (settings.COMMENT_QUEUE_BATCH,)).fetchall()
+            if batch:
+                total += _write(batch)
+                queue.execute('DELETE FROM comment WHERE id <= ?',
+                              (batch[-1][0],))
+            queue.execute('COMMIT')
+        except BaseException:
+            queue.execute('ROLLBACK')
+            raise
+        if len(batch) < settings.COMMENT_QUEUE_BATCH:
+            break
+    return total
+
+
+def _run():
+    while True:
+        _wakeup.wait(settings.COMMENT_QUEUE_INTERVAL)
+        _wakeup.clear()
+        close_old_connections()
+        try:
+            flush()
+        except Exception:
+            logger.exception('Comment queue flush failed')
+        finally:
+            connection.close()
+
+
+def _start_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_run, name='comment-queue', daemon=True)
+            _worker.start()
@@ -0,0 +1,87 @@
+"""Conditional GET for the post pages.
+
+The validators of a page are built from the stamps of the scopes it shows
+(posts.cache), the user it is rendered for and the full path with the
+query string. A request whose If-None-Match or If-Modified-Since still
+matches gets a 304 before the view runs its queries or renders anything.
+Last-Modified is only sent to anonymous visitors: If-Modified-Since alone
+says nothing about the user a page was rendered for. The responses are
+Cache-Control: private, so shared caches do not keep them.
+
+A missing stamp (a cold or flushed cache) starts at the current time rather
+than at the latest Post.modified: deletions, follows and counters leave no
+trace in modified, and a stamp older than one already handed out could
+revalidate a stale page.
+"""
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from . import cache
+from .models import Post
+
+
+def index_scopes(request):
+    return [cache.INDEX]
+
+
+def group_scopes(request, slug):
+    return [cache.group_scope(slug)]
+
+
+def profile_scopes(request, username):
+    return [cache.author_scope(username)]
+
+
+def post_scopes(request, post_id):
+    # боковая панель поста показывает группу и счётчики автора
+    owners = Post.objects.filter(pk=post_id).order_by().values_list(
+        'author__username', 'group__slug').first()
+    if owners is None:
+        return None
+    username, slug = owners
+    scopes = [cache.post_scope(post_id), cache.author_scope(username)]
+    if slug:
+        scopes.append(cache.group_scope(slug))
+    return scopes
+
+
+def _stamps(request, scopes, kwargs):
+    # etag_func и last_modified_func вызываются по очереди для одного запроса
+    if not hasattr(request, '_page_stamps'):
+        names = scopes(request, **kwargs)
+        request._page_stamps = (
+            None if names is None else cache.get_stamps(*names))
+    return request._page_stamps
+
+
+def conditional_page(scopes):
+    """condition() with validators from the stamps of scopes(request,
+    **view_kwargs); scopes returns None for a page that does not exist."""
+
+    def etag(request, **kwargs):
+        stamps = _stamps(request, scopes, kwargs)
+        if stamps is None:
+            return None
+        user = request.user.pk if request.user.is_authenticated else None
+        raw = json.dumps([sorted(stamps.items()), user,
+                          request.get_full_path()])
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        stamps = _stamps(request, scopes, kwargs)
+        if not stamps:
+            return None
+        return datetime.fromtimestamp(max(stamps.values()), timezone.utc)
+
+    conditional = condition(etag_func=etag, last_modified_func=last_modified)
+    private = cache_control(private=True)
+
+    def decorator(view):
+        return private(conditional(view))
+    return decorator
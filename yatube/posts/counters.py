@@ -0,0 +1,76 @@
+"""Denormalized counters.
+
+Post, comment and follower counts are kept in Group.posts_count,
+Post.comments_count and UserCounters so that pages read a column instead
+of running COUNT(*). The signal handlers in posts.signals call these
+helpers; rebuild() recomputes everything from scratch.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+def for_user(user):
+    """Counters of the user, zeroed if the row does not exist yet.
+
+    Select the user with select_related('counters') to avoid a query.
+    """
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        return UserCounters(user=user)
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        # bulk_create и сырой SQL мимо сигналов могли оставить счётчик
+        # заниженным: не уходим ниже нуля, rebuild() всё поправит
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_user(user_id, field, delta):
+    """Adds delta to a UserCounters field, e.g. ('posts_count', 1)."""
+    if user_id is None:
+        return
+    queryset = UserCounters.objects.filter(user_id=user_id)
+    if not _change(queryset, field, delta) and delta > 0:
+        # пользователь появился раньше счётчиков: создаём строку на лету
+        UserCounters.objects.get_or_create(user_id=user_id)
+        _change(queryset, field, delta)
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        _change(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def change_post(post_id, delta):
+    if post_id is not None:
+        _change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _count(model, field, **extra):
+    """Correlated COUNT(*) subquery of model rows pointing to OuterRef."""
+    rows = model.objects.filter(**{field: OuterRef('pk')}, **extra)
+    return Coalesce(
+        Subquery(rows.order_by().values(field)
+                 .annotate(count=Count('pk')).values('count')),
+        Value(0)
+    )
+
+
+def rebuild():
+    """Recomputes every counter with a few UPDATE ... SELECT statements."""
+    UserCounters.objects.bulk_create(
+        (UserCounters(user_id=pk) for pk in User.objects.filter(
+            counters__isnull=True).values_list('pk', flat=True).iterator())
+    )
+    Group.objects.update(posts_count=_count(Post, 'group'))
+    Post.objects.update(comments_count=_count(Comment, 'post'))
+    UserCounters.objects.update(
+        posts_count=_count(Post, 'author'),
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+    )
@@ -1,13 +1,26 @@
+from django import forms
 from django.forms import ModelForm
 from django.utils.translation import gettext_lazy as _
 
+from . import images, thumbnails
 from .models import Post, Comment
 
 
+class PostImageField(forms.ImageField):
+    """Runs uploads through posts.images instead of keeping them as is."""
+
+    def to_python(self, data):
+        data = forms.FileField.to_python(self, data)
+        if data is None:
+            return None
+        return images.process(data)
+
+
 class PostForm(ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
+        field_classes = {'image': PostImageField}
         labels = {
             'text': _('Text of post'),
             'group': _('Group'),
@@ -17,6 +30,21 @@ class PostForm(ModelForm):
             'group': _('Select a group'),
         }
 
+    def save(self, commit=True):
+        image_changed = 'image' in self.changed_data
+        if image_changed and self.cleaned_data['image']:
+            # одинаковые картинки хранятся одним файлом
+            self.instance.image = images.store(self.cleaned_data['image'])
+        if image_changed:
+            # до готовности превью шаблоны показывают исходную картинку
+            self.instance.thumbnail_url = ''
+            self.instance.thumbnail_width = None
+            self.instance.thumbnail_height = None
+        post = super().save(commit)
+        if commit and image_changed:
+            thumbnails.schedule(post)
+        return post
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,89 @@
+"""Precomputed statistics of the group directory.
+
+GroupAuthorStats counts the posts of every author in every group and
+GroupStats keeps, per group, the date of the last post and the top
+GROUP_TOP_AUTHORS authors taken from those counts. The signal handlers in
+posts.signals call change() when a post enters or leaves a group, which
+updates a handful of rows through indexes, so directory() reads one row per
+group however many posts there are. rebuild() recomputes everything.
+"""
+import json
+
+from django.conf import settings
+from django.db.models import Count, F, Max
+
+from .models import Group, GroupAuthorStats, GroupStats, Post, User
+
+
+def for_group(group):
+    """Stats of the group, empty if the row does not exist yet.
+
+    Select the group with select_related('stats') to avoid a query.
+    """
+    try:
+        return group.stats
+    except GroupStats.DoesNotExist:
+        return GroupStats(group=group)
+
+
+def change(group_id, author_id, delta):
+    """Adds delta to the posts of the author in the group."""
+    if group_id is None:
+        return
+    tally = GroupAuthorStats.objects.filter(
+        group_id=group_id, author_id=author_id)
+    if delta < 0:
+        # строки с нулём удаляются, чтобы таблица не росла от переездов
+        tally.filter(posts_count__lte=-delta).delete()
+        tally.update(posts_count=F('posts_count') + delta)
+    elif not tally.update(posts_count=F('posts_count') + delta):
+        GroupAuthorStats.objects.create(
+            group_id=group_id, author_id=author_id, posts_count=delta)
+    refresh(group_id)
+
+
+def refresh(group_id):
+    """Recomputes the GroupStats row of the group from indexed reads."""
+    last_post_date = Post.objects.filter(group_id=group_id).aggregate(
+        last=Max('pub_date'))['last']
+    top = GroupAuthorStats.objects.filter(group_id=group_id).order_by(
+        '-posts_count', 'author_id').values_list('author_id', 'posts_count')
+    GroupStats.objects.update_or_create(group_id=group_id, defaults={
+        'last_post_date': last_post_date,
+        'top_authors': json.dumps(
+            [list(row) for row in top[:settings.GROUP_TOP_AUTHORS]]),
+    })
+
+
+def rebuild():
+    """Recomputes the per-author counts and the stats of every group."""
+    GroupAuthorStats.objects.all().delete()
+    GroupAuthorStats.objects.bulk_create(
+        GroupAuthorStats(group_id=row['group_id'],
+                         author_id=row['author_id'],
+                         posts_count=row['count'])
+        for row in Post.objects.filter(group__isnull=False).order_by()
+        .values('group_id', 'author_id').annotate(count=Count('pk'))
+        .iterator()
+    )
+    for group_id in Group.objects.values_list('pk', flat=True).iterator():
+        refresh(group_id)
+
+
+def directory():
+    """All groups by title with their stats and top authors, in two
+    queries: one for the groups and one for the authors' names."""
+    groups = list(Group.objects.select_related('stats').order_by('title'))
+    top = {}
+    for group in groups:
+        group.group_stats = for_group(group)
+        top[group.pk] = json.loads(group.group_stats.top_authors)
+    author_ids = {author_id for rows in top.values()
+                  for author_id, _ in rows}
+    authors = User.objects.only(
+        'username', 'first_name', 'last_name').in_bulk(author_ids)
+    for group in groups:
+        group.top_authors = [(authors[author_id], count)
+                             for author_id, count in top[group.pk]
+                             if author_id in authors]
+    return groups
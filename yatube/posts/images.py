@@ -0,0 +1,104 @@
+"""Processing of uploaded post images.
+
+An upload is checked before it is decoded: its size, its format and the
+pixel count from the header, so a decompression bomb never reaches the
+decoder. The picture is then decoded (a JPEG straight at a reduced scale),
+turned upright by its EXIF orientation, shrunk to POST_IMAGE_MAX_SIDE and
+re-encoded to POST_IMAGE_FORMAT without any metadata. The result is named
+by its SHA-256, so a picture uploaded twice is stored once.
+"""
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps, features
+
+UPLOAD_TO = 'posts'
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}
+
+
+def _save_options(image_format):
+    quality = settings.POST_IMAGE_QUALITY
+    return {
+        'WEBP': {'quality': quality, 'method': 4},
+        'JPEG': {'quality': quality, 'optimize': True, 'progressive': True},
+        'PNG': {'optimize': True},
+    }[image_format]
+
+
+def _output_format(has_alpha):
+    image_format = settings.POST_IMAGE_FORMAT
+    if image_format == 'WEBP' and not features.check('webp'):
+        image_format = 'JPEG'
+    if image_format == 'JPEG' and has_alpha:
+        image_format = 'PNG'
+    return image_format
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info)
+
+
+def open_checked(upload):
+    """Opens the upload reading only its header; raises ValidationError
+    for files that are too big, of other formats or with too many
+    pixels."""
+    if upload.size > settings.UPLOAD_MAX_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            params={'limit': filesizeformat(settings.UPLOAD_MAX_SIZE)},
+            code='file_too_large')
+    upload.seek(0)
+    try:
+        image = Image.open(upload, formats=settings.POST_IMAGE_INPUT_FORMATS)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Загрузите картинку в формате %(formats)s.',
+            params={'formats': ', '.join(settings.POST_IMAGE_INPUT_FORMATS)},
+            code='invalid_image')
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка %(width)s×%(height)s слишком велика.',
+            params={'width': width, 'height': height},
+            code='too_many_pixels')
+    return image
+
+
+def process(upload):
+    """The upload checked and re-encoded, as a ContentFile named by its
+    content hash."""
+    image = open_checked(upload)
+    side = settings.POST_IMAGE_MAX_SIDE
+    # JPEG декодируется сразу в масштабе 1/2, 1/4 или 1/8
+    image.draft(None, (side, side))
+    try:
+        # у анимаций остаётся первый кадр
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((side, side), Image.LANCZOS)
+    except (OSError, SyntaxError, ValueError):
+        raise ValidationError('Картинка повреждена.', code='invalid_image')
+    has_alpha = _has_alpha(image)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    image_format = _output_format(has_alpha)
+    content = BytesIO()
+    # метаданные (EXIF, GPS, ICC, комментарии) не передаются в save()
+    image.save(content, image_format, **_save_options(image_format))
+    data = content.getvalue()
+    digest = hashlib.sha256(data).hexdigest()
+    return ContentFile(data, name=(f'{UPLOAD_TO}/{digest[:2]}/{digest}.'
+                                   f'{EXTENSIONS[image_format]}'))
+
+
+def store(content):
+    """Saves a processed image unless the same one is stored already;
+    returns its storage name."""
+    if default_storage.exists(content.name):
+        return content.name
+    return default_storage.save(content.name, content)
@@ -0,0 +1,103 @@
+import json
+import random
+import statistics
+import time
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+from posts.models import Post, User
+
+SYLLABLES = ('ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'to', 'vi', 'ze', 'po')
+WORDS_PER_POST = 12
+BATCH_SIZE = 5000
+
+
+def vocabulary(size, rnd):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rnd.choice(SYLLABLES)
+                          for _ in range(rnd.randint(3, 5))))
+    return sorted(words)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск по индексу posts.search с LIKE-сканированием '
+            'на синтетических постах. Данные создаются в транзакции, '
+            'которая затем откатывается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--vocabulary', type=int, default=50_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', dest='json_path',
+                            help='Сохранить результаты в JSON-файл.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            results = self.run(options)
+            transaction.set_rollback(True)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as file:
+                json.dump(results, file, indent=2, ensure_ascii=False)
+
+    def run(self, options):
+        rnd = random.Random(options['seed'])
+        words = vocabulary(options['vocabulary'], rnd)
+        # частоты слов по закону Ципфа: есть и частые, и редкие термы
+        cum_weights = list(accumulate(
+            1 / rank for rank in range(1, len(words) + 1)))
+        author = User.objects.create_user(username='bench_search_author')
+
+        started = time.perf_counter()
+        for offset in range(0, options['posts'], BATCH_SIZE):
+            size = min(BATCH_SIZE, options['posts'] - offset)
+            Post.objects.bulk_create(
+                Post(author=author, text=' '.join(rnd.choices(
+                    words, cum_weights=cum_weights, k=WORDS_PER_POST)))
+                for _ in range(size)
+            )
+        self.stdout.write(f'Посты: {options["posts"]} за '
+                          f'{time.perf_counter() - started:.1f} с')
+        started = time.perf_counter()
+        search.rebuild()
+        self.stdout.write(f'Индекс ({type(search.get_backend()).__name__}) '
+                          f'за {time.perf_counter() - started:.1f} с')
+
+        queries = {'частое слово': words[0],
+                   'среднее слово': words[len(words) // 100],
+                   'редкое слово': words[-1],
+                   'два слова': f'{words[1]} {words[2]}'}
+        results = {'posts': options['posts'], 'queries': {}}
+        for label, query in queries.items():
+            like = Post.objects.feed()
+            for word in query.split():
+                like = like.filter(text__icontains=word)
+            timings = {
+                'like_page_ms': self.measure(
+                    lambda: list(like[:settings.COUNT_POSTS]),
+                    options['repeat']),
+                'like_count_ms': self.measure(like.count, options['repeat']),
+                'index_page_ms': self.measure(
+                    lambda: list(search.search(query)), options['repeat']),
+            }
+            results['queries'][label] = {'query': query, **timings}
+            self.stdout.write(
+                f'{label:>14} ({query}): LIKE страница '
+                f'{timings["like_page_ms"]:.1f} мс, LIKE COUNT '
+                f'{timings["like_count_ms"]:.1f} мс, индекс '
+                f'{timings["index_page_ms"]:.1f} мс')
+        return results
+
+    @staticmethod
+    def measure(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,87 @@
+import json
+import tempfile
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from posts import benchmark, seeding
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный бенчмарк страниц posts на отдельной тестовой базе: '
+            'латентность p50/p95, запросы, время БД и шаблонов на запрос, '
+            'полные сканирования таблиц, инструкции SQLite (вместо числа '
+            'прочитанных строк) и пик памяти. Кеш — отдельный, во '
+            'временном каталоге.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Запросов на сценарий.')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Запустить только указанные сценарии.')
+        parser.add_argument('--cold-cache', action='store_true',
+                            help='Очищать кеш перед каждым запросом.')
+        parser.add_argument('--no-card-cache', action='store_true',
+                            help='Рендерить карточки постов без кеша, '
+                                 'для сравнения с обычным прогоном.')
+        parser.add_argument('--output', help='Сохранить результаты в JSON.')
+        parser.add_argument('--baseline',
+                            help='JSON предыдущего прогона для сравнения.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Допустимый рост p95, доля (0.2 = 20%%).')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # свой кеш: его очистка не трогает сессии и лимиты сайта
+            with tempfile.TemporaryDirectory() as directory, \
+                    override_settings(
+                        CACHES=benchmark.private_caches(directory),
+                        THUMBNAIL_ASYNC=False, RATELIMIT_ENABLED=False,
+                        SERVER_TIMING=True,
+                        POST_CARD_CACHE=not options['no_card_cache']):
+                seeding.seed(
+                    users=options['users'], groups=options['groups'],
+                    posts=options['posts'], comments=options['comments'],
+                    follows=options['follows'], seed_value=options['seed'])
+                # L1 процесса мог запомнить страницы до подмены кеша
+                cache.clear()
+                results = benchmark.run(options['requests'],
+                                        options['cold_cache'],
+                                        options['scenarios'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:>16}: p50 {result["p50_ms"]:.1f} мс, '
+                f'p95 {result["p95_ms"]:.1f} мс, '
+                f'{result["rps"]:.0f} запр/с, '
+                f'запросов {result["queries"]}, БД {result["db_ms"]:.1f} мс, '
+                f'шаблоны {result["template_ms"]:.1f} мс, '
+                f'сканирований {result["full_scans"]}, '
+                f'шагов SQLite {result["vm_steps"]}, '
+                f'память {result["peak_kib"]} КиБ')
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2, ensure_ascii=False)
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                regressions = benchmark.compare(
+                    results, json.load(file), options['tolerance'])
+            if regressions:
+                raise CommandError('Регрессия производительности:\n'
+                                   + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
@@ -0,0 +1,81 @@
+import argparse
+import sys
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from posts import transfer
+
+
+def moment(value):
+    """Date or date and time from the command line, in the current zone."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise argparse.ArgumentTypeError(
+                f'«{value}»: ожидается дата ГГГГ-ММ-ДД или дата и время.')
+        parsed = datetime.combine(date, time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, пользователей, посты, комментарии и подписки '
+            'в NDJSON (posts.transfer). Файл с окончанием .gz сжимается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Файл выгрузки, «-» — stdout.')
+        parser.add_argument('--author', help='Только посты автора.')
+        parser.add_argument('--group', help='Только посты группы (slug).')
+        parser.add_argument('--since', type=moment,
+                            help='Посты, опубликованные не раньше.')
+        parser.add_argument('--until', type=moment,
+                            help='Посты, опубликованные раньше.')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Сжимать выгрузку gzip.')
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл прогресса: повторный запуск с ним продолжает '
+                 'прерванную выгрузку.')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        compress = options['gzip'] or output.endswith('.gz')
+        checkpoint = None
+        if options['checkpoint']:
+            if output == '-':
+                raise CommandError('--checkpoint нужен файл выгрузки.')
+            checkpoint = transfer.Checkpoint(options['checkpoint'])
+        querysets = transfer.querysets(
+            author=options['author'], group=options['group'],
+            since=options['since'], until=options['until'])
+        # при выгрузке в stdout отчёт идёт в stderr
+        self.log = self.stderr if output == '-' else self.stdout
+
+        if output == '-':
+            transfer.export(sys.stdout.buffer, querysets, compress,
+                            report=self.report)
+            return
+        offset = transfer.resume_offset(checkpoint) if checkpoint else 0
+        try:
+            file = open(output, 'r+b' if offset else 'wb')
+        except FileNotFoundError:
+            raise CommandError(f'Нет файла {output} для продолжения '
+                               f'выгрузки.')
+        with file:
+            file.seek(offset)
+            file.truncate()
+            transfer.export(file, querysets, compress, checkpoint,
+                            self.report)
+        if checkpoint:
+            checkpoint.remove()
+        self.log.write(self.style.SUCCESS('Готово.'))
+
+    def report(self, model, rows, seconds):
+        rate = rows / seconds if seconds else 0
+        self.log.write(f'{model:>8}: {rows} строк за {seconds:.1f} с '
+                       f'({rate:,.0f} строк/с)')
@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import comment_queue
+
+
+class Command(BaseCommand):
+    help = ('Переносит комментарии из очереди (COMMENT_QUEUE_PATH) в базу '
+            'пачками. С --loop сбрасывает очередь раз в '
+            'COMMENT_QUEUE_INTERVAL секунд, вместо фоновых потоков '
+            'веб-процессов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Сбрасывать очередь, пока не прервут.')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            written = comment_queue.flush()
+            if written or not options['loop']:
+                self.stdout.write(
+                    f'Записано комментариев: {written} за '
+                    f'{time.perf_counter() - started:.2f} с.')
+            if not options['loop']:
+                return
+            time.sleep(settings.COMMENT_QUEUE_INTERVAL)
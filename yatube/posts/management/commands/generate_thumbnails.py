@@ -0,0 +1,77 @@
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from posts import thumbnails
+from posts.models import Post
+
+CHUNK_SIZE = 100
+
+logger = logging.getLogger(__name__)
+
+
+def chunks(posts):
+    """Ids of the posts in ascending runs of CHUNK_SIZE. Each run is read
+    in full first: an open read would keep the SQLite file locked against
+    the workers' writes."""
+    posts = posts.order_by('pk').values_list('pk', flat=True)
+    chunk = list(posts[:CHUNK_SIZE])
+    while chunk:
+        yield chunk
+        chunk = list(posts.filter(pk__gt=chunk[-1])[:CHUNK_SIZE])
+
+
+def generate(post_id):
+    """Makes the thumbnail of the post; a broken image is logged and
+    does not stop the others. Returns whether it succeeded."""
+    try:
+        thumbnails.generate(post_id)
+    except Exception:
+        logger.exception('Thumbnail generation failed for post %s', post_id)
+        return False
+    return True
+
+
+def generate_in_worker(post_id):
+    close_old_connections()
+    try:
+        return generate(post_id)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Генерирует превью для картинок постов, у которых их ещё нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перегенерировать превью и для постов, где они уже есть.')
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Число потоков генерации, 0 — в текущем потоке.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            posts = posts.filter(thumbnail_url='')
+        results = Counter()
+        if options['workers'] < 1:
+            for chunk in chunks(posts):
+                results.update(generate(post_id) for post_id in chunk)
+        else:
+            with ThreadPoolExecutor(options['workers']) as executor:
+                # порциями, чтобы не ставить в очередь сразу все посты
+                for chunk in chunks(posts):
+                    results.update(executor.map(generate_in_worker, chunk))
+        done, failed = results[True], results[False]
+        if failed:
+            self.stdout.write(self.style.WARNING(
+                f'Готово превью: {done}, ошибок: {failed} (подробности '
+                f'в логе posts.management.commands.generate_thumbnails).'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Готово превью: {done}.'))
@@ -0,0 +1,52 @@
+import gzip
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class Command(BaseCommand):
+    help = ('Загружает NDJSON из export_posts. Существующие строки '
+            'пропускаются, пароли пользователей не переносятся; превью '
+            'картинок потом делает generate_thumbnails.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл выгрузки, «-» — stdin. '
+                                          'gzip распознаётся сам.')
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл прогресса: повторный запуск с ним продолжает '
+                 'прерванную загрузку.')
+
+    def handle(self, *args, **options):
+        checkpoint = None
+        if options['checkpoint']:
+            checkpoint = transfer.Checkpoint(options['checkpoint'])
+        if options['input'] == '-':
+            raw = sys.stdin.buffer
+        else:
+            try:
+                raw = open(options['input'], 'rb')
+            except FileNotFoundError:
+                raise CommandError(f'Нет файла {options["input"]}.')
+        with raw:
+            if raw.peek(2)[:2] == GZIP_MAGIC:
+                raw = gzip.GzipFile(fileobj=raw)
+            lines = io.TextIOWrapper(raw, encoding='utf-8')
+            try:
+                transfer.import_rows(lines, checkpoint, self.report)
+            except transfer.TransferError as error:
+                raise CommandError(error)
+
+        if checkpoint:
+            checkpoint.remove()
+        self.stdout.write(self.style.SUCCESS('Готово.'))
+
+    def report(self, model, rows, seconds):
+        rate = rows / seconds if seconds else 0
+        self.stdout.write(f'{model:>8}: добавлено {rows} строк за '
+                          f'{seconds:.1f} с ({rate:,.0f} строк/с)')
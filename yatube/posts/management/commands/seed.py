@@ -0,0 +1,53 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import seeding
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Заполняет пустую базу синтетическими пользователями, группами, '
+            'постами, комментариями и подписками. Одинаковый --seed даёт '
+            'одинаковые данные при любом числе процессов. Пароль всех '
+            'пользователей — «password».')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--comments', type=int, default=1_000_000)
+        parser.add_argument('--follows', type=int, default=200_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Процессов генерации данных, 1 — без multiprocessing.')
+        parser.add_argument(
+            '--images', type=int, default=0,
+            help='Сколько разных картинок сгенерировать для постов.')
+        parser.add_argument(
+            '--image-share', type=float, default=0.2,
+            help='Доля постов с картинкой, если --images больше нуля.')
+
+    def handle(self, *args, **options):
+        if Post.objects.exists():
+            raise CommandError('В базе уже есть посты: seed заполняет '
+                               'пустую базу (см. manage.py flush).')
+        with transaction.atomic():
+            seeding.seed(
+                users=options['users'], groups=options['groups'],
+                posts=options['posts'], comments=options['comments'],
+                follows=options['follows'], seed_value=options['seed'],
+                workers=options['workers'], images=options['images'],
+                image_share=options['image_share'], report=self.report)
+        self.stdout.write(self.style.SUCCESS('Готово.'))
+
+    def report(self, phase, rows, seconds):
+        if phase == 'finish':
+            self.stdout.write(f'Счётчики, ленты и поисковый индекс: '
+                              f'{seconds:.1f} с')
+            return
+        rate = rows / seconds if seconds else 0
+        self.stdout.write(f'{phase:>9}: {rows} строк за {seconds:.1f} с '
+                          f'({rate:,.0f} строк/с)')
@@ -0,0 +1,62 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    for group in Group.objects.annotate(
+            count=models.Count('posts')).iterator():
+        Group.objects.filter(pk=group.pk).update(posts_count=group.count)
+    for post in Post.objects.annotate(
+            count=models.Count('comments')).filter(count__gt=0).iterator():
+        Post.objects.filter(pk=post.pk).update(comments_count=post.count)
+    users = User.objects.annotate(
+        posts_count=models.Count('posts', distinct=True),
+        followers_count=models.Count('following', distinct=True),
+        following_count=models.Count('follower', distinct=True),
+    )
+    UserCounters.objects.bulk_create(
+        (UserCounters(user_id=user.pk,
+                      posts_count=user.posts_count,
+                      followers_count=user.followers_count,
+                      following_count=user.following_count)
+         for user in users.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0004_comment_follow_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='количество постов'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='количество комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
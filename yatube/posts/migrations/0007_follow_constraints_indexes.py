@@ -0,0 +1,58 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:53
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    duplicates = Follow.objects.values('user_id', 'author_id').annotate(
+        first_id=models.Min('id'), count=models.Count('id')
+    ).filter(count__gt=1)
+    affected = set()
+    for row in duplicates.iterator():
+        Follow.objects.filter(
+            user_id=row['user_id'], author_id=row['author_id']
+        ).exclude(id=row['first_id']).delete()
+        affected.update((row['user_id'], row['author_id']))
+    self_follows = Follow.objects.filter(user_id=models.F('author_id'))
+    affected.update(self_follows.values_list('user_id', flat=True))
+    self_follows.delete()
+    for user_id in affected:
+        UserCounters.objects.filter(user_id=user_id).update(
+            followers_count=Follow.objects.filter(author_id=user_id).count(),
+            following_count=Follow.objects.filter(user_id=user_id).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_timeline'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'pub_date'], name='posts_comme_post_id_e339a9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date'], name='posts_post_author__7827da_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date'], name='posts_post_group_i_1fdac4_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='prevent_self_follow'),
+        ),
+    ]
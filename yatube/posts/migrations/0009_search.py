@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_fts_index(apps, schema_editor):
+    """FTS5 index for posts.search; skipped where FTS5 is unavailable."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if not cursor.fetchone()[0]:
+            return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_post_fts USING fts5('
+        'text, group_title, author_name, '
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_post_fts (rowid, text, group_title, author_name) '
+        "SELECT p.id, p.text, COALESCE(g.title, ''), "
+        "TRIM(u.username || ' ' || u.first_name || ' ' || u.last_name) "
+        'FROM posts_post p '
+        'INNER JOIN auth_user u ON u.id = p.author_id '
+        'LEFT OUTER JOIN posts_group g ON g.id = p.group_id'
+    )
+
+
+def drop_fts_index(apps, schema_editor):
+    schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post')),
+            ],
+            options={
+                'unique_together': {('term', 'post')},
+            },
+        ),
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
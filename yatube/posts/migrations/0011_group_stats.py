@@ -0,0 +1,66 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import json
+
+
+def fill_group_stats(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    GroupAuthorStats = apps.get_model('posts', 'GroupAuthorStats')
+    GroupAuthorStats.objects.bulk_create(
+        GroupAuthorStats(group_id=row['group_id'],
+                         author_id=row['author_id'],
+                         posts_count=row['count'])
+        for row in Post.objects.filter(group__isnull=False).order_by()
+        .values('group_id', 'author_id').annotate(count=models.Count('pk'))
+        .iterator()
+    )
+    for group in Group.objects.annotate(
+            last=models.Max('posts__pub_date')).iterator():
+        top = GroupAuthorStats.objects.filter(group_id=group.pk).order_by(
+            '-posts_count', 'author_id').values_list(
+            'author_id', 'posts_count')[:settings.GROUP_TOP_AUTHORS]
+        GroupStats.objects.create(
+            group_id=group.pk, last_post_date=group.last,
+            top_authors=json.dumps([list(row) for row in top]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0010_modified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group')),
+                ('last_post_date', models.DateTimeField(null=True)),
+                ('top_authors', models.TextField(default='[]')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GroupAuthorStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='author_stats', to='posts.Group')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='groupauthorstats',
+            index=models.Index(fields=['group', '-posts_count'], name='posts_group_group_i_105f81_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='groupauthorstats',
+            unique_together={('group', 'author')},
+        ),
+        migrations.RunPython(fill_group_stats, migrations.RunPython.noop),
+    ]
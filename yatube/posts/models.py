@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth import get_user_model
 
 from core.models import PubDateModels
@@ -10,11 +10,35 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=50, unique=True)
     description = models.TextField(max_length=400)
+    posts_count = models.PositiveIntegerField(
+        'количество постов', default=0, editable=False)
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    FEED_FIELDS = (
+        'id',
+        'text',
+        'pub_date',
+        'modified',
+        'image',
+        'thumbnail_url',
+        'thumbnail_width',
+        'thumbnail_height',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'group__slug',
+    )
+
+    def feed(self):
+        """Posts for list pages: author and group are joined in, and only
+        the columns rendered by the post card are selected."""
+        return self.select_related('author', 'group').only(*self.FEED_FIELDS)
+
+
 class Post(PubDateModels):
     text = models.TextField(
         'Текст поста',
@@ -37,9 +61,22 @@ class Post(PubDateModels):
         help_text='Группа, к которой будет относиться пост'
     )
     image = models.ImageField('image', upload_to='posts/', blank=True)
+    # готовое превью картинки, заполняется posts.thumbnails вне запроса
+    thumbnail_url = models.CharField(
+        max_length=255, blank=True, editable=False)
+    thumbnail_width = models.PositiveIntegerField(null=True, editable=False)
+    thumbnail_height = models.PositiveIntegerField(null=True, editable=False)
+    comments_count = models.PositiveIntegerField(
+        'количество комментариев', default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['author', '-pub_date']),
+            models.Index(fields=['group', '-pub_date']),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -61,6 +98,28 @@ class Comment(PubDateModels):
     text = models.TextField('Comment of post',
                             help_text='Enter a comment to the post')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'pub_date']),
+        ]
+
+
+class FollowQuerySet(models.QuerySet):
+    def follow(self, user, author):
+        """Subscribes user to author; a repeated call is a no-op.
+
+        A single INSERT guarded by the unique constraint instead of
+        check-then-create, which let concurrent requests insert duplicates.
+        """
+        try:
+            with transaction.atomic():
+                return self.create(user=user, author=author)
+        except IntegrityError:
+            return None
+
+    def unfollow(self, user, author):
+        return self.filter(user=user, author=author).delete()
+
 
 class Follow(models.Model):
     # чел который подписывается
@@ -76,3 +135,104 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         null=True
     )
+
+    objects = FollowQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='prevent_self_follow'),
+        ]
+
+
+class UserCounters(models.Model):
+    """Denormalized per-user counters maintained by posts.counters."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class GroupStats(models.Model):
+    """Figures of the group directory, maintained by posts.group_stats."""
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    last_post_date = models.DateTimeField(null=True)
+    # JSON [[author_id, posts_count], ...] самых активных авторов
+    top_authors = models.TextField(default='[]')
+
+
+class GroupAuthorStats(models.Model):
+    """Number of posts of an author in a group."""
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='author_stats'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('group', 'author')
+        indexes = [
+            models.Index(fields=['group', '-posts_count']),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """A post delivered to the follow feed of a user (fan-out on write)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    # копии полей поста: лента читается и чистится без JOIN
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            # страница ленты: WHERE user ORDER BY pub_date, post LIMIT
+            models.Index(fields=['user', '-pub_date', '-post']),
+            models.Index(fields=['user', 'author']),
+        ]
+
+
+class SearchTerm(models.Model):
+    """Inverted index entry used for search when SQLite FTS5 is missing."""
+    term = models.CharField(max_length=100)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms'
+    )
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('term', 'post')
@@ -0,0 +1,248 @@
+"""Full-text search over posts.
+
+Post text, group title and author names are kept in an inverted index that
+is updated from the signal handlers on every save and delete:
+
+* SQLite FTS5 virtual table posts_post_fts, ranked with bm25;
+* a portable fallback, the SearchTerm table (term -> post, weight), for
+  other databases and SQLite builds without FTS5.
+
+settings.SEARCH_BACKEND picks 'fts5', 'terms' or 'auto' (FTS5 if the
+migration could create its table). Results are ranked and paginated with
+keyset cursors over (rank, post id), so deep pages cost the same as the
+first one.
+"""
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q, Sum
+
+from core.paginator import CursorPage, decode_token, encode_token
+from .models import Post, SearchTerm
+
+FTS_TABLE = 'posts_post_fts'
+TERM_MAX_LENGTH = SearchTerm._meta.get_field('term').max_length
+BATCH_SIZE = 1000
+# id постов в одном IN (...): старые сборки SQLite принимают до 999
+# параметров в запросе
+ID_BATCH_SIZE = 500
+
+
+def tokenize(text):
+    return [term[:TERM_MAX_LENGTH]
+            for term in re.findall(r'\w+', text.lower())]
+
+
+_fts5_tables = {}
+
+
+def fts5_available():
+    name = connection.settings_dict['NAME']
+    if name not in _fts5_tables:
+        _fts5_tables[name] = (
+            FTS_TABLE in connection.introspection.table_names())
+    return _fts5_tables[name]
+
+
+def get_backend():
+    name = settings.SEARCH_BACKEND
+    if name == 'auto':
+        name = 'fts5' if fts5_available() else 'terms'
+    return BACKENDS[name]
+
+
+def _id_batches(posts):
+    """Ids of the posts in ascending runs of ID_BATCH_SIZE, each read in
+    full before it is yielded."""
+    posts = posts.order_by('pk').values_list('pk', flat=True)
+    batch = list(posts[:ID_BATCH_SIZE])
+    while batch:
+        yield batch
+        batch = list(posts.filter(pk__gt=batch[-1])[:ID_BATCH_SIZE])
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = [row for _, row in zip(range(size), rows)]
+        if not batch:
+            return
+        yield batch
+
+
+def _documents(posts):
+    """(post id, text, group title, author name) for every post."""
+    rows = posts.values_list(
+        'pk', 'text', 'group__title',
+        'author__username', 'author__first_name', 'author__last_name')
+    for pk, text, group_title, *names in rows.iterator():
+        yield pk, text, group_title or '', ' '.join(filter(None, names))
+
+
+class Fts5Backend:
+
+    @staticmethod
+    def match_expression(query):
+        # каждый терм в кавычках: пользовательский ввод не станет
+        # синтаксисом FTS5, а несколько термов соединятся через AND
+        return ' '.join(f'"{term}"' for term in tokenize(query))
+
+    def index(self, posts):
+        for post_ids in _id_batches(posts):
+            self.remove(post_ids)
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} '
+                    '(rowid, text, group_title, author_name) '
+                    'VALUES (%s, %s, %s, %s)',
+                    list(_documents(Post.objects.filter(pk__in=post_ids)))
+                )
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(pk,) for pk in post_ids]
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            for batch in _batches(_documents(Post.objects.all()),
+                                  BATCH_SIZE):
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} '
+                    '(rowid, text, group_title, author_name) '
+                    'VALUES (%s, %s, %s, %s)',
+                    batch
+                )
+
+    def filter(self, queryset, query):
+        # pk__in=RawSQL(...) дал бы "IN ((SELECT ...))" — скалярный
+        # подзапрос, который в SQLite возвращает только первую строку
+        table = queryset.model._meta.db_table
+        return queryset.extra(
+            where=[f'{table}.id IN (SELECT rowid FROM {FTS_TABLE} '
+                   f'WHERE {FTS_TABLE} MATCH %s)'],
+            params=[self.match_expression(query)]
+        )
+
+    def ranked(self, query, after, limit):
+        """[(post id, rank)] best first; lower bm25 rank is better."""
+        sql = (f'SELECT rowid, rank FROM {FTS_TABLE} '
+               f'WHERE {FTS_TABLE} MATCH %s')
+        params = [self.match_expression(query)]
+        if after is not None:
+            sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+            params += [after[1], after[1], after[0]]
+        sql += ' ORDER BY rank, rowid LIMIT %s'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return cursor.fetchall()
+
+
+class TermsBackend:
+
+    @staticmethod
+    def terms(text, group_title, author_name):
+        weights = Counter(tokenize(text))
+        # совпадение в названии группы или имени автора весит больше
+        for term in tokenize(f'{group_title} {author_name}'):
+            weights[term] += 2
+        return weights
+
+    def index(self, posts):
+        for post_ids in _id_batches(posts):
+            self.remove(post_ids)
+            self._insert(_documents(Post.objects.filter(pk__in=post_ids)))
+
+    def remove(self, post_ids):
+        SearchTerm.objects.filter(post_id__in=post_ids).delete()
+
+    def rebuild(self):
+        SearchTerm.objects.all().delete()
+        self._insert(_documents(Post.objects.all()))
+
+    def _insert(self, documents):
+        terms = (SearchTerm(term=term, post_id=pk, weight=weight)
+                 for pk, *fields in documents
+                 for term, weight in self.terms(*fields).items())
+        # bulk_create читает всё в список: отдаём ему порции, а размер
+        # INSERT он выберет сам — на SQLite не больше 500 строк
+        for batch in _batches(terms, BATCH_SIZE):
+            SearchTerm.objects.bulk_create(batch)
+
+    def _matches(self, query):
+        terms = set(tokenize(query))
+        return SearchTerm.objects.filter(term__in=terms).values(
+            'post_id').annotate(
+            matched=Count('term'), score=Sum('weight')
+        ).filter(matched=len(terms))
+
+    def filter(self, queryset, query):
+        return queryset.filter(pk__in=self._matches(query).values('post_id'))
+
+    def ranked(self, query, after, limit):
+        """[(post id, rank)] best first; rank is the negated term weight."""
+        matches = self._matches(query)
+        if after is not None:
+            score = -after[1]
+            matches = matches.filter(
+                Q(score__lt=score) | Q(score=score, post_id__gt=after[0]))
+        rows = matches.order_by('-score', 'post_id').values_list(
+            'post_id', 'score')[:limit]
+        return [(pk, -score) for pk, score in rows]
+
+
+BACKENDS = {
+    'fts5': Fts5Backend(),
+    'terms': TermsBackend(),
+}
+
+
+def index_posts(posts):
+    get_backend().index(posts)
+
+
+def remove_posts(post_ids):
+    get_backend().remove(post_ids)
+
+
+def rebuild():
+    get_backend().rebuild()
+
+
+def filter_posts(queryset, query):
+    """Narrows queryset to posts matching query (unranked)."""
+    if not tokenize(query):
+        return queryset.none()
+    return get_backend().filter(queryset, query)
+
+
+def search(query, cursor=None, per_page=None):
+    """One page of posts matching query, best matches first."""
+    per_page = per_page or settings.COUNT_POSTS
+    if not tokenize(query):
+        return CursorPage([], SearchPaginator)
+    after = None
+    if cursor:
+        try:
+            post_id, rank = decode_token(cursor)
+            after = (int(post_id), float(rank))
+        except (ValueError, TypeError):
+            after = None
+    rows = get_backend().ranked(query, after, per_page + 1)
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    posts = Post.objects.feed().in_bulk([pk for pk, _ in rows])
+    return CursorPage(
+        [posts[pk] for pk, _ in rows if pk in posts],
+        SearchPaginator,
+        next_cursor=encode_token(list(rows[-1])) if has_next else None,
+    )
+
+
+class SearchPaginator:
+    is_cursor = True
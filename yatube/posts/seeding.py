@@ -0,0 +1,276 @@
+"""Synthetic data for benchmarks and local profiling.
+
+Rows are generated in chunks, optionally by a pool of worker processes, and
+written by the main process with bulk_create. Every chunk has its own random
+state derived from the seed, so the same seed gives the same dataset with
+any number of workers. Posting activity, follower counts and group sizes
+follow a power law: a few users write and are followed a lot, most barely.
+Posts are spread over the SPREAD_DAYS before the seeding, in the order of
+their ids, and every comment comes after its post.
+
+bulk_create bypasses the signal handlers, so finish() rebuilds the derived
+data (counters, timelines, search index) in one pass at the end.
+"""
+import multiprocessing
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Max
+from faker import Faker
+from PIL import Image, ImageDraw
+from sorl.thumbnail import get_thumbnail
+
+from core.models import bulk_create_keeping_dates
+
+from . import cache, counters, group_stats, search, timeline
+from .models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 5000
+CHUNK_SIZE = 20000
+# показатель Парето 1.16 — классическое «80/20»
+POWER_LAW_ALPHA = 1.16
+LOCALE = 'ru_RU'
+IMAGE_SIZE = (960, 540)
+SPREAD_DAYS = 365
+
+_context = {}
+
+
+def _init_worker(context):
+    _context.clear()
+    _context.update(context, fake=Faker(LOCALE))
+
+
+def _random(kind, chunk):
+    """Random state of one chunk, independent of the worker running it."""
+    key = f'{_context["seed"]}:{kind}:{chunk}'
+    _context['fake'].seed_instance(key)
+    return random.Random(key), _context['fake']
+
+
+def _pick(rnd, cum_weights, size):
+    return rnd.choices(range(len(cum_weights)), cum_weights=cum_weights,
+                       k=size)
+
+
+def _users(chunk, start, size):
+    _, fake = _random('users', chunk)
+    return [(f'{fake.user_name()}_{start + i}', fake.first_name(),
+             fake.last_name()) for i in range(size)]
+
+
+def _groups(chunk, start, size):
+    _, fake = _random('groups', chunk)
+    return [(fake.catch_phrase()[:200], f'group-{start + i}',
+             fake.text(max_nb_chars=400)) for i in range(size)]
+
+
+def _post_slot(post):
+    """Seconds before the seeding at which the post's time slot ends."""
+    return _context['spread'] * (_context['posts'] - post - 1) / (
+        _context['posts'])
+
+
+def _posts(chunk, start, size):
+    rnd, fake = _random('posts', chunk)
+    authors = _pick(rnd, _context['author_weights'], size)
+    groups = _pick(rnd, _context['group_weights'], size)
+    images = _context['images']
+    step = _context['spread'] / _context['posts']
+    rows = []
+    for post, author, group in zip(range(start, start + size), authors,
+                                   groups):
+        image = ('', '', None, None)
+        if images and rnd.random() < _context['image_share']:
+            image = rnd.choice(images)
+        ago = _post_slot(post) + step * rnd.random()
+        rows.append((author, group, fake.text(max_nb_chars=200), ago,
+                     *image))
+    return rows
+
+
+def _comments(chunk, start, size):
+    rnd, fake = _random('comments', chunk)
+    posts = _pick(rnd, _context['post_weights'], size)
+    authors = _pick(rnd, _context['author_weights'], size)
+    return [(post, author, fake.sentence()[:200],
+             _post_slot(post) * rnd.random())
+            for post, author in zip(posts, authors)]
+
+
+def _follows(chunk, start, size):
+    rnd, _ = _random('follows', chunk)
+    authors = _pick(rnd, _context['popularity_weights'], size)
+    pairs = set()
+    for author in authors:
+        user = rnd.randrange(_context['users'])
+        if user != author:
+            pairs.add((user, author))
+    return sorted(pairs)
+
+
+class _star:
+    """Picklable task(*args) wrapper for Pool.imap."""
+
+    def __init__(self, task):
+        self.task = task
+
+    def __call__(self, args):
+        return self.task(*args)
+
+
+def _generate(task, total, context, workers):
+    """Yields the rows made by task, chunk by chunk, in chunk order."""
+    chunks = [(chunk, start, min(CHUNK_SIZE, total - start))
+              for chunk, start in enumerate(range(0, total, CHUNK_SIZE))]
+    if workers <= 1 or len(chunks) <= 1:
+        _init_worker(context)
+        for args in chunks:
+            yield from task(*args)
+        return
+    with multiprocessing.Pool(workers, _init_worker, (context,)) as pool:
+        for rows in pool.imap(_star(task), chunks):
+            yield from rows
+
+
+def _power_law(rnd, size):
+    return list(accumulate(
+        rnd.paretovariate(POWER_LAW_ALPHA) for _ in range(size)))
+
+
+def _images(rnd, count):
+    """Saves count generated pictures: (name, thumbnail url, width, height)."""
+    images = []
+    for i in range(count):
+        name = f'posts/seed_{i}.png'
+        if not default_storage.exists(name):
+            picture = Image.new('RGB', IMAGE_SIZE, tuple(
+                rnd.randrange(256) for _ in range(3)))
+            draw = ImageDraw.Draw(picture)
+            for _ in range(8):
+                x, y = (rnd.randrange(IMAGE_SIZE[0]),
+                        rnd.randrange(IMAGE_SIZE[1]))
+                radius = rnd.randrange(20, 200)
+                draw.ellipse((x - radius, y - radius, x + radius, y + radius),
+                             fill=tuple(rnd.randrange(256) for _ in range(3)))
+            content = BytesIO()
+            picture.save(content, 'PNG')
+            name = default_storage.save(name, ContentFile(content.getvalue()))
+        thumbnail = get_thumbnail(name, settings.POST_THUMBNAIL_GEOMETRY,
+                                  crop='center', upscale=True)
+        images.append((name, thumbnail.url, thumbnail.width, thumbnail.height))
+    return images
+
+
+def _insert(model, objects, keep_dates=False):
+    def write(batch):
+        if keep_dates:
+            bulk_create_keeping_dates(model, batch)
+        else:
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            write(batch)
+            batch = []
+    write(batch)
+
+
+def _last_pk(model):
+    return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+def seed(users=100, groups=10, posts=1000, comments=1000, follows=1000,
+         seed_value=0, workers=1, images=0, image_share=0.2, report=None):
+    """Fills an empty database; report(phase, rows, seconds) is called
+    after every phase."""
+    rnd = random.Random(seed_value)
+    now = datetime.now(timezone.utc)
+    context = {'seed': seed_value, 'images': [], 'image_share': image_share,
+               'spread': timedelta(days=SPREAD_DAYS).total_seconds()}
+
+    def phase(name, model, objects, sampled=False, keep_dates=False):
+        """Inserts the objects; returns the ids of a model whose rows are
+        sampled by the later phases. The other models may have millions of
+        rows, their new rows are counted from the pk range."""
+        started = time.perf_counter()
+        last = _last_pk(model)
+        _insert(model, objects, keep_dates)
+        ids = None
+        if sampled:
+            ids = list(model.objects.order_by('pk').values_list(
+                'pk', flat=True))
+            rows = sum(pk > last for pk in ids)
+        else:
+            rows = _last_pk(model) - last
+        if report is not None:
+            report(name, rows, time.perf_counter() - started)
+        return ids
+
+    def dated(obj, ago):
+        obj.pub_date = obj.modified = now - timedelta(seconds=ago)
+        return obj
+
+    # у всех пользователей пароль «password»: под ними можно войти локально
+    password = make_password('password')
+    user_ids = phase('users', User, (
+        User(username=username, first_name=first_name, last_name=last_name,
+             password=password)
+        for username, first_name, last_name in _generate(
+            _users, users, context, workers)), sampled=True)
+    group_ids = phase('groups', Group, (
+        Group(title=title, slug=slug, description=description)
+        for title, slug, description in _generate(
+            _groups, groups, context, workers)), sampled=True)
+    context['users'] = len(user_ids)
+    # последний «вес» — посты без группы
+    context['group_weights'] = _power_law(rnd, len(group_ids) + 1)
+    context['author_weights'] = _power_law(rnd, len(user_ids))
+    context['popularity_weights'] = _power_law(rnd, len(user_ids))
+    context['images'] = _images(rnd, images)
+    group_ids.append(None)
+
+    context['posts'] = posts if user_ids else 0
+    post_rows = _generate(_posts, context['posts'], context, workers)
+    post_ids = phase('posts', Post, (
+        dated(Post(author_id=user_ids[author], group_id=group_ids[group],
+                   text=text, image=image, thumbnail_url=url,
+                   thumbnail_width=width, thumbnail_height=height), ago)
+        for author, group, text, ago, image, url, width, height in post_rows
+    ), sampled=True, keep_dates=True)
+    context['post_weights'] = _power_law(rnd, len(post_ids))
+    context['posts'] = len(post_ids)
+    comment_rows = _generate(
+        _comments, comments if post_ids else 0, context, workers)
+    phase('comments', Comment, (
+        dated(Comment(post_id=post_ids[post], author_id=user_ids[author],
+                      text=text), ago)
+        for post, author, text, ago in comment_rows
+    ), keep_dates=True)
+    phase('follows', Follow, (
+        Follow(user_id=user_ids[user], author_id=user_ids[author])
+        for user, author in _generate(
+            _follows, follows if len(user_ids) > 1 else 0, context, workers)))
+
+    started = time.perf_counter()
+    finish()
+    if report is not None:
+        report('finish', 0, time.perf_counter() - started)
+
+
+def finish():
+    """Rebuilds everything the signal handlers would have maintained."""
+    counters.rebuild()
+    group_stats.rebuild()
+    timeline.rebuild()
+    search.rebuild()
+    cache.touch(cache.INDEX)
@@ -0,0 +1,208 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, counters, group_stats, search, timeline
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def touch_post_pages(sender, instance, **kwargs):
+    owners = {(instance.author_id, instance.group_id)}
+    if getattr(instance, '_old_owners', None):
+        owners.add(instance._old_owners)
+    scopes = cache.owner_scopes(
+        {author_id for author_id, _ in owners},
+        {group_id for _, group_id in owners if group_id})
+    cache.touch_on_commit(cache.INDEX, cache.post_scope(instance.pk), *scopes)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def touch_group_pages(sender, instance, **kwargs):
+    # карточки постов на главной ссылаются на slug группы
+    cache.touch_on_commit(cache.INDEX, cache.group_scope(instance.slug))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_comment_pages(sender, instance, **kwargs):
+    cache.touch_on_commit(cache.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def touch_follow_pages(sender, instance, **kwargs):
+    # профиль показывает число подписчиков и кнопку подписки,
+    # а профиль подписчика — число его подписок
+    cache.touch_on_commit(*cache.owner_scopes(
+        [instance.author_id, instance.user_id], []))
+
+
+NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def remember_author_names(sender, instance, raw=False, update_fields=None,
+                          **kwargs):
+    # вход и смена пароля сохраняют пользователя, но не меняют его имени
+    instance._old_names = None
+    if (instance.pk and not raw
+            and not (update_fields and not set(NAME_FIELDS) & update_fields)):
+        instance._old_names = User.objects.filter(
+            pk=instance.pk).values_list(*NAME_FIELDS).first()
+
+
+def renamed(user):
+    """Old username if the saved user's username or name has changed."""
+    old_names = getattr(user, '_old_names', None)
+    if old_names is None:
+        return None
+    if old_names == tuple(getattr(user, field) for field in NAME_FIELDS):
+        return None
+    return old_names[0]
+
+
+@receiver(post_save, sender=User)
+def touch_author_pages(sender, instance, created, **kwargs):
+    old_username = renamed(instance)
+    if created or old_username is None:
+        return
+    # имя автора выводится в карточках постов на главной
+    cache.touch_on_commit(cache.INDEX, cache.author_scope(instance.username),
+                          cache.author_scope(old_username))
+
+
+@receiver(post_save, sender=User)
+def create_user_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_owners(sender, instance, raw=False, **kwargs):
+    # при редактировании пост может сменить группу (или автора в админке)
+    instance._old_owners = None
+    if instance.pk and not raw:
+        instance._old_owners = Post.objects.filter(pk=instance.pk).values_list(
+            'author_id', 'group_id').first()
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_owners = getattr(instance, '_old_owners', None)
+    if created or old_owners is None:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        counters.change_group(instance.group_id, 1)
+        return
+    old_author_id, old_group_id = old_owners
+    if old_author_id != instance.author_id:
+        counters.change_user(old_author_id, 'posts_count', -1)
+        counters.change_user(instance.author_id, 'posts_count', 1)
+    if old_group_id != instance.group_id:
+        counters.change_group(old_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+    counters.change_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post_in_group(sender, instance, created, raw=False,
+                              **kwargs):
+    if raw:
+        return
+    old_owners = getattr(instance, '_old_owners', None)
+    owners = (instance.author_id, instance.group_id)
+    if created or old_owners is None:
+        group_stats.change(instance.group_id, instance.author_id, 1)
+    elif old_owners != owners:
+        old_author_id, old_group_id = old_owners
+        group_stats.change(old_group_id, old_author_id, -1)
+        group_stats.change(instance.group_id, instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post_in_group(sender, instance, **kwargs):
+    group_stats.change(instance.group_id, instance.author_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.user_id, 'following_count', 1)
+        counters.change_user(instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.change_user(instance.user_id, 'following_count', -1)
+    counters.change_user(instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def deliver_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_posts(Post.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_posts([instance.pk])
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_title(sender, instance, raw=False, update_fields=None,
+                         **kwargs):
+    # в поисковом индексе из группы только её название
+    instance._old_title = None
+    if (instance.pk and not raw
+            and not (update_fields and 'title' not in update_fields)):
+        instance._old_title = Group.objects.filter(
+            pk=instance.pk).values_list('title', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+def reindex_group_posts(sender, instance, created, **kwargs):
+    old_title = getattr(instance, '_old_title', None)
+    if not created and old_title is not None and old_title != instance.title:
+        search.index_posts(instance.posts.all())
+
+
+@receiver(post_save, sender=User)
+def reindex_author_posts(sender, instance, created, **kwargs):
+    if not created and renamed(instance) is not None:
+        search.index_posts(instance.posts.all())
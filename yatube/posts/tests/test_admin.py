@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.paginator import estimated_count
+from .. import benchmark, seeding
+from ..models import Comment, Follow, Group, Post, PostQuerySet
+
+User = get_user_model()
+
+
+class AdminChangelistTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        seeding.seed(users=6, groups=3, posts=40, comments=30, follows=10,
+                     seed_value=5)
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+
+    def setUp(self) -> None:
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, **params):
+        url = reverse(f'admin:posts_{model._meta.model_name}_changelist')
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in captured]
+
+    def test_changelists_join_related_rows_without_counting(self):
+        for model in (Post, Comment, Follow):
+            with self.subTest(model=model.__name__):
+                response, queries = self.changelist(model)
+                self.assertFalse([sql for sql in queries
+                                  if 'COUNT(' in sql])
+                self.assertEqual(response.context['cl'].result_count,
+                                 estimated_count(model))
+        _, few = self.changelist(Post)
+        Post.objects.bulk_create(Post(author=self.admin, text=str(number))
+                                 for number in range(20))
+        _, more = self.changelist(Post)
+        self.assertEqual(len(few), len(more))
+
+    def test_post_list_uses_indexes(self):
+        _, queries = self.changelist(Post)
+        self.assertEqual(benchmark.full_scans(
+            [{'sql': sql} for sql in queries
+             if sql.startswith('SELECT') and 'posts_post' in sql]), 0)
+
+    def test_date_hierarchy_seeks_dates(self):
+        posts = list(Post.objects.order_by('pk')[:4])
+        for post, date in zip(posts, ('2019-12-31 23:00', '2021-01-01 00:30',
+                                      '2021-03-05 12:00', '2021-03-07 08:00')):
+            Post.objects.filter(pk=post.pk).update(pub_date=date + 'Z')
+        for params, kind in (({}, 'year'),
+                             ({'pub_date__year': 2021}, 'month'),
+                             ({'pub_date__year': 2021,
+                               'pub_date__month': 3}, 'day')):
+            with self.subTest(kind=kind):
+                response, queries = self.changelist(Post, **params)
+                self.assertFalse([sql for sql in queries
+                                  if 'DISTINCT' in sql])
+                expected = list(PostQuerySet(Post).filter(
+                    **params).dates('pub_date', kind))
+                self.assertEqual(
+                    list(response.context['cl'].queryset.dates(
+                        'pub_date', kind)), expected)
+                self.assertGreater(len(expected), 1)
+
+    @override_settings(ADMIN_COUNT_LIMIT=5)
+    def test_filtered_count_is_bounded(self):
+        response, _ = self.changelist(Post, pub_date__gte='2000-01-01',
+                                      pub_date__lt='2999-01-01')
+        self.assertEqual(response.context['cl'].result_count, 5)
+
+    def test_editable_group_is_not_a_full_select(self):
+        Group.objects.bulk_create(
+            Group(title=f'Группа {number}', slug=f'admin-group-{number}')
+            for number in range(10))
+        response, _ = self.changelist(Post)
+        self.assertContains(response, 'admin-autocomplete')
+        # только выбранная группа и пустой вариант
+        self.assertLessEqual(response.content.decode().count('<option'),
+                             2 * len(response.context['cl'].result_list))
@@ -0,0 +1,62 @@
+import tempfile
+
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+
+from .. import benchmark, seeding
+from ..models import Comment, Post
+
+
+class BenchmarkTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        seeding.seed(users=5, groups=2, posts=30, comments=10, follows=8)
+
+    def test_every_scenario_is_measured(self):
+        results = benchmark.run(requests=2)
+        self.assertEqual(
+            set(results), {scenario.name
+                           for scenario in benchmark.default_scenarios()})
+        for name, result in results.items():
+            with self.subTest(scenario=name):
+                self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+                self.assertGreater(result['peak_kib'], 0)
+                self.assertGreater(result['rps'], 0)
+                self.assertGreaterEqual(result['template_ms'], 0)
+                # страница из кеша может не дойти до базы
+                self.assertGreaterEqual(result['vm_steps'], 0)
+                if name != 'api_export':
+                    # выгрузка читает всю таблицу по построению
+                    self.assertEqual(result['full_scans'], 0)
+        self.assertEqual(Comment.objects.count(), 10 + 3)
+        self.assertGreater(results['search']['vm_steps'], 0)
+
+    def test_compare_reports_regressions(self):
+        baseline = {'index': {'p95_ms': 10, 'queries': 2}}
+        self.assertEqual(benchmark.compare(
+            {'index': {'p95_ms': 11, 'queries': 2}}, baseline, 0.2), [])
+        self.assertEqual(len(benchmark.compare(
+            {'index': {'p95_ms': 13, 'queries': 3}}, baseline, 0.2)), 2)
+        baseline['index']['vm_steps'] = 1000
+        self.assertEqual(benchmark.compare(
+            {'index': {'p95_ms': 10, 'queries': 2, 'vm_steps': 1100}},
+            baseline, 0.2), [])
+        self.assertEqual(len(benchmark.compare(
+            {'index': {'p95_ms': 10, 'queries': 2, 'vm_steps': 5000}},
+            baseline, 0.2)), 1)
+
+    def test_private_caches_keep_site_cache(self):
+        caches['shared'].set('benchmark-test', 'сессия')
+        self.addCleanup(caches['shared'].delete, 'benchmark-test')
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(CACHES=benchmark.private_caches(directory)):
+            cache.set('page', 'страница')
+            cache.clear()
+            self.assertIsNone(caches['shared'].get('benchmark-test'))
+        self.assertEqual(caches['shared'].get('benchmark-test'), 'сессия')
+
+    def test_seed_rebuilds_derived_data(self):
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)), 10)
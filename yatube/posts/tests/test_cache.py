@@ -1,21 +1,32 @@
+import time
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
 from django.core.cache import cache
 
+from core.db_routers import replica_reads
+from .. import cache as page_cache
 from ..models import Post, Group
 
 User = get_user_model()
 
 
 class CachePagesTests(TestCase):
+    TEST_OF_POST: int = 13
 
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
 
     def setUp(self) -> None:
+        cache.clear()
         self.user = User.objects.create_user(username='NoName')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
 
         self.group = Group.objects.create(
             title='Тестовая группа',
@@ -29,12 +40,87 @@ class CachePagesTests(TestCase):
         )
 
     def test_cache_index_page(self):
+        response_before_del_post = self.client.get(reverse('posts:index'))
+        self.assertContains(response_before_del_post, self.post.text)
+        with self.assertNumQueries(0):
+            response_from_cache = self.client.get(reverse('posts:index'))
+        self.assertEqual(response_before_del_post.content,
+                         response_from_cache.content)
+
+    def test_cache_invalidated_on_post_delete(self):
         response_before_del_post = self.client.get(reverse('posts:index'))
         self.post.delete()
         response_after_del_post = self.client.get(reverse('posts:index'))
-        self.assertEqual(response_before_del_post.content,
-                         response_after_del_post.content)
+        self.assertNotEqual(response_before_del_post.content,
+                            response_after_del_post.content)
+        self.assertNotContains(response_after_del_post, self.post.text)
+
+    def test_cache_invalidated_on_post_save(self):
+        self.client.get(reverse('posts:index'))
+        self.post.text = 'Отредактированный текст поста'
+        self.post.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Отредактированный текст поста')
+
+    def test_only_renamed_author_touches_pages(self):
+        scopes = (page_cache.INDEX, page_cache.author_scope('NoName'))
+        before = page_cache.get_stamps(*scopes)
+        self.user.set_password('new-password')
+        self.user.save()
+        self.user.email = 'noname@example.com'
+        self.user.save()
+        self.assertEqual(page_cache.get_stamps(*scopes), before)
+        with self.assertNumQueries(1):
+            # вход сохраняет только last_login: старое имя не читается
+            self.user.save(update_fields=['last_login'])
+
+        self.user.username = 'Renamed'
+        self.user.save()
+        after = page_cache.get_stamps(*scopes)
+        self.assertTrue(all(after[scope] != before[scope]
+                            for scope in scopes))
+
+    @override_settings(REPLICA_DATABASES=['replica1'])
+    def test_recent_stamps_read_from_primary(self):
+        old = time.time() - settings.READ_YOUR_WRITES_SECONDS - 1
+        cache.set(page_cache.stamp_key(page_cache.INDEX), old, None)
+        with replica_reads() as state:
+            page_cache.get_stamps(page_cache.INDEX)
+            self.assertFalse(state.primary)
+        page_cache.touch(page_cache.INDEX)
+        with replica_reads() as state:
+            page_cache.get_stamps(page_cache.INDEX)
+            self.assertTrue(state.primary)
+        # 'replica1' не настроена: страница читается только из основной базы
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.text)
+
+    def test_cache_keyed_by_page(self):
+        Post.objects.bulk_create(
+            Post(text=f'test text {i}', group=self.group, author=self.user)
+            for i in range(self.TEST_OF_POST)
+        )
         cache.clear()
-        response_after_cache_clear = self.client.get(reverse('posts:index'))
-        self.assertNotEqual(response_after_del_post.content,
-                            response_after_cache_clear.content)
+        first_page = self.client.get(reverse('posts:index'))
+        second_page = self.client.get(reverse('posts:index'), {'page': 2})
+        self.assertNotContains(first_page, self.post.text)
+        self.assertContains(second_page, self.post.text)
+        self.assertEqual(
+            len(second_page.context['page_obj']),
+            self.TEST_OF_POST + 1 - settings.COUNT_POSTS)
+
+    def test_cache_keyed_by_auth_state(self):
+        self.client.get(reverse('posts:index'))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, reverse('posts:follow_index'))
+
+
+class TouchOnCommitTest(TransactionTestCase):
+
+    def test_stamp_changes_again_after_commit(self):
+        author = User.objects.create_user(username='author')
+        with transaction.atomic():
+            Post.objects.create(author=author, text='Новый пост')
+            # страница, собранная сейчас, ещё не видит пост
+            inside = page_cache.get_stamp(page_cache.INDEX)
+        self.assertNotEqual(page_cache.get_stamp(page_cache.INDEX), inside)
@@ -0,0 +1,142 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import comment_queue
+from ..models import Comment, Post
+
+User = get_user_model()
+
+QUEUE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(COMMENT_WRITE_MODE='eventual', COMMENT_QUEUE_WORKER=False,
+                   COMMENT_QUEUE_BATCH=2,
+                   COMMENT_QUEUE_PATH=os.path.join(QUEUE_DIR, 'queue.db'))
+class CommentQueueTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(QUEUE_DIR, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self) -> None:
+        self.client.force_login(self.reader)
+        self.url = reverse('posts:add_comment', args=[self.post.pk])
+        self.addCleanup(comment_queue._queue().execute,
+                        'DELETE FROM comment')
+
+    def comment(self, text):
+        return self.client.post(self.url, {'text': text})
+
+    def test_comments_are_written_on_flush(self):
+        for number in range(3):
+            self.assertRedirects(
+                self.comment(f'Комментарий {number}'),
+                reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(comment_queue.size(), 3)
+
+        with self.assertNumQueries(22):
+            # на пачку: проверка дублей, постов и авторов, затем вставка,
+            # её id, время из очереди и счётчик в транзакции (две пачки)
+            self.assertEqual(comment_queue.flush(), 3)
+        self.assertEqual(comment_queue.size(), 0)
+        self.assertEqual(
+            list(Comment.objects.order_by('pub_date').values_list(
+                'text', flat=True)),
+            ['Комментарий 0', 'Комментарий 1', 'Комментарий 2'])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3)
+
+    def test_flush_keeps_queued_time(self):
+        self.comment('Комментарий')
+        queued = comment_queue.pending(self.post.pk, self.reader)[0]
+        field = Comment._meta.get_field('pub_date')
+        bulk_create = Comment.objects.bulk_create
+        flags = []
+
+        def check_flags(objs):
+            # другие потоки сохраняют комментарии во время сброса
+            flags.append(field.auto_now_add)
+            return bulk_create(objs)
+
+        with mock.patch.object(Comment.objects, 'bulk_create', check_flags):
+            comment_queue.flush()
+        self.assertEqual(flags, [True])
+        comment = Comment.objects.get()
+        self.assertEqual(comment.pub_date, queued.pub_date)
+        self.assertEqual(comment.modified, queued.pub_date)
+
+    def test_comments_inserted_at_same_time_keep_their_dates(self):
+        for number in range(2):
+            self.comment(f'Комментарий {number}')
+        queued = {comment.text: comment.pub_date for comment in
+                  comment_queue.pending(self.post.pk, self.reader)}
+        # bulk_create ставит обоим комментариям одно и то же время
+        with mock.patch('django.utils.timezone.now',
+                        return_value=timezone.now()):
+            comment_queue.flush()
+        self.assertEqual(dict(Comment.objects.values_list('text', 'pub_date')),
+                         queued)
+
+    def test_invalid_comment_is_not_queued(self):
+        self.comment('')
+        self.assertEqual(comment_queue.size(), 0)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[0]), {'text': 'текст'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(comment_queue.size(), 0)
+
+    def test_flush_after_interrupted_commit_skips_written_rows(self):
+        self.comment('Комментарий')
+        delete = 'DELETE FROM comment WHERE id <= ?'
+        queue = comment_queue._queue()
+        with mock.patch.object(comment_queue, '_queue') as patched:
+            # база записана, очередь — нет
+            patched.return_value.execute.side_effect = (
+                lambda sql, *args: (
+                    None if sql == delete else queue.execute(sql, *args)))
+            comment_queue.flush()
+        self.assertEqual(comment_queue.size(), 1)
+        self.assertEqual(comment_queue.flush(), 0)
+        self.assertEqual(comment_queue.size(), 0)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_comments_of_deleted_post_are_dropped(self):
+        post = Post.objects.create(author=self.author, text='Удалят')
+        self.client.post(reverse('posts:add_comment', args=[post.pk]),
+                         {'text': 'Комментарий'})
+        post.delete()
+        self.assertEqual(comment_queue.flush(), 0)
+        self.assertEqual(comment_queue.size(), 0)
+
+    @override_settings(COMMENT_WRITE_MODE='read_your_writes')
+    def test_author_reads_own_queued_comment(self):
+        self.comment('Мой комментарий')
+        detail = reverse('posts:post_detail', args=[self.post.pk])
+        self.assertContains(self.client.get(detail), 'Мой комментарий')
+        self.client.force_login(self.author)
+        self.assertNotContains(self.client.get(detail), 'Мой комментарий')
+
+    def test_flush_command(self):
+        self.comment('Комментарий')
+        output = StringIO()
+        call_command('flush_comments', stdout=output)
+        self.assertIn('Записано комментариев: 1', output.getvalue())
+        self.assertTrue(Comment.objects.exists())
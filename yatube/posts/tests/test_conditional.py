@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание группы')
+        self.other_group = Group.objects.create(
+            title='Другая группа', slug='other-slug',
+            description='Тестовое описание группы')
+        self.post = Post.objects.create(
+            author=self.author, text='Тестовый пост', group=self.group)
+        self.pages = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=[self.group.slug]),
+            'profile': reverse('posts:profile', args=[self.author.username]),
+            'post': reverse('posts:post_detail', args=[self.post.pk]),
+        }
+
+    def changed_pages(self, change):
+        """Pages that no longer revalidate with their ETag after change."""
+        etags = {page: self.client.get(url)['ETag']
+                 for page, url in self.pages.items()}
+        change()
+        return {page for page, url in self.pages.items()
+                if self.client.get(url, HTTP_IF_NONE_MATCH=etags[page])
+                .status_code != 304}
+
+    def test_unchanged_page_is_not_rendered(self):
+        etag = self.client.get(self.pages['index'])['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.pages['index'],
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.pages['profile'])
+        response = self.client.get(
+            self.pages['profile'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_their_scopes(self):
+        reader = User.objects.create_user(username='reader')
+        changes = {
+            'новый пост в группе': (
+                lambda: Post.objects.create(
+                    author=self.author, text='Пост', group=self.group),
+                {'index', 'group', 'profile', 'post'}),
+            'пост в другой группе': (
+                lambda: Post.objects.create(
+                    author=reader, text='Пост', group=self.other_group),
+                {'index'}),
+            'комментарий': (
+                lambda: Comment.objects.create(
+                    post=self.post, author=reader, text='Комментарий'),
+                {'post'}),
+            'подписка': (
+                lambda: Follow.objects.create(user=reader, author=self.author),
+                {'profile', 'post'}),
+        }
+        for name, (change, expected) in changes.items():
+            with self.subTest(change=name):
+                self.assertEqual(self.changed_pages(change), expected)
+
+    def test_validators_depend_on_user(self):
+        client = Client()
+        client.force_login(self.author)
+        for url in self.pages.values():
+            with self.subTest(url=url):
+                self.assertNotEqual(self.client.get(url)['ETag'],
+                                    client.get(url)['ETag'])
+
+    def test_logged_in_pages_are_private_without_last_modified(self):
+        last_modified = self.client.get(self.pages['index'])['Last-Modified']
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(self.pages['index'],
+                              HTTP_IF_MODIFIED_SINCE=last_modified)
+        # страница гостя не годится вошедшему пользователю
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+        for response in (response, self.client.get(self.pages['index'])):
+            self.assertIn('private', response['Cache-Control'])
+
+    def test_missing_post_has_no_validators(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,93 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='NoName')
+        self.follower = User.objects.create_user(username='follower')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание группы'
+        )
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Тестовое описание поста',
+            group=self.group
+        )
+
+    def assertCounters(self, **expected):
+        values: dict = {
+            'posts_count': lambda: UserCounters.objects.get(
+                user=self.user).posts_count,
+            'followers_count': lambda: UserCounters.objects.get(
+                user=self.user).followers_count,
+            'following_count': lambda: UserCounters.objects.get(
+                user=self.follower).following_count,
+            'group_posts': lambda: Group.objects.get(
+                pk=self.group.pk).posts_count,
+            'other_group_posts': lambda: Group.objects.get(
+                pk=self.other_group.pk).posts_count,
+            'comments_count': lambda: Post.objects.get(
+                pk=self.post.pk).comments_count,
+        }
+        for name, value in expected.items():
+            with self.subTest(counter=name):
+                self.assertEqual(values[name](), value)
+
+    def test_post_counters(self):
+        self.assertCounters(posts_count=1, group_posts=1)
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertCounters(posts_count=1, group_posts=0, other_group_posts=1)
+        Post.objects.create(author=self.user, text='Второй пост')
+        self.assertCounters(posts_count=2)
+        Post.objects.filter(author=self.user).delete()
+        self.assertCounters(posts_count=0, other_group_posts=0)
+
+    def test_comment_and_follow_counters(self):
+        comment = Comment.objects.create(
+            post=self.post, author=self.follower, text='test comment')
+        Follow.objects.create(user=self.follower, author=self.user)
+        self.assertCounters(comments_count=1, followers_count=1,
+                            following_count=1)
+        comment.delete()
+        Follow.objects.all().delete()
+        self.assertCounters(comments_count=0, followers_count=0,
+                            following_count=0)
+
+    def test_rebuild_counters_command(self):
+        Post.objects.bulk_create(
+            Post(text=f'test text {i}', group=self.group, author=self.user)
+            for i in range(3)
+        )
+        UserCounters.objects.all().delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertCounters(posts_count=4, group_posts=4)
+        self.assertEqual(UserCounters.objects.count(), User.objects.count())
+
+    def test_pages_read_counters(self):
+        UserCounters.objects.filter(user=self.user).update(posts_count=42)
+        pages: tuple = (
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for address in pages:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertContains(response, '42')
@@ -1,12 +1,18 @@
 import shutil
 import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from PIL import Image
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.conf import settings
+from django.core.management import call_command
 
+from ..management.commands import generate_thumbnails
 from ..models import Post, Group, Comment
 
 
@@ -102,6 +108,67 @@ class PostCreateFormTests(TestCase):
         self.assertNotEqual(old_text, new_text)
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class PostThumbnailTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='NoName')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def uploaded(self, name):
+        image = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(image, 'PNG')
+        return SimpleUploadedFile(
+            name=name, content=image.getvalue(), content_type='image/png')
+
+    def test_thumbnail_generated_on_form_save(self):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой',
+                  'image': self.uploaded('red.png')})
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertTrue(post.thumbnail_url)
+        self.assertEqual((post.thumbnail_width, post.thumbnail_height),
+                         tuple(map(int, settings.POST_THUMBNAIL_GEOMETRY
+                                   .split('x'))))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.thumbnail_url)
+
+    def test_generate_thumbnails_command_backfills(self):
+        post = Post.objects.create(
+            author=self.user, text='Старый пост',
+            image=self.uploaded('old.png'))
+        self.assertEqual(post.thumbnail_url, '')
+        call_command('generate_thumbnails', workers=0, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail_url)
+
+    def test_generate_thumbnails_command_skips_broken_images(self):
+        broken = Post.objects.create(
+            author=self.user, text='Битая картинка',
+            image=SimpleUploadedFile('broken.png', b'not an image'))
+        post = Post.objects.create(
+            author=self.user, text='Старый пост',
+            image=self.uploaded('old.png'))
+        output = StringIO()
+        # по одному посту в порции: сбой не мешает следующим порциям
+        with mock.patch.object(generate_thumbnails, 'CHUNK_SIZE', 1):
+            with self.assertLogs(generate_thumbnails.logger):
+                call_command('generate_thumbnails', '--all', workers=0,
+                             stdout=output)
+        self.assertIn('Готово превью: 1, ошибок: 1', output.getvalue())
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail_url)
+        broken.refresh_from_db()
+        self.assertEqual(broken.thumbnail_url, '')
+
+
 class CommentFormTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -0,0 +1,73 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import group_stats
+from ..models import Group, GroupAuthorStats, GroupStats, Post
+
+User = get_user_model()
+
+
+@override_settings(GROUP_TOP_AUTHORS=2)
+class GroupStatsTest(TestCase):
+
+    def setUp(self) -> None:
+        self.authors = [User.objects.create_user(username=f'author{number}')
+                        for number in range(3)]
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание группы')
+        self.other_group = Group.objects.create(
+            title='Другая группа', slug='other-slug',
+            description='Тестовое описание группы')
+        self.posts = [
+            Post.objects.create(author=author, text='Пост', group=self.group)
+            for author, times in zip(self.authors, (3, 1, 2))
+            for _ in range(times)
+        ]
+
+    def top(self, group):
+        return json.loads(GroupStats.objects.get(group=group).top_authors)
+
+    def test_signals_keep_stats(self):
+        first, second, third = self.authors
+        self.assertEqual(self.top(self.group),
+                         [[first.pk, 3], [third.pk, 2]])
+        self.assertEqual(GroupStats.objects.get(group=self.group)
+                         .last_post_date, self.posts[-1].pub_date)
+
+        self.posts[-1].delete()
+        self.posts[-2].group = self.other_group
+        self.posts[-2].save()
+        self.assertEqual(self.top(self.group),
+                         [[first.pk, 3], [second.pk, 1]])
+        self.assertEqual(self.top(self.other_group), [[third.pk, 1]])
+        self.assertFalse(GroupAuthorStats.objects.filter(
+            group=self.group, author=third).exists())
+        self.assertEqual(GroupStats.objects.get(group=self.group)
+                         .last_post_date, self.posts[3].pub_date)
+
+    def test_rebuild_matches_signals(self):
+        stats = GroupStats.objects.filter(group=self.group)
+        expected = list(stats.values())
+        GroupStats.objects.all().delete()
+        GroupAuthorStats.objects.all().delete()
+        group_stats.rebuild()
+        self.assertEqual(list(stats.values()), expected)
+        self.assertEqual(self.top(self.other_group), [])
+
+    def test_directory_page(self):
+        # группы и имена авторов, без подсчёта по таблице постов
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('posts:group_index'))
+        groups = response.context['groups']
+        self.assertEqual([group.slug for group in groups],
+                         ['other-slug', 'test-slug'])
+        self.assertEqual(groups[1].posts_count, 6)
+        self.assertEqual([(author.username, count)
+                          for author, count in groups[1].top_authors],
+                         [('author0', 3), ('author2', 2)])
+        self.assertEqual(groups[0].top_authors, [])
+        self.assertContains(response, 'author0')
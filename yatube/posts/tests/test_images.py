@@ -0,0 +1,107 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..forms import PostForm
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def picture(size=(40, 20), image_format='PNG', mode='RGB', color='red',
+            **options):
+    content = BytesIO()
+    Image.new(mode, size, color).save(content, image_format, **options)
+    return content.getvalue()
+
+
+def upload(data, name='picture.png'):
+    return SimpleUploadedFile(name, data, content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False,
+                   POST_IMAGE_FORMAT='WEBP', POST_IMAGE_MAX_SIDE=100)
+class ImagePipelineTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='NoName')
+        self.client.force_login(self.user)
+
+    def form(self, data):
+        return PostForm({'text': 'Пост с картинкой'},
+                        {'image': upload(data)})
+
+    def create(self, data):
+        form = self.form(data)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.instance.author = self.user
+        return form.save()
+
+    def test_reencoded_and_capped_without_metadata(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # повёрнута на 90°
+        exif[0x010F] = 'Camera'
+        post = self.create(picture((400, 200), 'JPEG', exif=exif.tobytes()))
+        self.assertTrue(post.image.name.endswith('.webp'))
+        with default_storage.open(post.image.name) as file:
+            stored = Image.open(file)
+            self.assertEqual(stored.format, 'WEBP')
+            # развёрнута по EXIF и уменьшена до POST_IMAGE_MAX_SIDE
+            self.assertEqual(stored.size, (50, 100))
+            self.assertFalse(stored.getexif())
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail_url)
+
+    def test_transparency_is_kept(self):
+        post = self.create(picture(mode='RGBA', color=(255, 0, 0, 128)))
+        with default_storage.open(post.image.name) as file:
+            self.assertEqual(Image.open(file).mode, 'RGBA')
+
+    def test_identical_uploads_are_stored_once(self):
+        first = self.create(picture())
+        second = self.create(picture())
+        self.assertEqual(first.image.name, second.image.name)
+        directory = default_storage.path(first.image.name).rsplit('/', 1)[0]
+        self.assertEqual(len(default_storage.listdir(directory)[1]), 1)
+
+    def test_rejected_uploads(self):
+        cases = {
+            'формат': (picture(image_format='BMP'), {}),
+            'не картинка': (b'not an image at all', {}),
+            'пиксели': (picture((400, 200)), {'POST_IMAGE_MAX_PIXELS': 100}),
+            'размер': (picture(), {'UPLOAD_MAX_SIZE': 10}),
+        }
+        for case, (data, limits) in cases.items():
+            with self.subTest(case=case), override_settings(**limits):
+                form = self.form(data)
+                self.assertFalse(form.is_valid())
+                self.assertIn('image', form.errors)
+
+    @override_settings(UPLOAD_MAX_SIZE=1024)
+    def test_oversized_upload_is_not_buffered(self):
+        response = self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Большая картинка',
+             'image': upload(picture((400, 400), 'BMP'), 'big.bmp')})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Post.objects.exists())
+        self.assertIn('image', response.context['form'].errors)
+        # до формы дошёл пустой файл с настоящим размером
+        self.assertGreater(response.context['form'].files['image'].size,
+                           1024)
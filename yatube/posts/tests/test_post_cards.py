@@ -0,0 +1,67 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..templatetags import post_cards
+
+User = get_user_model()
+
+
+class PostCardsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        for number in range(3):
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Пост {number}')
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.url = reverse('posts:group_list', args=[self.group.slug])
+
+    def cards(self):
+        return post_cards.post_cards(Post.objects.feed())
+
+    def test_cards_are_rendered_once(self):
+        first = self.cards()
+        with mock.patch('django.template.backends.django.Template.render'
+                        ) as render:
+            second = self.cards()
+        render.assert_not_called()
+        self.assertEqual(second, first)
+        self.assertIn('Пост 2', first[0][1])
+
+    def test_edit_and_thumbnail_render_card_again(self):
+        self.cards()
+        post = Post.objects.latest('pk')
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertContains(self.client.get(self.url), 'Исправленный пост')
+        Post.objects.filter(pk=post.pk).update(
+            image='posts/image.webp', thumbnail_url='/media/thumb.webp',
+            thumbnail_width=1, thumbnail_height=1)
+        self.assertContains(self.client.get(self.url), '/media/thumb.webp')
+
+    def test_renamed_author_renders_card_again(self):
+        self.cards()
+        self.author.username = 'renamed'
+        self.author.first_name = 'Новое'
+        self.author.save()
+        response = self.client.get(self.url)
+        self.assertContains(
+            response, reverse('posts:profile', args=['renamed']))
+        self.assertContains(response, 'Новое')
+
+    @override_settings(POST_CARD_CACHE=False)
+    def test_cache_can_be_turned_off(self):
+        self.cards()
+        self.assertEqual(
+            cache.get_many([post_cards.card_key(post)
+                            for post in Post.objects.feed()]), {})
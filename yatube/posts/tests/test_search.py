@@ -0,0 +1,137 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class SearchTestsMixin:
+    TEST_OF_POST: int = 25
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(
+            username='NoName', first_name='Лев', last_name='Толстой')
+        self.group = Group.objects.create(
+            title='Котоводы',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Кот кот кот',
+            group=self.group
+        )
+        self.other_post = Post.objects.create(
+            author=self.user,
+            text='Кот, собака и ещё много разных слов в этом посте'
+        )
+
+    def found(self, query, **params):
+        response = self.client.get(reverse('posts:search'),
+                                   {'q': query, **params})
+        return response, list(response.context['page_obj'])
+
+    def test_search_ranks_matches(self):
+        _, posts = self.found('кот')
+        self.assertEqual(posts, [self.post, self.other_post])
+
+    def test_search_by_group_and_author(self):
+        queries: dict = {
+            'котоводы': [self.post],
+            'толстой': [self.post, self.other_post],
+            'кот собака': [self.other_post],
+            'слон': [],
+        }
+        for query, expected in queries.items():
+            with self.subTest(query=query):
+                _, posts = self.found(query)
+                self.assertCountEqual(posts, expected)
+
+    def test_index_follows_edit_and_delete(self):
+        self.post.text = 'Слон'
+        self.post.save()
+        self.assertEqual(self.found('слон')[1], [self.post])
+        self.assertEqual(self.found('кот')[1], [self.other_post])
+        self.other_post.delete()
+        self.assertEqual(self.found('кот')[1], [])
+
+    def test_index_follows_author_rename_only(self):
+        with mock.patch.object(search, 'index_posts') as index_posts:
+            self.user.set_password('new-password')
+            self.user.save()
+        index_posts.assert_not_called()
+        self.user.last_name = 'Достоевский'
+        self.user.save()
+        self.assertCountEqual(self.found('достоевский')[1],
+                              [self.post, self.other_post])
+
+    def test_index_follows_group_title_only(self):
+        with mock.patch.object(search, 'index_posts') as index_posts:
+            self.group.description = 'Новое описание'
+            self.group.save()
+        index_posts.assert_not_called()
+        self.group.title = 'Собаководы'
+        self.group.save()
+        self.assertEqual(self.found('собаководы')[1], [self.post])
+        self.assertEqual(self.found('котоводы')[1], [])
+
+    def test_index_many_terms_and_posts(self):
+        self.post.text = ' '.join(f'слово{i}' for i in range(600))
+        self.post.save()
+        self.assertEqual(self.found('слово599')[1], [self.post])
+        with mock.patch.object(search, 'ID_BATCH_SIZE', 2):
+            Post.objects.bulk_create(
+                Post(text=f'жираф {i}', author=self.user) for i in range(5))
+            search.index_posts(Post.objects.all())
+            search.rebuild()
+        self.assertEqual(len(self.found('жираф')[1]), 5)
+        self.assertEqual(self.found('слово0')[1], [self.post])
+
+    def test_search_pages_with_cursor(self):
+        Post.objects.bulk_create(
+            Post(text=f'жираф номер {i}', author=self.user)
+            for i in range(self.TEST_OF_POST)
+        )
+        search.rebuild()
+        ids, params = [], {}
+        while True:
+            response, posts = self.found('жираф', **params)
+            ids.extend(post.pk for post in posts)
+            page_obj = response.context['page_obj']
+            if not page_obj.has_next():
+                break
+            params = {'cursor': page_obj.next_cursor}
+        self.assertEqual(len(ids), self.TEST_OF_POST)
+        self.assertEqual(len(set(ids)), self.TEST_OF_POST)
+
+    def test_query_syntax_is_escaped(self):
+        for query in ('"', 'кот OR', 'NEAR(кот', '*', ''):
+            with self.subTest(query=query):
+                response, _ = self.found(query)
+                self.assertEqual(response.status_code, 200)
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'толстой'})
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {self.post, self.other_post})
+
+
+@override_settings(SEARCH_BACKEND='terms')
+class TermsSearchTest(SearchTestsMixin, TestCase):
+    pass
+
+
+@override_settings(SEARCH_BACKEND='fts5')
+class Fts5SearchTest(SearchTestsMixin, TestCase):
+    pass
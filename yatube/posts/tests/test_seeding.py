@@ -0,0 +1,58 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import seeding
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+class SeedCommandTest(TestCase):
+
+    def seed(self):
+        output = StringIO()
+        call_command('seed', users=20, groups=3, posts=200, comments=50,
+                     follows=40, seed=7, workers=1, stdout=output)
+        return output.getvalue()
+
+    def test_seed_creates_rows_and_derived_data(self):
+        self.seed()
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertEqual(
+            sum(User.objects.values_list(
+                'counters__posts_count', flat=True)), 200)
+
+    def test_seed_reports_new_rows(self):
+        output = self.seed()
+        self.assertIn('posts: 200 строк', output)
+        self.assertIn('comments: 50 строк', output)
+        self.assertIn(f'follows: {Follow.objects.count()} строк', output)
+
+    def test_seeded_posts_and_comments_are_spread_in_time(self):
+        self.seed()
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True))
+        self.assertEqual(dates, sorted(dates))
+        self.assertGreater(dates[-1] - dates[0],
+                           timedelta(days=seeding.SPREAD_DAYS - 10))
+        self.assertLess(dates[-1], timezone.now())
+        self.assertFalse(Post.objects.exclude(
+            modified=F('pub_date')).exists())
+        self.assertFalse(Comment.objects.filter(
+            pub_date__lt=F('post__pub_date')).exists())
+        self.assertGreater(
+            Comment.objects.values('pub_date').distinct().count(), 1)
+
+    def test_seed_refuses_a_filled_database(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
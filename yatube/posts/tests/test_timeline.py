@@ -0,0 +1,112 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.paginator import CursorPaginator, WindowedPaginator
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry, UserCounters
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+
+    def setUp(self) -> None:
+        self.author = User.objects.create_user(username='author')
+        self.follower = User.objects.create_user(username='follower')
+        self.client_follower = Client()
+        self.client_follower.force_login(self.follower)
+        self.old_post = Post.objects.create(
+            author=self.author, text='Пост до подписки')
+
+    def feed(self):
+        response = self.client_follower.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        new_post = Post.objects.create(
+            author=self.author, text='Пост после подписки')
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.follower).count(), 2)
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_unfollow_prunes_timeline(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.client_follower.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_is_merged_on_read(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        new_post = Post.objects.create(
+            author=self.author, text='Пост популярного автора')
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=new_post).exists())
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+
+class FeedPagingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.follower = User.objects.create_user(username='follower')
+        cls.popular = User.objects.create_user(username='popular')
+        authors = [User.objects.create_user(username=f'author_{number}')
+                   for number in range(3)]
+        for author in authors:
+            Follow.objects.create(user=cls.follower, author=author)
+        Follow.objects.create(user=cls.follower, author=cls.popular)
+        for number in range(30):
+            author = (authors + [cls.popular])[number % 4]
+            Post.objects.create(author=author, text=f'Пост {number}')
+        cls.expected = list(Post.objects.filter(
+            author__in=authors + [cls.popular]).values_list('pk', flat=True))
+
+    def walk(self, paginator_class, *args):
+        ids, page = [], paginator_class(timeline.feed(self.follower), 7,
+                                        *args).get_page(None)
+        while True:
+            ids += [post.pk for post in page]
+            if not page.has_next():
+                return ids
+            page = page.paginator.get_page(
+                page.next_cursor if page.paginator.is_cursor
+                else page.next_page_number())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_posts_are_merged_into_pages(self):
+        # подписчики только у популярного: остальные раскладываются
+        UserCounters.objects.exclude(user=self.popular).update(
+            followers_count=0)
+        UserCounters.objects.filter(user=self.popular).update(
+            followers_count=1)
+        for paginator_class in (CursorPaginator, WindowedPaginator):
+            with self.subTest(paginator=paginator_class.__name__):
+                self.assertEqual(self.walk(paginator_class), self.expected)
+        self.assertEqual(timeline.feed(self.follower).count(), 30)
+
+    def test_inbox_page_reads_the_index(self):
+        self.assertEqual(self.walk(CursorPaginator), self.expected)
+        page = timeline.feed(self.follower)._inbox()[:10]
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {page.query}')
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    @override_settings(TIMELINE_INBOX_SIZE=5, TIMELINE_TRIM_EVERY=1)
+    def test_inbox_is_trimmed(self):
+        author = User.objects.create_user(username='new_author')
+        Follow.objects.create(user=self.follower, author=author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.follower).count(), 5)
+        new_post = Post.objects.create(author=author, text='Новый пост')
+        entries = TimelineEntry.objects.filter(user=self.follower)
+        self.assertEqual(entries.count(), 5)
+        self.assertEqual(entries.latest('pub_date').post, new_post)
@@ -0,0 +1,202 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from .. import search, seeding, transfer
+from ..models import (Comment, Follow, Group, Post, TimelineEntry,
+                      User)
+
+
+class TransferCommandTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        seeding.seed(users=8, groups=3, posts=60, comments=40, follows=15,
+                     seed_value=3)
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def export(self, name, *args, **options):
+        call_command('export_posts', self.path(name), *args,
+                     stdout=StringIO(), **options)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(self.path(name), 'rt', encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def snapshot(self):
+        # id не переносятся: пост узнаётся по автору и времени
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'author__username', 'group__slug', 'text', 'pub_date',
+                'comments_count')),
+            list(Comment.objects.order_by('pk').values_list(
+                'post__author__username', 'post__pub_date',
+                'author__username', 'pub_date')),
+            set(Follow.objects.values_list(
+                'user__username', 'author__username')),
+        )
+
+    def wipe(self):
+        for model in (Follow, Comment, Post, Group, User):
+            model.objects.all().delete()
+
+    def test_round_trip_keeps_content_and_dates(self):
+        before = self.snapshot()
+        self.export('dump.ndjson.gz')
+        self.wipe()
+        call_command('import_posts', self.path('dump.ndjson.gz'),
+                     stdout=StringIO())
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(
+            sum(User.objects.values_list('counters__posts_count',
+                                         flat=True)), 60)
+        self.assertEqual(
+            sum(Group.objects.values_list('posts_count', flat=True)),
+            Post.objects.filter(group__isnull=False).count())
+        post = Post.objects.first()
+        self.assertEqual(
+            list(search.filter_posts(Post.objects.all(), post.text)
+                 .filter(pk=post.pk)), [post])
+        follow = Follow.objects.filter(
+            author__posts__isnull=False).first()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=follow.user, author=follow.author).exists())
+
+    def test_import_into_database_with_other_posts(self):
+        rows = self.export('dump.ndjson')
+        taken = Post.objects.order_by('pk').values_list('pk', flat=True)[:5]
+        taken = list(taken)
+        self.wipe()
+        # местные посты заняли id выгруженных
+        local = User.objects.create_user(username='local')
+        for pk in taken:
+            Post.objects.create(pk=pk, author=local, text='Местный пост')
+        before = set(Post.objects.values_list('pk', flat=True))
+        output = StringIO()
+        call_command('import_posts', self.path('dump.ndjson'),
+                     stdout=output)
+        self.assertIn('post: добавлено 60 строк', output.getvalue())
+        self.assertEqual(Post.objects.exclude(pk__in=before).count(), 60)
+        self.assertFalse(Comment.objects.filter(post__author=local).exists())
+        self.assertEqual(
+            Comment.objects.count(),
+            sum(row['model'] == 'comment' for row in rows))
+
+    def test_import_twice_skips_existing_rows(self):
+        self.export('dump.ndjson')
+        before = self.snapshot()
+        output = StringIO()
+        call_command('import_posts', self.path('dump.ndjson'),
+                     stdout=output)
+        self.assertEqual(self.snapshot(), before)
+        self.assertIn('post: добавлено 0 строк', output.getvalue())
+
+    def test_posts_with_same_author_and_time_keep_their_comments(self):
+        post = Post.objects.filter(comments__isnull=False).first()
+        twin = Post.objects.create(author=post.author, text='Близнец')
+        Post.objects.filter(pk=twin.pk).update(pub_date=post.pub_date)
+        Comment.objects.create(post=twin, author=post.author,
+                               text='К близнецу')
+        before = self.snapshot()
+        self.export('dump.ndjson')
+        self.wipe()
+        call_command('import_posts', self.path('dump.ndjson'),
+                     stdout=StringIO())
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(
+            Comment.objects.get(text='К близнецу').post.text, 'Близнец')
+
+    def test_import_resumes_between_posts_and_comments(self):
+        before = self.snapshot()
+        self.export('dump.ndjson')
+        self.wipe()
+        checkpoint = transfer.Checkpoint(self.path('import.json'))
+        load = transfer._load
+
+        def stop_at_comments(model, *args):
+            if model == 'comment':
+                raise KeyboardInterrupt
+            return load(model, *args)
+
+        with mock.patch.object(transfer, '_load', stop_at_comments):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('import_posts', self.path('dump.ndjson'),
+                             checkpoint=checkpoint.path, stdout=StringIO())
+        self.assertTrue(os.path.exists(transfer.post_ids_path(checkpoint)))
+        call_command('import_posts', self.path('dump.ndjson'),
+                     checkpoint=checkpoint.path, stdout=StringIO())
+        self.assertEqual(self.snapshot(), before)
+        self.assertFalse(os.path.exists(transfer.post_ids_path(checkpoint)))
+
+    def test_filters(self):
+        author = Post.objects.values_list(
+            'author__username', flat=True).first()
+        rows = self.export('author.ndjson', author=author)
+        posts = [row for row in rows if row['model'] == 'post']
+        self.assertEqual(len(posts),
+                         Post.objects.filter(author__username=author).count())
+        self.assertEqual({row['author'] for row in posts}, {author})
+        self.assertTrue(all(row['author'] == author
+                            for row in rows if row['model'] == 'follow'))
+        # все, на кого ссылаются строки, тоже выгружены
+        users = {row['username'] for row in rows if row['model'] == 'user'}
+        self.assertTrue({row['author'] for row in rows
+                         if row['model'] == 'comment'} <= users)
+
+        self.assertEqual(
+            self.export('future.ndjson', '--since', '2999-01-01'), [])
+
+    def test_interrupted_export_resumes_from_checkpoint(self):
+        checkpoint = self.path('export.json')
+        complete = self.export('complete.ndjson')
+
+        chunks = []
+
+        def fail_on_second_chunk(file, lines, compress):
+            if chunks:
+                raise KeyboardInterrupt
+            chunks.append(len(lines))
+            write(file, lines, compress)
+
+        write = transfer._write
+        with mock.patch.object(transfer, 'CHUNK_SIZE', 50), \
+                mock.patch.object(transfer, '_write', fail_on_second_chunk):
+            with self.assertRaises(KeyboardInterrupt):
+                self.export('resumed.ndjson', checkpoint=checkpoint)
+        self.assertTrue(os.path.exists(checkpoint))
+        self.assertEqual(self.export('resumed.ndjson', checkpoint=checkpoint),
+                         complete)
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_import_resumes_after_checkpointed_lines(self):
+        rows = self.export('dump.ndjson')
+        self.wipe()
+        checkpoint = transfer.Checkpoint(self.path('import.json'))
+        groups = sum(row['model'] == 'group' for row in rows)
+        checkpoint.save({'lines': groups})
+        call_command('import_posts', self.path('dump.ndjson'),
+                     checkpoint=checkpoint.path, stdout=StringIO())
+        self.assertFalse(Group.objects.exists())
+        self.assertFalse(Post.objects.filter(group__isnull=False).exists())
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertIsNone(checkpoint.load())
+
+    def test_malformed_line(self):
+        with open(self.path('bad.ndjson'), 'w') as file:
+            file.write('{"model": "planet"}\n')
+        with self.assertRaises(CommandError):
+            call_command('import_posts', self.path('bad.ndjson'),
+                         stdout=StringIO())
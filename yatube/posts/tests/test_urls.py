@@ -35,6 +35,7 @@ class PostsURLTests(TestCase):
     def test_urls_uses_correct_template(self):
         templates_url_names: dict = {
             '/': 'posts/index.html',
+            '/group/': 'posts/group_index.html',
             f'/group/{self.group.slug}/': 'posts/group_list.html',
             f'/profile/{self.user.username}/': 'posts/profile.html',
             f'/posts/{self.post.pk}/': 'posts/post_detail.html',
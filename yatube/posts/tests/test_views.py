@@ -7,6 +7,11 @@ from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.core.cache import cache
+
+from core.paginator import encode_token
 
 from ..models import Post, Group, Comment, Follow
 from ..forms import PostForm
@@ -264,6 +269,126 @@ class PaginatorViewTest(TestCase):
                          self.COUNT_POST_SECOND_PAGE)
 
 
+@override_settings(FEED_PAGINATION='cursor')
+class CursorPaginatorViewTest(TestCase):
+    TEST_OF_POST: int = 25
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username='NoName')
+        self.group = Group.objects.create(
+            title='test group',
+            slug='test-slug'
+        )
+        Post.objects.bulk_create(
+            Post(text=f'test text {i}', group=self.group, author=self.user)
+            for i in range(self.TEST_OF_POST)
+        )
+        # одинаковая дата у всех постов: порядок держится на id
+        Post.objects.update(pub_date=timezone.now())
+        self.expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True))
+
+    def walk(self, address):
+        ids, cursors, params = [], [], {}
+        while True:
+            response = self.client.get(address, params)
+            page_obj = response.context['page_obj']
+            ids.extend(post.id for post in page_obj)
+            cursors.append(page_obj.previous_cursor)
+            if not page_obj.has_next():
+                return ids, cursors, page_obj
+            params = {'cursor': page_obj.next_cursor}
+
+    def test_cursor_pages_cover_feed_without_gaps(self):
+        addresses: tuple = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for address in addresses:
+            with self.subTest(address=address):
+                ids, _, last_page = self.walk(address)
+                self.assertEqual(ids, self.expected)
+                self.assertEqual(len(last_page), self.TEST_OF_POST
+                                 % settings.COUNT_POSTS)
+
+    def test_previous_cursor_returns_previous_page(self):
+        address = reverse('posts:index')
+        _, cursors, _ = self.walk(address)
+        response = self.client.get(address, {'cursor': cursors[-1]})
+        self.assertEqual(
+            [post.id for post in response.context['page_obj']],
+            self.expected[settings.COUNT_POSTS:2 * settings.COUNT_POSTS])
+
+    def test_cursor_page_does_not_count(self):
+        response = self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('posts:index'),
+                {'cursor': response.context['page_obj'].next_cursor})
+        self.assertContains(response, '?cursor=')
+
+    def test_broken_cursor_returns_first_page(self):
+        cursors = ('not-a-cursor', encode_token(['n', [None, None]]),
+                   encode_token(['n', ['', '']]),
+                   encode_token(['n', [[1], {'a': 1}]]),
+                   encode_token(['n', 'ab']))
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('posts:index'),
+                                           {'cursor': cursor})
+                self.assertEqual(
+                    [post.id for post in response.context['page_obj']],
+                    self.expected[:settings.COUNT_POSTS])
+
+
+class CommentsPaginationTest(TestCase):
+    TEST_OF_COMMENT: int = 25
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='NoName')
+        self.post = Post.objects.create(author=self.user, text='test text')
+        authors = [User.objects.create_user(username=f'commentator_{i}')
+                   for i in range(3)]
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=authors[i % len(authors)],
+                    text=f'comment {i}')
+            for i in range(self.TEST_OF_COMMENT)
+        )
+        self.expected = list(Comment.objects.order_by(
+            'pub_date', 'id').values_list('id', flat=True))
+
+    def test_post_detail_shows_first_comments(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse('posts:post_detail', args=[self.post.pk]))
+        comments = response.context['comments']
+        self.assertEqual([comment.id for comment in comments],
+                         self.expected[:settings.COUNT_COMMENTS])
+        self.assertContains(response, 'data-fragment=')
+
+    def test_fragment_loads_next_comments(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        cursor = response.context['comments'].next_cursor
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('posts:post_comments', args=[self.post.pk]),
+                {'cursor': cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertEqual(
+            [comment.id for comment in response.context['comments']],
+            self.expected[settings.COUNT_COMMENTS:])
+        self.assertNotContains(response, 'data-fragment=')
+
+    def test_fragment_of_missing_post_is_404(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+
 class FollowTests(TestCase):
     COUNT_POST = 0
 
@@ -308,6 +433,27 @@ class FollowTests(TestCase):
             kwargs={'username': self.user_following.username}))
         self.assertEqual(Follow.objects.count(), follow_count)
 
+    def test_follow_is_idempotent(self):
+        address = reverse('posts:profile_follow',
+                          kwargs={'username': self.user_following.username})
+        for _ in range(2):
+            self.client_follower.get(address)
+        self.assertEqual(Follow.objects.filter(
+            user=self.user_follower, author=self.user_following).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(
+                user=self.user_follower, author=self.user_following)
+
+    def test_cannot_follow_yourself(self):
+        self.client_following.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.user_following.username}))
+        self.assertFalse(Follow.objects.filter(
+            user=self.user_following).exists())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(
+                user=self.user_following, author=self.user_following)
+
     def test_new_post_appears_in_subscribers(self):
 
         Follow.objects.create(
@@ -321,3 +467,57 @@ class FollowTests(TestCase):
         response = self.client_following.post(reverse('posts:follow_index'))
         self.assertEqual(len(response.context['page_obj']),
                          self.COUNT_POST)
+
+
+class FeedQueriesTest(TestCase):
+    """Количество запросов ленты не зависит от числа постов на странице."""
+    AUTHORS_COUNT: int = 5
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.follower = User.objects.create_user(username='follower')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.follower)
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание группы'
+        )
+        for i in range(self.AUTHORS_COUNT):
+            author = User.objects.create_user(
+                username=f'author_{i}', first_name='Имя', last_name='Фамилия')
+            Follow.objects.create(user=self.follower, author=author)
+            for _ in range(settings.COUNT_POSTS):
+                Post.objects.create(
+                    author=author, text=f'test text {i}', group=self.group)
+        self.author = author
+
+    def test_feed_views_query_count(self):
+        # группа и профиль берут число постов из счётчиков, без COUNT(*);
+        # сессия подписчика читается из кеша, лента подписок сначала
+        # ищет популярных авторов, а потом читает страницу ленты
+        pages: dict = {
+            reverse('posts:index'): (self.client, 2),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): (
+                self.client, 2
+            ),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}): (
+                self.client, 2
+            ),
+            reverse('posts:follow_index'): (self.authorized_client, 4),
+        }
+        for address, (client, queries) in pages.items():
+            with self.subTest(address=address):
+                with self.assertNumQueries(queries):
+                    response = client.get(address)
+                self.assertEqual(len(response.context['page_obj']),
+                                 settings.COUNT_POSTS)
+
+    @override_settings(PAGINATOR_EXACT_COUNT=True)
+    def test_exact_count_setting(self):
+        address = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        with self.assertNumQueries(3):
+            response = self.client.get(address)
+        self.assertEqual(response.context['page_obj'].last_page_number,
+                         self.AUTHORS_COUNT)
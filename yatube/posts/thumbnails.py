@@ -0,0 +1,69 @@
+"""Thumbnail renditions generated off the request path.
+
+PostForm schedules generation after saving a new image; a small local
+thread pool renders the thumbnail with sorl and stores its URL and size on
+the post, so templates print an <img> without touching the image or the
+thumbnail key-value store.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from sorl.thumbnail import get_thumbnail
+
+from . import cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails')
+    return _executor
+
+
+def generate(post_id):
+    """Renders the thumbnail of the post and stores it on the post."""
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'author_id', 'group_id').first()
+    if post is None:
+        return
+    fields = {'thumbnail_url': '', 'thumbnail_width': None,
+              'thumbnail_height': None}
+    if post.image:
+        thumbnail = get_thumbnail(
+            post.image, settings.POST_THUMBNAIL_GEOMETRY,
+            crop='center', upscale=True)
+        fields = {'thumbnail_url': thumbnail.url,
+                  'thumbnail_width': thumbnail.width,
+                  'thumbnail_height': thumbnail.height}
+    # картинку могли заменить, пока считалось превью
+    Post.objects.filter(pk=post_id, image=post.image.name).update(**fields)
+    cache.touch(cache.INDEX, cache.post_scope(post_id), *cache.owner_scopes(
+        [post.author_id], [post.group_id] if post.group_id else []))
+
+
+def _generate_in_worker(post_id):
+    close_old_connections()
+    try:
+        generate(post_id)
+    except Exception:
+        logger.exception('Thumbnail generation failed for post %s', post_id)
+    finally:
+        connection.close()
+
+
+def schedule(post):
+    """Generates the thumbnail once the current transaction commits."""
+    if not settings.THUMBNAIL_ASYNC:
+        generate(post.pk)
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(_generate_in_worker, post.pk))
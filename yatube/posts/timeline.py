@@ -0,0 +1,245 @@
+"""Materialized follow feed.
+
+New posts are pushed into the TimelineEntry inbox of every follower, so the
+follow feed reads one user's inbox instead of scanning the posts of every
+followed author. Authors with more than TIMELINE_FANOUT_LIMIT followers are
+not fanned out: their posts are merged in on read.
+
+An inbox keeps the TIMELINE_INBOX_SIZE newest entries: the follow feed
+ends there. Backfill trims the inbox it fills; fan-out trims the inboxes of
+the author's followers on one post in TIMELINE_TRIM_EVERY, so an inbox
+overshoots the limit by about that many entries at most.
+"""
+import heapq
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, Sum
+
+from .models import Follow, Post, TimelineEntry, UserCounters
+
+BATCH_SIZE = 500
+
+
+def is_popular(author_id):
+    return UserCounters.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def _entry(user_id, post):
+    return TimelineEntry(user_id=user_id, post_id=post.pk,
+                         author_id=post.author_id, pub_date=post.pub_date)
+
+
+def fan_out(post):
+    """Delivers a new post to the inboxes of the author's followers."""
+    if is_popular(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id)
+    TimelineEntry.objects.bulk_create(
+        (_entry(user_id, post) for user_id in
+         followers.values_list('user_id', flat=True).iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    if post.pk % settings.TIMELINE_TRIM_EVERY == 0:
+        trim(f'SELECT user_id FROM {Follow._meta.db_table} '
+             'WHERE author_id = %s', [post.author_id])
+
+
+def backfill(user_id, author_id):
+    """Copies the latest posts of a newly followed author to the inbox."""
+    posts = Post.objects.filter(author_id=author_id).only(
+        'pk', 'author_id', 'pub_date')[:settings.TIMELINE_BACKFILL]
+    TimelineEntry.objects.bulk_create(
+        (_entry(user_id, post) for post in posts),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    trim('%s', [user_id])
+
+
+def trim(users_sql, params):
+    """Cuts the inboxes of the users selected by users_sql down to the
+    TIMELINE_INBOX_SIZE newest entries."""
+    table = TimelineEntry._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN ('
+            'SELECT id FROM (SELECT id, ROW_NUMBER() OVER ('
+            'PARTITION BY user_id ORDER BY pub_date DESC, post_id DESC'
+            f') AS slot FROM {table} WHERE user_id IN ({users_sql})) '
+            'entries WHERE slot > %s)',
+            [*params, settings.TIMELINE_INBOX_SIZE]
+        )
+
+
+def prune(user_id, author_id):
+    """Removes the posts of an unfollowed author from the inbox."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild():
+    """Refills every inbox from the current follows.
+
+    One INSERT ... SELECT copies the latest TIMELINE_BACKFILL posts of every
+    followed author, TIMELINE_INBOX_SIZE at most per inbox; popular authors
+    are skipped, as in fan_out().
+    """
+    TimelineEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            '(user_id, post_id, author_id, pub_date) '
+            'SELECT user_id, id, author_id, pub_date FROM ('
+            'SELECT follow.user_id, post.id, post.author_id, post.pub_date, '
+            'ROW_NUMBER() OVER (PARTITION BY follow.user_id '
+            'ORDER BY post.pub_date DESC, post.id DESC) AS slot '
+            f'FROM {Follow._meta.db_table} follow '
+            'JOIN (SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+            'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+            f') AS position FROM {Post._meta.db_table}) post '
+            'ON post.author_id = follow.author_id '
+            'WHERE post.position <= %s AND follow.author_id NOT IN ('
+            f'SELECT user_id FROM {UserCounters._meta.db_table} '
+            'WHERE followers_count > %s)) entries WHERE slot <= %s',
+            [settings.TIMELINE_BACKFILL, settings.TIMELINE_FANOUT_LIMIT,
+             settings.TIMELINE_INBOX_SIZE]
+        )
+
+
+def _for_inbox(condition):
+    """The condition on posts rewritten for TimelineEntry: its id is the
+    post_id of the entry."""
+    inbox = Q()
+    inbox.connector, inbox.negated = condition.connector, condition.negated
+    for child in condition.children:
+        if isinstance(child, Q):
+            inbox.children.append(_for_inbox(child))
+            continue
+        lookup, value = child
+        name, *rest = lookup.split('__')
+        if name in ('id', 'pk'):
+            lookup = '__'.join(['post_id', *rest])
+        elif name not in ('pub_date', 'author', 'author_id'):
+            raise ValueError(f'Лента подписок не фильтруется по {lookup}.')
+        inbox.children.append((lookup, value))
+    return inbox
+
+
+class Feed:
+    """The follow feed of a user as a lazy sequence of posts.
+
+    It supports what the paginators and the API ask of a queryset:
+    order_by() on (pub_date, id) in either direction, filter() on the
+    publication date and id, select_related() and only() of the posts,
+    slicing and count(). A slice [start:stop] reads at most stop entries
+    from the (user, -pub_date) inbox index and at most stop posts of each
+    followed popular author from the (author, -pub_date) index, merges
+    them and loads the posts of the slice with one more query. Without
+    popular authors the inbox page and the posts are one query.
+    """
+    model = Post
+    ordered = True
+
+    def __init__(self, user_id, posts=None, ordering=('-pub_date', '-id'),
+                 conditions=()):
+        self.user_id = user_id
+        self.posts = Post.objects.feed() if posts is None else posts
+        self.ordering = tuple(ordering)
+        self.conditions = tuple(conditions)
+        self._popular = None
+
+    def _clone(self, **changes):
+        options = {'posts': self.posts, 'ordering': self.ordering,
+                   'conditions': self.conditions, **changes}
+        clone = Feed(self.user_id, **options)
+        clone._popular = self._popular
+        return clone
+
+    def order_by(self, *ordering):
+        if len(ordering) != 2 or {name.lstrip('-') for name in ordering} != {
+                'pub_date', 'id'} or len({name[0] == '-'
+                                         for name in ordering}) != 1:
+            raise ValueError('Лента подписок упорядочена только по '
+                             '(pub_date, id).')
+        return self._clone(ordering=ordering)
+
+    def filter(self, *args, **kwargs):
+        return self._clone(conditions=self.conditions
+                           + (Q(*args, **kwargs),))
+
+    def select_related(self, *fields):
+        return self._clone(posts=self.posts.select_related(*fields))
+
+    def only(self, *fields):
+        return self._clone(posts=self.posts.only(*fields))
+
+    @property
+    def descending(self):
+        return self.ordering[0].startswith('-')
+
+    def popular_authors(self):
+        """Followed authors whose posts are not fanned out."""
+        if self._popular is None:
+            self._popular = list(Follow.objects.filter(
+                user_id=self.user_id,
+                author__counters__followers_count__gt=(
+                    settings.TIMELINE_FANOUT_LIMIT)
+            ).values_list('author_id', flat=True))
+        return self._popular
+
+    def _inbox(self):
+        entries = TimelineEntry.objects.filter(user_id=self.user_id)
+        if self.popular_authors():
+            # записи из давнего бэкфилла, пока автор не стал популярным
+            entries = entries.exclude(author_id__in=self.popular_authors())
+        for condition in self.conditions:
+            entries = entries.filter(_for_inbox(condition))
+        sign = '-' if self.descending else ''
+        return entries.order_by(f'{sign}pub_date', f'{sign}post_id')
+
+    def _authored(self, author_id):
+        posts = Post.objects.filter(author_id=author_id)
+        for condition in self.conditions:
+            posts = posts.filter(condition)
+        return posts.order_by(*self.ordering)
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        if stop is None or index.step:
+            raise ValueError('Ленту подписок можно только срезать [a:b].')
+        if not self.popular_authors():
+            page = self._inbox()[start:stop].values('post_id')
+            return list(self.posts.filter(pk__in=page).order_by(
+                *self.ordering))
+        sources = [self._inbox()[:stop].values_list('pub_date', 'post_id')]
+        sources += [self._authored(author_id)[:stop].values_list(
+            'pub_date', 'id') for author_id in self.popular_authors()]
+        keys = list(heapq.merge(*map(list, sources),
+                                reverse=self.descending))[start:stop]
+        posts = self.posts.in_bulk([post_id for _, post_id in keys])
+        return [posts[post_id] for _, post_id in keys if post_id in posts]
+
+    def count(self):
+        """Posts in the feed; the posts of popular authors are taken from
+        their counters, so filters narrow only the inbox part."""
+        count = self._inbox().count()
+        if self.popular_authors():
+            count += UserCounters.objects.filter(
+                user_id__in=self.popular_authors()).aggregate(
+                total=Sum('posts_count'))['total'] or 0
+        return count
+
+    def __len__(self):
+        return self.count()
+
+
+def feed(user):
+    """The follow feed of the user: the inbox plus the posts of followed
+    authors that are too popular to be fanned out."""
+    return Feed(user.pk)
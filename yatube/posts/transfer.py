@@ -0,0 +1,412 @@
+"""NDJSON export and import of the posts content.
+
+A dump is a stream of JSON objects, one per line, each with a "model" key:
+groups, users, posts, comments and follows, in that order, so that a line
+only refers to lines above it. Users and groups are referred to by username
+and slug, posts by their id in the source database. Imported rows get ids
+of the importing database; PostIds maps the source ids of the posts to
+them for the comments that follow.
+
+Both directions work in chunks with constant memory. Export reads every
+model with a server-side iterator ordered by primary key and writes a chunk
+at a time (a complete gzip member each when compressed, so the file can be
+cut after any chunk); import writes every batch with bulk_create in its own
+transaction. After each chunk a Checkpoint records how far the work got, and
+a rerun with the same checkpoint file continues from there, with the post
+id map kept in a file next to it. Rows that already exist are skipped:
+groups and users by slug and username, posts by author, time and text,
+comments by post, author and time, so importing the same dump twice is
+harmless.
+
+bulk_create bypasses the signal handlers: every batch does their work for
+the rows it inserted (counters, group stats, follow feeds, search index,
+page stamps).
+"""
+import gzip
+import json
+import os
+import sqlite3
+import time
+from collections import Counter
+from datetime import datetime
+
+from django.contrib.auth.hashers import make_password
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from core.models import bulk_create_keeping_dates
+from . import cache, counters, group_stats, search, timeline
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+CHUNK_SIZE = 5000
+BATCH_SIZE = 1000
+
+# поле в дампе -> lookup для values()
+FIELDS = {
+    'group': {'slug': 'slug', 'title': 'title',
+              'description': 'description'},
+    'user': {'username': 'username', 'first_name': 'first_name',
+             'last_name': 'last_name'},
+    'post': {'id': 'id', 'author': 'author__username',
+             'group': 'group__slug', 'text': 'text', 'image': 'image',
+             'pub_date': 'pub_date', 'modified': 'modified'},
+    'comment': {'post': 'post_id', 'author': 'author__username',
+                'text': 'text', 'pub_date': 'pub_date',
+                'modified': 'modified'},
+    'follow': {'user': 'user__username', 'author': 'author__username'},
+}
+
+
+class TransferError(ValueError):
+    pass
+
+
+class Encoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder округляет время до миллисекунд
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class Checkpoint:
+    """Progress of an export or import, kept in a small JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as file:
+            return json.load(file)
+
+    def save(self, state):
+        # через временный файл: прерванная запись не портит прогресс
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(state, file)
+        os.replace(temporary, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def querysets(author=None, group=None, since=None, until=None):
+    """(model name, queryset) in dump order for the posts matching the
+    filters, with the comments, follows, groups and users they need."""
+    posts = Post.objects.order_by()
+    if author:
+        posts = posts.filter(author__username=author)
+    if group:
+        posts = posts.filter(group__slug=group)
+    if since:
+        posts = posts.filter(pub_date__gte=since)
+    if until:
+        posts = posts.filter(pub_date__lt=until)
+    comments = Comment.objects.filter(post__in=posts.values('pk'))
+    groups, users, follows = (
+        Group.objects.all(), User.objects.all(), Follow.objects.all())
+    if any((author, group, since, until)):
+        authors = posts.values('author_id')
+        # подписки на выгруженных авторов и все, на кого они ссылаются
+        follows = follows.filter(author__in=authors)
+        groups = groups.filter(pk__in=posts.values('group_id'))
+        users = users.filter(
+            Q(pk__in=authors) | Q(pk__in=comments.values('author_id'))
+            | Q(pk__in=follows.values('user_id')))
+    return [('group', groups), ('user', users), ('post', posts),
+            ('comment', comments), ('follow', follows)]
+
+
+def _rows(name, queryset, after):
+    fields = FIELDS[name]
+    rows = queryset.filter(pk__gt=after).order_by('pk').values(
+        'pk', *fields.values()).iterator(chunk_size=CHUNK_SIZE)
+    for row in rows:
+        yield row['pk'], {'model': name, **{
+            key: row[lookup] for key, lookup in fields.items()}}
+
+
+def _write(file, lines, compress):
+    data = ''.join(lines).encode()
+    file.write(gzip.compress(data) if compress else data)
+    file.flush()
+
+
+def export(file, querysets, compress=False, checkpoint=None, report=None):
+    """Writes the querysets to the binary file as NDJSON.
+
+    With a checkpoint, the file must already be cut at the saved offset
+    (see resume_offset()); report(model, rows, seconds) follows every model.
+    """
+    state = checkpoint.load() if checkpoint else None
+    names = [name for name, _ in querysets]
+    start = names.index(state['model']) if state else 0
+    for name, queryset in querysets[start:]:
+        last = state['last'] if state and state['model'] == name else 0
+        started, count, lines = time.perf_counter(), 0, []
+        for last, row in _rows(name, queryset, last):
+            lines.append(json.dumps(row, cls=Encoder,
+                                    ensure_ascii=False) + '\n')
+            count += 1
+            if len(lines) == CHUNK_SIZE:
+                _save_chunk(file, lines, compress, checkpoint, name, last)
+                lines = []
+        _save_chunk(file, lines, compress, checkpoint, name, last)
+        if report is not None:
+            report(name, count, time.perf_counter() - started)
+
+
+def _save_chunk(file, lines, compress, checkpoint, name, last):
+    if lines:
+        _write(file, lines, compress)
+    if checkpoint is not None:
+        checkpoint.save({'model': name, 'last': last, 'offset': file.tell()})
+
+
+def resume_offset(checkpoint):
+    """Size of the output written before the checkpoint, 0 if none."""
+    state = checkpoint.load()
+    return state['offset'] if state else 0
+
+
+class PostIds:
+    """Source id -> local id of the imported posts, in a SQLite file next
+    to the checkpoint (so a resumed import still finds the posts of the
+    comments) or in memory."""
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute('CREATE TABLE IF NOT EXISTS post '
+                        '(source INTEGER PRIMARY KEY, local INTEGER NOT NULL)')
+
+    def add(self, pairs):
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO post VALUES (?, ?)',
+                                pairs)
+
+    def get_many(self, sources):
+        sources, found = list(set(sources)), {}
+        for start in range(0, len(sources), BATCH_SIZE):
+            batch = sources[start:start + BATCH_SIZE]
+            found.update(self.db.execute(
+                'SELECT source, local FROM post WHERE source IN '
+                f'({", ".join("?" * len(batch))})', batch))
+        return found
+
+    def remove(self):
+        self.db.close()
+        if self.path != ':memory:' and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _ids(model, field, values):
+    return dict(model.objects.filter(
+        **{f'{field}__in': set(values)}).values_list(field, 'pk'))
+
+
+def _dates(row):
+    return parse_datetime(row['pub_date']), parse_datetime(row['modified'])
+
+
+def _load_groups(rows, post_ids):
+    existing = set(_ids(Group, 'slug', [row['slug'] for row in rows]))
+    groups = {row['slug']: Group(slug=row['slug'], title=row['title'],
+                                 description=row['description'])
+              for row in rows if row['slug'] not in existing}
+    Group.objects.bulk_create(groups.values())
+    return len(groups), []
+
+
+def _load_users(rows, post_ids):
+    existing = set(_ids(User, 'username', [row['username'] for row in rows]))
+    # пароли не выгружаются: импортированные пользователи их сбрасывают
+    users = {row['username']: User(
+        username=row['username'], first_name=row['first_name'],
+        last_name=row['last_name'], password=make_password(None))
+        for row in rows if row['username'] not in existing}
+    User.objects.bulk_create(users.values())
+    UserCounters.objects.bulk_create(
+        UserCounters(user_id=pk)
+        for pk in _ids(User, 'username', users).values())
+    return len(users), []
+
+
+def _load_posts(rows, post_ids):
+    authors = _ids(User, 'username', [row['author'] for row in rows])
+    groups = _ids(Group, 'slug', [row['group'] for row in rows
+                                  if row['group']])
+    posts, sources = {}, []
+    for row in rows:
+        if row['author'] not in authors:
+            continue
+        pub_date, modified = _dates(row)
+        key = (authors[row['author']], pub_date, row['text'])
+        sources.append((row['id'], key))
+        posts.setdefault(key, Post(
+            author_id=key[0], group_id=groups.get(row['group']),
+            text=row['text'], image=row['image'] or '', pub_date=pub_date,
+            modified=modified))
+    local = {(author_id, pub_date, text): pk
+             for author_id, pub_date, text, pk in Post.objects.order_by()
+             .filter(author_id__in={key[0] for key in posts},
+                     pub_date__in={key[1] for key in posts})
+             .values_list('author_id', 'pub_date', 'text', 'pk')}
+    new = [post for key, post in posts.items() if key not in local]
+    bulk_create_keeping_dates(Post, new)
+    local.update((key, post.pk) for key, post in posts.items()
+                 if post.pk is not None)
+    post_ids.add((source, local[key]) for source, key in sources)
+    _count_posts(new)
+    scopes = cache.owner_scopes(
+        {post.author_id for post in new},
+        {post.group_id for post in new if post.group_id})
+    return len(new), [cache.INDEX, *scopes] if new else []
+
+
+def _count_posts(posts):
+    """What the post_save handlers do for new posts, once per author and
+    group rather than once per post."""
+    for author_id, count in Counter(post.author_id for post in posts).items():
+        counters.change_user(author_id, 'posts_count', count)
+    for group_id, count in Counter(post.group_id for post in posts).items():
+        counters.change_group(group_id, count)
+    for (group_id, author_id), count in Counter(
+            (post.group_id, post.author_id) for post in posts).items():
+        group_stats.change(group_id, author_id, count)
+    for post in posts:
+        timeline.fan_out(post)
+    search.index_posts(Post.objects.filter(pk__in=[post.pk
+                                                   for post in posts]))
+
+
+def _load_comments(rows, post_ids):
+    authors = _ids(User, 'username', [row['author'] for row in rows])
+    posts = post_ids.get_many(row['post'] for row in rows)
+    comments = {}
+    for row in rows:
+        if row['post'] not in posts or row['author'] not in authors:
+            continue
+        pub_date, modified = _dates(row)
+        comments[posts[row['post']], authors[row['author']], pub_date] = (
+            Comment(post_id=posts[row['post']],
+                    author_id=authors[row['author']], text=row['text'],
+                    pub_date=pub_date, modified=modified))
+    existing = Comment.objects.filter(
+        post_id__in={comment.post_id for comment in comments.values()},
+        pub_date__in={comment.pub_date for comment in comments.values()},
+    ).values_list('post_id', 'author_id', 'pub_date')
+    for key in existing:
+        comments.pop(key, None)
+    bulk_create_keeping_dates(Comment, comments.values())
+    for post_id, count in Counter(
+            comment.post_id for comment in comments.values()).items():
+        counters.change_post(post_id, count)
+    return len(comments), {cache.post_scope(comment.post_id)
+                           for comment in comments.values()}
+
+
+def _load_follows(rows, post_ids):
+    users = _ids(User, 'username', [row[key] for row in rows
+                                    for key in ('user', 'author')])
+    pairs = {(users[row['user']], users[row['author']]) for row in rows
+             if row['user'] in users and row['author'] in users
+             and row['user'] != row['author']}
+    pairs -= set(Follow.objects.filter(
+        user_id__in={user_id for user_id, _ in pairs},
+        author_id__in={author_id for _, author_id in pairs},
+    ).values_list('user_id', 'author_id'))
+    Follow.objects.bulk_create(
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in pairs)
+    for user_id, count in Counter(user for user, _ in pairs).items():
+        counters.change_user(user_id, 'following_count', count)
+    for author_id, count in Counter(author for _, author in pairs).items():
+        counters.change_user(author_id, 'followers_count', count)
+    for user_id, author_id in pairs:
+        timeline.backfill(user_id, author_id)
+    return len(pairs), cache.owner_scopes(
+        {user_id for pair in pairs for user_id in pair}, [])
+
+
+# загрузчик получает порцию строк и карту id постов PostIds
+LOADERS = {
+    'group': _load_groups,
+    'user': _load_users,
+    'post': _load_posts,
+    'comment': _load_comments,
+    'follow': _load_follows,
+}
+
+
+def _parse(lines, done):
+    """(line number, model, row) of the lines after the first done."""
+    for number, line in enumerate(lines, 1):
+        if number <= done or not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            name = row['model']
+        except (ValueError, TypeError, KeyError):
+            raise TransferError(f'Строка {number}: не объект NDJSON.')
+        if name not in LOADERS:
+            raise TransferError(f'Строка {number}: неизвестная модель '
+                                f'«{name}».')
+        yield number, name, row
+
+
+def _batches(rows):
+    """Runs of rows of one model, at most BATCH_SIZE long, with the number
+    of the last line of each."""
+    model, batch, last = None, [], 0
+    for number, name, row in rows:
+        if batch and (name != model or len(batch) == BATCH_SIZE):
+            yield model, last, batch
+            batch = []
+        model, last = name, number
+        batch.append(row)
+    if batch:
+        yield model, last, batch
+
+
+def _load(model, batch, number, post_ids):
+    try:
+        with transaction.atomic():
+            written, scopes = LOADERS[model](batch, post_ids)
+    except KeyError as error:
+        raise TransferError(f'Строки до {number}: у модели «{model}» нет '
+                            f'поля {error}.')
+    cache.touch(*scopes)
+    return written
+
+
+def import_rows(lines, checkpoint=None, report=None):
+    """Writes NDJSON lines in batches; report(model, rows, seconds) follows
+    every run of lines of one model with the number of rows inserted.
+    Lines whose users, groups or posts are missing and rows that already
+    exist are skipped and not counted."""
+    state = checkpoint.load() if checkpoint else None
+    post_ids = PostIds(post_ids_path(checkpoint) if checkpoint
+                       else ':memory:')
+    model, count, started = None, 0, time.perf_counter()
+    for name, number, batch in _batches(
+            _parse(lines, state['lines'] if state else 0)):
+        if name != model:
+            if model is not None and report is not None:
+                report(model, count, time.perf_counter() - started)
+            model, count, started = name, 0, time.perf_counter()
+        count += _load(name, batch, number, post_ids)
+        if checkpoint is not None:
+            checkpoint.save({'lines': number})
+    if model is not None and report is not None:
+        report(model, count, time.perf_counter() - started)
+    post_ids.remove()
+
+
+def post_ids_path(checkpoint):
+    return f'{checkpoint.path}.posts'
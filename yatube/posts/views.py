@@ -1,32 +1,79 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import Http404
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-
-from .models import Post, Group, User, Follow
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+
+from core.paginator import CursorPaginator, WindowedPaginator, cached_count
+from core.ratelimit import ratelimit
+from . import (cache, comment_queue, counters, group_stats, search,
+               timeline)
+from .conditional import (conditional_page, group_scopes, index_scopes,
+                          post_scopes, profile_scopes)
+from .models import Comment, Post, Group, User, Follow
 from .forms import PostForm, CommentForm
 from django.conf import settings
 
 
-def pagination(request, post_list):
-    paginator = Paginator(post_list, settings.COUNT_POSTS)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+def pagination(request, post_list, count=None):
+    """count is the number of posts when it is known without COUNT(*),
+    see WindowedPaginator."""
+    if settings.FEED_PAGINATION == 'cursor':
+        paginator = CursorPaginator(post_list, settings.COUNT_POSTS)
+        return paginator.get_page(request.GET.get('cursor'))
+    if settings.PAGINATOR_EXACT_COUNT:
+        count = None
+    paginator = WindowedPaginator(post_list, settings.COUNT_POSTS, count,
+                                  settings.PAGINATOR_WINDOW)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def page_key(request):
+    """Identifies the requested page of a feed for cache keys."""
+    if settings.FEED_PAGINATION == 'cursor':
+        return request.GET.get('cursor', '')
+    return request.GET.get('page', '1')
+
+
+def comments_page(request, post_id):
+    """Comments of the post oldest first, COUNT_COMMENTS per page."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author').only('pub_date', 'text', 'author__username')
+    paginator = CursorPaginator(comments, settings.COUNT_COMMENTS,
+                                ordering=('pub_date', 'id'))
+    return paginator.get_page(request.GET.get('cursor'))
 
 
+@conditional_page(index_scopes)
 def index(request):
-    post_list = Post.objects.all()
-    page_obj = pagination(request, post_list)
+    post_list = Post.objects.feed()
+    count = cached_count(Post.objects.all(), 'posts:count:index',
+                         settings.PAGINATOR_COUNT_TIMEOUT)
+    # страница считается только при промахе кэша в шаблоне
+    page_obj = SimpleLazyObject(
+        lambda: pagination(request, post_list, count))
 
     context = {
         'page_obj': page_obj,
+        'index_stamp': cache.get_stamp(cache.INDEX),
+        'page_key': page_key(request),
+        'cache_timeout': settings.INDEX_PAGE_CACHE_TIMEOUT,
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(index_scopes)
+def group_index(request):
+    """Directory of the groups; figures come from posts.group_stats."""
+    context = {'groups': group_stats.directory()}
+    return render(request, 'posts/group_index.html', context)
+
+
+@conditional_page(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = pagination(request, post_list)
+    post_list = group.posts.feed()
+    page_obj = pagination(request, post_list, group.posts_count)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -34,18 +81,24 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    count_posts = post_list.count()
-    page_obj = pagination(request, post_list)
-    following = author.following.filter(user=request.user).exists()
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username)
+    author_counters = counters.for_user(author)
+    post_list = author.posts.feed()
+    page_obj = pagination(request, post_list, author_counters.posts_count)
+    following = (
+        request.user.is_authenticated
+        and author.following.filter(user=request.user).exists()
+    )
 
     context = {
         'username': username,
         'author': author,
         'page_obj': page_obj,
-        'count_posts': count_posts,
+        'count_posts': author_counters.posts_count,
+        'counters': author_counters,
         'following': following
 
     }
@@ -53,19 +106,46 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search.search(query, request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@conditional_page(post_scopes)
 def post_detail(request, post_id):
-    posts_detail = get_object_or_404(Post, pk=post_id)
+    posts_detail = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'), pk=post_id)
     comment_form = CommentForm(request.POST or None)
-    comments = posts_detail.comments.all()
+    comments = comments_page(request, post_id)
     context = {
         'posts_detail': posts_detail,
         'comment_form': comment_form,
         'comments': comments,
     }
+    if (settings.COMMENT_WRITE_MODE == 'read_your_writes'
+            and request.user.is_authenticated):
+        context['pending_comments'] = comment_queue.pending(
+            post_id, request.user)
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Next page of comments as an HTML fragment for "load more"."""
+    comments = comments_page(request, post_id)
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {'comments': comments, 'post_id': post_id}
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
+@ratelimit('post_create')
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None,
                     files=request.FILES or None)
@@ -79,6 +159,8 @@ def post_create(request):
 
 
 @login_required
+@ratelimit('post_edit')
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = PostForm(
@@ -101,10 +183,15 @@ def post_edit(request, post_id):
 
 
 @login_required
+@ratelimit('add_comment')
+@transaction.atomic
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
+    if form.is_valid() and comment_queue.enabled():
+        comment_queue.enqueue(post_id, request.user.pk,
+                              form.cleaned_data['text'])
+    elif form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
@@ -114,31 +201,28 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    authors = Follow.objects.filter(user=request.user).values_list('author',
-                                                                   flat=True)
-    post_list = Post.objects.filter(author__in=authors)
-    page_obj = pagination(request, post_list)
+    post_list = timeline.feed(request.user)
+    count = cached_count(post_list, f'posts:count:follow:{request.user.pk}',
+                         settings.PAGINATOR_COUNT_TIMEOUT)
+    page_obj = pagination(request, post_list, count)
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@ratelimit('follow', methods=('GET', 'POST'))
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    is_subscribed = Follow.objects.filter(
-        user=request.user, author=author
-    ).exists()
-    if request.user != author and not is_subscribed:
-        Follow.objects.create(user=request.user, author=author)
+    if request.user != author:
+        Follow.objects.follow(request.user, author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
+@ratelimit('follow', methods=('GET', 'POST'))
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    is_subscribed = Follow.objects.filter(
-        user=request.user, author=author
-    ).exists()
-    if request.user != author and is_subscribed:
-        Follow.objects.filter(user=request.user, author=author).delete()
+    Follow.objects.unfollow(request.user, author)
     return redirect('posts:profile', username=username)
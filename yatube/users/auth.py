@@ -0,0 +1,59 @@
+"""Authentication without queries on the hot path.
+
+With cached_db sessions the session is read from the cache;
+CachedAuthenticationMiddleware does the same for request.user, which the
+header of every page needs. The user is cached next to the sessions
+(SESSION_CACHE_ALIAS) for USER_CACHE_TIMEOUT seconds and checked against
+the session like django.contrib.auth.get_user() does. A cached user whose
+password hash no longer matches the session is not trusted: the user is
+loaded from the database, and the session is flushed if it is really out
+of date. Saving or deleting a user drops the cached copy (users.signals),
+so a password change, a deactivation or a new name is seen at once.
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+
+def user_cache():
+    return caches[settings.SESSION_CACHE_ALIAS]
+
+
+def user_key(user_id):
+    return f'users:user:{user_id}'
+
+
+def _trusted(request, user):
+    session_hash = request.session.get(auth.HASH_SESSION_KEY)
+    return bool(
+        session_hash
+        and request.session.get(auth.BACKEND_SESSION_KEY)
+        in settings.AUTHENTICATION_BACKENDS
+        and constant_time_compare(session_hash,
+                                  user.get_session_auth_hash()))
+
+
+def get_user(request):
+    """request.user from the cache, or from the database on a miss."""
+    user_id = request.session.get(auth.SESSION_KEY)
+    if user_id is None:
+        return AnonymousUser()
+    key = user_key(user_id)
+    user = user_cache().get(key)
+    if user is not None and _trusted(request, user):
+        user.backend = request.session[auth.BACKEND_SESSION_KEY]
+        return user
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        user_cache().set(key, user, settings.USER_CACHE_TIMEOUT)
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+
+    def process_request(self, request):
+        request.user = SimpleLazyObject(lambda: get_user(request))
@@ -0,0 +1,36 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Удаляет истёкшие сессии пачками по индексу expire_date: '
+            'в отличие от clearsessions, ни один DELETE не держит '
+            'блокировку таблицы долго.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--max-batches', type=int,
+                            help='Остановиться после N пачек.')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Пауза между пачками, секунд.')
+
+    def handle(self, *args, **options):
+        now, deleted, batches = timezone.now(), 0, 0
+        expired = Session.objects.filter(expire_date__lt=now).order_by(
+            'expire_date')
+        while options['max_batches'] is None or (
+                batches < options['max_batches']):
+            keys = list(expired.values_list(
+                'session_key', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            batches += 1
+            if len(keys) < options['batch_size']:
+                break
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(f'Удалено сессий: {deleted} за {batches} пачек.')
@@ -0,0 +1,78 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..auth import user_cache, user_key
+
+User = get_user_model()
+
+
+class CachedUserTest(TestCase):
+
+    def setUp(self) -> None:
+        caches['shared'].clear()
+        self.user = User.objects.create_user(username='auth',
+                                             password='old-Passw0rd')
+        self.client.force_login(self.user)
+        self.url = reverse('about:author')
+
+    def test_authenticated_page_needs_no_queries(self):
+        self.assertContains(self.client.get(self.url), 'auth')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'auth')
+
+    def test_password_change_logs_out_other_sessions(self):
+        other = Client()
+        other.force_login(self.user)
+        other.get(self.url)
+        response = self.client.post(reverse('users:password_change'), {
+            'old_password': 'old-Passw0rd',
+            'new_password1': 'new-Passw0rd',
+            'new_password2': 'new-Passw0rd',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNone(user_cache().get(user_key(self.user.pk)))
+        self.assertTrue(
+            self.client.get(self.url).context['user'].is_authenticated)
+        self.assertFalse(
+            other.get(self.url).context['user'].is_authenticated)
+
+    def test_cached_user_not_matching_session_is_reloaded(self):
+        stranger = User(pk=self.user.pk, username='stranger',
+                        password='other')
+        user_cache().set(user_key(self.user.pk), stranger)
+        self.assertEqual(
+            self.client.get(self.url).context['user'].username, 'auth')
+        self.assertEqual(user_cache().get(user_key(self.user.pk)).username,
+                         'auth')
+
+
+class ClearExpiredSessionsTest(TestCase):
+
+    def test_deletes_expired_sessions_in_batches(self):
+        for number in range(5):
+            session = SessionStore()
+            session['number'] = number
+            session.set_expiry(-60 if number < 4 else 60)
+            session.save()
+        output = StringIO()
+        call_command('clear_expired_sessions', batch_size=3, max_batches=1,
+                     stdout=output)
+        self.assertEqual(Session.objects.count(), 2)
+        call_command('clear_expired_sessions', batch_size=3, stdout=output)
+        self.assertEqual(
+            list(Session.objects.values_list('expire_date', flat=True)
+                 .filter(expire_date__lt=timezone.now()
+                         + timedelta(minutes=2))),
+            list(Session.objects.values_list('expire_date', flat=True)))
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertIn('Удалено сессий: 1 за 1 пачек.', output.getvalue())
@@ -7,7 +7,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = 'rd#t&=g3c&)75ky2n-3r2n5p7(ncgra7-s!k!tn9@b4cyukk=p'
 
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -28,16 +28,20 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
 
     'sorl.thumbnail'
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.auth.CachedAuthenticationMiddleware',
+    'core.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -46,12 +50,22 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+# без DEBUG шаблоны компилируются один раз на процесс
+if not DEBUG:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, засекающий время рендера для core.metrics
+        'BACKEND': 'core.template_backend.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -66,19 +80,88 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+
+# соединение переиспользуется запросами одного потока CONN_MAX_AGE секунд
+CONN_MAX_AGE: int = 60
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
     }
 }
+# PostgreSQL вместо SQLite (нужен пакет psycopg2)
+if os.environ.get('POSTGRES_DB'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ['POSTGRES_DB'],
+        'USER': os.environ.get('POSTGRES_USER', ''),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', ''),
+        'PORT': os.environ.get('POSTGRES_PORT', ''),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+    }
 
+# Реплики только для чтения (core.db_routers): хосты PostgreSQL через
+# запятую в POSTGRES_REPLICA_HOSTS или файлы SQLite в SQLITE_REPLICAS,
+# которые заполняет manage.py sync_replicas.
+_replicas = []
+if os.environ.get('POSTGRES_DB'):
+    _replicas = [dict(DATABASES['default'], HOST=host) for host in filter(
+        None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(','))]
+elif os.environ.get('SQLITE_REPLICAS'):
+    _replicas = [dict(DATABASES['default'], NAME=name) for name in filter(
+        None, os.environ['SQLITE_REPLICAS'].split(','))]
+for _number, _replica in enumerate(_replicas, 1):
+    # в тестах реплики — та же тестовая база
+    DATABASES[f'replica{_number}'] = dict(_replica, TEST={'MIRROR': 'default'})
+REPLICA_DATABASES: list = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.db_routers.PrimaryReplicaRouter']
+# сколько секунд после записи клиент читает из основной базы
+READ_YOUR_WRITES_SECONDS: int = 10
+
+# L1 — небольшой LRU в памяти каждого процесса, L2 — общий для всех
+# воркеров кеш 'shared'. Метки версий posts.cache всегда читаются из L2:
+# по ним страницы сбрасываются во всех процессах сразу.
+# В общем кеше лежат сессии и пользователи в pickle: каталог доступен только
+# владельцу (0700, проверка core.W001) и не должен быть общим вроде /tmp.
+CACHE_DIR: str = os.environ.get('YATUBE_CACHE_DIR',
+                                os.path.join(BASE_DIR, 'cache'))
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+            'LOCAL_EXCLUDE': ['posts:stamp:'],
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
 }
+# общий кеш в Redis вместо файлов (нужен пакет django-redis)
+if os.environ.get('REDIS_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+# сессии читаются из общего кеша и пишутся в базу; L1 не используется,
+# чтобы выход из аккаунта сразу действовал во всех процессах. Истёкшие
+# сессии удаляет manage.py clear_expired_sessions.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'shared'
+# request.user кешируется рядом с сессией (users.auth)
+USER_CACHE_TIMEOUT: int = 60 * 15
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -126,3 +209,124 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 COUNT_POSTS: int = 10
+# комментарии на странице поста, остальные подгружаются по «Показать ещё»
+COUNT_COMMENTS: int = 20
+# сколько самых активных авторов показывать у группы в каталоге
+GROUP_TOP_AUTHORS: int = 3
+# размер страницы JSON API по умолчанию и предел для ?limit=
+API_PAGE_SIZE: int = 20
+API_MAX_PAGE_SIZE: int = 100
+# 'page' — классическая нумерация страниц (?page=N, COUNT(*) + OFFSET),
+# 'cursor' — keyset-пагинация по (pub_date, id) с токенами ?cursor=.
+FEED_PAGINATION: str = 'page'
+# ссылки на первую, последнюю и PAGINATOR_WINDOW страниц вокруг текущей;
+# число постов для них берётся из счётчиков или из COUNT(*), кешируемого на
+# PAGINATOR_COUNT_TIMEOUT секунд, а с PAGINATOR_EXACT_COUNT — из COUNT(*)
+# на каждый запрос
+PAGINATOR_WINDOW: int = 2
+PAGINATOR_COUNT_TIMEOUT: int = 60
+PAGINATOR_EXACT_COUNT: bool = False
+# в админке отфильтрованный список считается не дальше этого числа строк
+ADMIN_COUNT_LIMIT: int = 10000
+# фрагмент главной сбрасывается сразу при изменении постов,
+# таймаут лишь ограничивает жизнь неиспользуемых вариантов
+INDEX_PAGE_CACHE_TIMEOUT: int = 60 * 5
+# HTML карточек постов в лентах кешируется по посту (posts.templatetags.
+# post_cards) и обновляется при правке поста; таймаут ограничивает жизнь
+# карточек со старым именем автора
+POST_CARD_CACHE: bool = True
+POST_CARD_CACHE_TIMEOUT: int = 60 * 60
+# посты авторов с большим числом подписчиков не раскладываются по лентам
+# подписчиков при публикации, а подмешиваются в ленту при чтении
+TIMELINE_FANOUT_LIMIT: int = 1000
+# сколько последних постов автора попадает в ленту при подписке
+TIMELINE_BACKFILL: int = 100
+# в ленте подписок хранятся только последние TIMELINE_INBOX_SIZE записей;
+# при публикации ленты подписчиков подрезаются на каждом
+# TIMELINE_TRIM_EVERY-м посте
+TIMELINE_INBOX_SIZE: int = 1000
+TIMELINE_TRIM_EVERY: int = 100
+
+# 'sync' — комментарий пишется в базу в запросе; 'eventual' — ставится
+# в очередь posts.comment_queue и появляется после её сброса;
+# 'read_your_writes' — как 'eventual', но автор сразу видит свои
+# комментарии из очереди
+COMMENT_WRITE_MODE: str = 'sync'
+COMMENT_QUEUE_PATH = os.path.join(BASE_DIR, 'comment_queue.sqlite3')
+# очередь сбрасывается пачками раз в COMMENT_QUEUE_INTERVAL секунд или
+# сразу по набору пачки; без COMMENT_QUEUE_WORKER фоновый поток не
+# запускается и сбросом занимается manage.py flush_comments --loop
+COMMENT_QUEUE_BATCH: int = 500
+COMMENT_QUEUE_INTERVAL: float = 1.0
+COMMENT_QUEUE_WORKER: bool = True
+
+# лимиты core.ratelimit: имя -> (запросов, за столько секунд) на
+# пользователя или, для анонимов, на IP; 'default' — на любой запрос,
+# кроме GET, HEAD и OPTIONS
+RATELIMITS: dict = {
+    'default': (60, 60),
+    'post_create': (10, 60),
+    'post_edit': (30, 60),
+    'add_comment': (20, 60),
+    'follow': (30, 60),
+    'signup': (5, 60 * 60),
+}
+RATELIMIT_CACHE: str = 'shared'
+# за обратным прокси — заголовок с адресом клиента, например HTTP_X_REAL_IP
+RATELIMIT_IP_HEADER: str = 'REMOTE_ADDR'
+# RATELIMIT_ENABLED=0 выключает лимиты; manage.py test выключает их сам
+# (core.test_runner): корзины живут в общем кеше между прогонами
+RATELIMIT_ENABLED: bool = os.environ.get('RATELIMIT_ENABLED', '1') == '1'
+
+# загрузки больше UPLOAD_MAX_SIZE байт не дочитываются до конца
+UPLOAD_MAX_SIZE: int = 10 * 1024 * 1024
+FILE_UPLOAD_HANDLERS = [
+    'core.uploads.SizeLimitUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+# картинки постов: допустимые форматы, предел пикселей (защита от
+# «бомб декомпрессии»), наибольшая сторона и формат после перекодирования
+POST_IMAGE_INPUT_FORMATS: tuple = ('JPEG', 'PNG', 'GIF', 'WEBP')
+POST_IMAGE_MAX_PIXELS: int = 40_000_000
+POST_IMAGE_MAX_SIDE: int = 2048
+POST_IMAGE_FORMAT: str = 'WEBP'
+POST_IMAGE_QUALITY: int = 82
+
+POST_THUMBNAIL_GEOMETRY: str = '960x339'
+# превью картинок считаются в фоне пулом потоков после сохранения поста
+THUMBNAIL_ASYNC: bool = True
+THUMBNAIL_WORKERS: int = 2
+
+# 'fts5' — SQLite FTS5, 'terms' — переносимый индекс SearchTerm,
+# 'auto' — FTS5, если миграция смогла создать его таблицу
+SEARCH_BACKEND: str = 'auto'
+
+# запросы дольше бюджета или с большим числом SQL-запросов попадают
+# в лог core.requests с уровнем WARNING и пометкой "slow"
+REQUEST_TIME_BUDGET_MS: int = 500
+REQUEST_QUERY_BUDGET: int = 20
+# заголовок Server-Timing с временем БД, шаблонов и итоговым временем;
+# по умолчанию только при разработке, чтобы не раскрывать тайминги всем
+SERVER_TIMING: bool = DEBUG
+# JSON-строки по каждому запросу, см. manage.py request_report
+REQUEST_LOG_FILE = os.path.join(BASE_DIR, 'requests.log')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'requests': {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': REQUEST_LOG_FILE,
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'core.requests': {
+            'handlers': ['requests'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}